@@ -0,0 +1,220 @@
+"""
+Compare the sync DRF read endpoints with their native async counterparts
+(oreapp/async_views.py) when served by uvicorn through oreconfig.asgi.
+
+The script migrates and seeds a throwaway SQLite database, starts uvicorn
+against it, and drives each endpoint pair with a fixed number of keep-alive
+connections, reporting throughput and p50/p99 latency.
+
+    python benchmarks/asgi_read_paths.py --requests 2000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+ENDPOINTS = [
+    ("menu list", "/api/menus/", "/api/async/menus/"),
+    ("menu discounted", "/api/menus/discounted/", "/api/async/menus/discounted/"),
+    ("menu drinks", "/api/menus/drinks/", "/api/async/menus/drinks/"),
+    ("user profile", "/api/users/profile/", "/api/async/users/profile/"),
+    (
+        "customer orders",
+        "/api/orders/customer_orders/",
+        "/api/async/orders/customer_orders/",
+    ),
+]
+
+
+def setup_database(database_url, menus, orders):
+    """
+    Migrate and seed the benchmark database; return a logged-in session id.
+    """
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "oreconfig.settings")
+    sys.path.insert(0, str(BASE_DIR))
+
+    import django
+
+    django.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.test import Client
+
+    from oreapp.models import Menu
+    from oreapp.orders import create_order_batch
+
+    call_command("migrate", verbosity=0)
+    Menu.objects.bulk_create(
+        [
+            Menu(
+                name=f"Dish {i}",
+                description="A dish from the benchmark menu. " * 4,
+                price=5 + i % 20,
+                is_discounted=i % 7 == 0,
+                is_drink=i % 5 == 0,
+            )
+            for i in range(menus)
+        ]
+    )
+    customer = get_user_model().objects.create_user(username="bench", password="bench")
+    menu_ids = list(Menu.objects.values_list("id", flat=True)[:10])
+    for start in range(0, orders, 500):
+        batch = range(start, min(start + 500, orders))
+        create_order_batch(
+            customer, [{"menu_items": menu_ids[: 1 + n % 5]} for n in batch]
+        )
+    client = Client()
+    client.login(username="bench", password="bench")
+    return client.cookies["sessionid"].value
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, env):
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "oreconfig.asgi:application",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+
+async def read_response(reader):
+    """
+    Read one HTTP/1.1 response and return its status code.
+    """
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    length, chunked = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value:
+            chunked = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status
+
+
+async def drive(port, path, session_id, requests, concurrency):
+    """
+    Issue ``requests`` GETs for ``path`` over ``concurrency`` connections.
+    """
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+        f"Cookie: sessionid={session_id}\r\nAccept: application/json\r\n\r\n"
+    ).encode()
+    latencies = []
+    remaining = [requests]
+
+    async def worker():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                started = time.perf_counter()
+                writer.write(request)
+                status = await read_response(reader)
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    raise RuntimeError(f"{path} returned {status}")
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--menus", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{tmp}/bench.sqlite3"
+        session_id = setup_database(database_url, args.menus, args.orders)
+        env = {**os.environ, "DATABASE_URL": database_url}
+        port = free_port()
+        server = start_server(port, env)
+        try:
+            results = {}
+            for name, sync_path, async_path in ENDPOINTS:
+                for kind, path in (("sync", sync_path), ("async", async_path)):
+                    # Warm up caches and connections before measuring.
+                    asyncio.run(drive(port, path, session_id, 50, 4))
+                    results[f"{name} ({kind})"] = asyncio.run(
+                        drive(port, path, session_id, args.requests, args.concurrency)
+                    )
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{'endpoint':<28}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<28}{result['throughput_rps']:>10}"
+            f"{result['p50_ms']:>10}{result['p99_ms']:>10}"
+        )
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
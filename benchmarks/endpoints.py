@@ -0,0 +1,434 @@
+"""
+Benchmark every route in oreapp/urls.py and gate on regressions.
+
+The script migrates and seeds a throwaway SQLite database, then drives each
+route through the Django test client (sequentially, capturing SQL query
+counts) and through the ASGI app via the async test client (concurrently).
+For each endpoint it records throughput, p50/p95/p99 latency and queries per
+request, writes the results as JSON and, given a baseline, exits non-zero
+if any endpoint regressed beyond the tolerances.
+
+Routes are discovered from the URLconf. Safe methods run against every
+route; other methods run only for the routes in WRITE_REQUESTS, and the
+rest are listed as skipped so new routes never go unnoticed.
+
+    python benchmarks/endpoints.py --output results.json
+    python benchmarks/endpoints.py --baseline benchmarks/baseline.json
+
+Latency and throughput depend on the machine, so regenerate the baseline
+(``--output benchmarks/baseline.json``) where the comparison runs. Query
+counts do not, and default to no tolerance at all.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Query strings for routes that need one to do real work.
+QUERY_PARAMS = {
+    "menu-search": {"q": "dish"},
+    "menu-autocomplete": {"q": "dis"},
+    "order-customer-orders": {"page_size": "50"},
+}
+
+# Non-GET requests worth benchmarking, as route name -> (method, body factory).
+# Each factory gets the seeded fixtures and returns a JSON-serializable body.
+WRITE_REQUESTS = {
+    "order-list": ("POST", lambda fx: {"menu_items": fx["menu_ids"][:3]}),
+    "order-bulk": (
+        "POST",
+        lambda fx: [{"menu_items": fx["menu_ids"][:3]} for _ in range(10)],
+    ),
+    "token_obtain": (
+        "POST",
+        lambda fx: {"username": "bench-staff", "password": "bench"},
+    ),
+}
+
+SAFE_METHODS = {"GET"}
+
+# Routes whose responses never end, such as Server-Sent Events streams.
+STREAMING_ROUTES = {"async_order_feed"}
+
+# Deliberately slow routes (full exports, password hashing) run fewer times.
+MAX_ITERATIONS = {
+    "GET order-export": 10,
+    "POST token_obtain": 10,
+}
+
+
+def setup_database(database_url, menus, orders):
+    """
+    Migrate and seed the benchmark database; return the fixtures routes need.
+    """
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "oreconfig.settings")
+    sys.path.insert(0, str(BASE_DIR))
+
+    import django
+
+    django.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.test.utils import setup_test_environment
+
+    from oreapp.models import Menu, Order
+    from oreapp.orders import create_order_batch
+
+    # Benchmark with DEBUG off, as in production; it also keeps the query log
+    # from filling up so CaptureQueriesContext counts stay accurate.
+    setup_test_environment(debug=False)
+    call_command("migrate", verbosity=0)
+    Menu.objects.bulk_create(
+        [
+            Menu(
+                name=f"Dish {i}",
+                description="A dish from the benchmark menu. " * 4,
+                price=5 + i % 20,
+                is_discounted=i % 7 == 0,
+                is_drink=i % 5 == 0,
+            )
+            for i in range(menus)
+        ]
+    )
+    User = get_user_model()
+    staff = User.objects.create_user(
+        username="bench-staff",
+        password="bench",
+        is_staff=True,
+        is_staff_member=True,
+    )
+    customers = [
+        User.objects.create_user(username=f"bench-{i}", password="bench")
+        for i in range(10)
+    ]
+    menu_ids = list(Menu.objects.values_list("id", flat=True))
+    for start in range(0, orders, 500):
+        batch = range(start, min(start + 500, orders))
+        create_order_batch(
+            customers[start // 500 % len(customers)],
+            [{"menu_items": menu_ids[n % menus :][: 1 + n % 5]} for n in batch],
+        )
+    return {
+        "staff": staff,
+        "menu_ids": menu_ids,
+        "pks": {
+            "menu": menu_ids[0],
+            "user": customers[0].pk,
+            "order": Order.objects.values_list("pk", flat=True).first(),
+        },
+    }
+
+
+def view_methods(callback):
+    """
+    Return the HTTP methods a URL pattern's view answers, upper-cased.
+    """
+    actions = getattr(callback, "actions", None)
+    if actions:
+        return sorted(method.upper() for method in actions)
+    view_class = getattr(callback, "view_class", None)
+    if view_class is not None:
+        return sorted(
+            method.upper()
+            for method in view_class.http_method_names
+            if hasattr(view_class, method) and method not in ("head", "options")
+        )
+    # Plain function views, such as async_views, are GET-only.
+    return ["GET"]
+
+
+def discover_routes():
+    """
+    Return (name, kwarg names, methods) for every named route in oreapp.urls.
+    """
+    from django.urls import URLResolver
+
+    from oreapp import urls
+
+    routes = []
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+                continue
+            kwargs = sorted(pattern.pattern.regex.groupindex)
+            # The router registers every route again with a .json suffix.
+            if pattern.name and "format" not in kwargs:
+                routes.append((pattern.name, kwargs, view_methods(pattern.callback)))
+
+    walk(urls.urlpatterns)
+    return routes
+
+
+def build_requests(routes, fixtures):
+    """
+    Split the discovered routes into benchmark requests and skipped ones.
+    """
+    from django.urls import reverse
+
+    requests, skipped = [], []
+    for name, kwargs, methods in routes:
+        pk = fixtures["pks"].get(name.split("-")[0])
+        path = reverse(name, kwargs={kwarg: pk for kwarg in kwargs})
+        for method in methods:
+            if name in STREAMING_ROUTES:
+                skipped.append(f"{method} {name}")
+                continue
+            if method in SAFE_METHODS:
+                body = None
+            elif WRITE_REQUESTS.get(name, (None,))[0] == method:
+                body = WRITE_REQUESTS[name][1](fixtures)
+            else:
+                skipped.append(f"{method} {name}")
+                continue
+            requests.append(
+                {
+                    "key": f"{method} {name}",
+                    "method": method,
+                    "path": path,
+                    "params": QUERY_PARAMS.get(name, {}),
+                    "body": body,
+                }
+            )
+    return requests, skipped
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+    }
+
+
+def send(client, request):
+    method = getattr(client, request["method"].lower())
+    if request["body"] is None:
+        return method(request["path"], request["params"])
+    path = request["path"]
+    if request["params"]:
+        path = f"{path}?{urlencode(request['params'])}"
+    return method(path, json.dumps(request["body"]), content_type="application/json")
+
+
+def fetch(client, request):
+    """
+    Send ``request`` and read the whole body, including streamed ones.
+    """
+    response = send(client, request)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+async def afetch(client, request):
+    response = await send(client, request)
+    if response.streaming:
+        async for _ in response:
+            pass
+    return response
+
+
+def run_client(client, request, iterations):
+    """
+    Drive ``request`` through the sync test client; return stats, query count
+    and status code.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    # The first request warms caches; count queries on a warm one.
+    fetch(client, request)
+    with CaptureQueriesContext(connection) as queries:
+        response = fetch(client, request)
+    # Read the count now: the next request resets the connection's query log.
+    query_count = len(queries)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        request_started = time.perf_counter()
+        fetch(client, request)
+        latencies.append(time.perf_counter() - request_started)
+    stats = summarize(latencies, time.perf_counter() - started)
+    return stats, query_count, response.status_code
+
+
+async def run_asgi(client, request, iterations, concurrency):
+    """
+    Drive ``request`` through the ASGI handler with ``concurrency`` workers.
+    """
+    latencies = []
+    remaining = [iterations]
+
+    async def worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            request_started = time.perf_counter()
+            await afetch(client, request)
+            latencies.append(time.perf_counter() - request_started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run(fixtures, iterations, concurrency):
+    from django.test import AsyncClient, Client
+
+    client = Client()
+    client.force_login(fixtures["staff"])
+    async_client = AsyncClient()
+    async_client.cookies = client.cookies
+
+    requests, skipped = build_requests(discover_routes(), fixtures)
+    results = {}
+    for request in requests:
+        count = min(iterations, MAX_ITERATIONS.get(request["key"], iterations))
+        stats, queries, status_code = run_client(client, request, count)
+        results[request["key"]] = {
+            "path": request["path"],
+            "status": status_code,
+            "queries": queries,
+            "client": stats,
+            "asgi": asyncio.run(run_asgi(async_client, request, count, concurrency)),
+        }
+    return results, skipped
+
+
+def compare(
+    results, baseline, latency_tolerance, throughput_tolerance, query_tolerance
+):
+    """
+    Return a list of human-readable regressions of ``results`` against
+    ``baseline``.
+    """
+    regressions = []
+    for key, base in baseline["results"].items():
+        current = results.get(key)
+        if current is None:
+            regressions.append(f"{key}: missing from this run")
+            continue
+        if current["status"] != base["status"]:
+            regressions.append(f"{key}: status {base['status']} -> {current['status']}")
+        if current["queries"] > base["queries"] + query_tolerance:
+            regressions.append(
+                f"{key}: queries {base['queries']} -> {current['queries']}"
+            )
+        for driver in ("client", "asgi"):
+            was, now = base[driver], current[driver]
+            if now["p95_ms"] > was["p95_ms"] * (1 + latency_tolerance):
+                regressions.append(
+                    f"{key} ({driver}): p95 {was['p95_ms']}ms -> {now['p95_ms']}ms"
+                )
+            if now["throughput_rps"] < was["throughput_rps"] * (
+                1 - throughput_tolerance
+            ):
+                regressions.append(
+                    f"{key} ({driver}): throughput {was['throughput_rps']} -> "
+                    f"{now['throughput_rps']} req/s"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--menus", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument(
+        "--latency-tolerance",
+        type=float,
+        default=0.25,
+        help="allowed relative p95 increase (default 0.25)",
+    )
+    parser.add_argument(
+        "--throughput-tolerance",
+        type=float,
+        default=0.25,
+        help="allowed relative throughput drop (default 0.25)",
+    )
+    parser.add_argument(
+        "--query-tolerance",
+        type=int,
+        default=0,
+        help="allowed extra queries per request (default 0)",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = setup_database(
+            f"sqlite:///{tmp}/bench.sqlite3", args.menus, args.orders
+        )
+        results, skipped = run(fixtures, args.iterations, args.concurrency)
+
+    print(
+        f"{'endpoint':<36}{'status':>7}{'queries':>8}"
+        f"{'req/s':>9}{'p50':>8}{'p95':>8}{'p99':>8}{'asgi req/s':>12}{'p95':>8}"
+    )
+    for key, result in results.items():
+        client, asgi = result["client"], result["asgi"]
+        print(
+            f"{key:<36}{result['status']:>7}{result['queries']:>8}"
+            f"{client['throughput_rps']:>9}{client['p50_ms']:>8.2f}"
+            f"{client['p95_ms']:>8.2f}{client['p99_ms']:>8.2f}"
+            f"{asgi['throughput_rps']:>12}{asgi['p95_ms']:>8.2f}"
+        )
+    if skipped:
+        print(f"\nskipped (no benchmark request defined): {', '.join(skipped)}")
+
+    if args.output:
+        Path(args.output).write_text(
+            json.dumps(
+                {
+                    "settings": {
+                        "iterations": args.iterations,
+                        "concurrency": args.concurrency,
+                        "menus": args.menus,
+                        "orders": args.orders,
+                    },
+                    "results": results,
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(
+            results,
+            baseline,
+            args.latency_tolerance,
+            args.throughput_tolerance,
+            args.query_tolerance,
+        )
+        if regressions:
+            print("\nregressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nno regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
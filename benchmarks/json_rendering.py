@@ -0,0 +1,108 @@
+"""
+Microbenchmark JSON serialization of large result sets: DRF's stock
+JSONRenderer and JSONParser against the orjson-backed ones in
+oreapp/renderers.py, and serializer output against plain ``.values()`` rows.
+
+The script migrates and seeds a throwaway SQLite database (see
+endpoints.py), then times each case over the whole menu and order tables,
+reporting the median and best time per run and the payload size. Database
+time is included, as it is for a real request.
+
+    python benchmarks/json_rendering.py --menus 10000 --orders 10000
+"""
+
+import argparse
+import io
+import statistics
+import tempfile
+import time
+
+from endpoints import setup_database
+
+
+def cases():
+    """
+    Return (name, callable) pairs; each callable returns the bytes it encoded.
+    """
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from oreapp.models import Menu, Order
+    from oreapp.renderers import FastJSONParser, FastJSONRenderer
+    from oreapp.serializers import MenuSerializer, OrderSerializer
+    from oreapp.views import values_columns
+
+    stock, fast = JSONRenderer(), FastJSONRenderer()
+    menus = Menu.objects.order_by("id")
+    orders = Order.objects.select_related("customer").prefetch_related(
+        "items__menu"
+    )
+    columns = values_columns(MenuSerializer())
+    body = fast.render(list(menus.values(*columns)))
+
+    def parse(parser):
+        def run():
+            parser.parse(io.BytesIO(body))
+            return body
+
+        return run
+
+    return [
+        (
+            "menus: stock renderer + serializer",
+            lambda: stock.render(MenuSerializer(menus, many=True).data),
+        ),
+        (
+            "menus: fast renderer + serializer",
+            lambda: fast.render(MenuSerializer(menus, many=True).data),
+        ),
+        (
+            "menus: fast renderer + values()",
+            lambda: fast.render(list(menus.values(*columns))),
+        ),
+        (
+            "orders: stock renderer + serializer",
+            lambda: stock.render(OrderSerializer(orders, many=True).data),
+        ),
+        (
+            "orders: fast renderer + serializer",
+            lambda: fast.render(OrderSerializer(orders, many=True).data),
+        ),
+        ("menus: stock parser", parse(JSONParser())),
+        ("menus: fast parser", parse(FastJSONParser())),
+    ]
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        payload = function()
+        timings.append(time.perf_counter() - started)
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "best_ms": round(min(timings) * 1000, 1),
+        "bytes": len(payload),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--menus", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_database(f"sqlite:///{tmp}/bench.sqlite3", args.menus, args.orders)
+        print(f"{'case':<40}{'median ms':>11}{'best ms':>10}{'bytes':>12}")
+        for name, function in cases():
+            result = measure(function, args.repeat)
+            print(
+                f"{name:<40}{result['median_ms']:>11}{result['best_ms']:>10}"
+                f"{result['bytes']:>12}"
+            )
+
+
+if __name__ == "__main__":
+    main()
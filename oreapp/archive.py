@@ -0,0 +1,408 @@
+"""
+Hot/cold storage for orders.
+
+Orders older than ORE_ORDER_ARCHIVE["AGE_DAYS"] are rarely read, but they
+keep the Order and OrderItem tables and their indexes growing.
+``manage.py archive_orders`` moves them into gzip-compressed NDJSON files
+under DIRECTORY, BATCH_SIZE orders per file, in the format of the NDJSON
+export. Each batch is one transaction: the file is written and synced, an
+OrderArchive row records it, and the orders are deleted. If the transaction
+fails the file is removed, so every order is in exactly one place.
+
+Within a file each customer's orders form their own gzip member, newest
+first. An ArchivedOrderSegment row records where the member starts, its
+length and its time range. Reading a customer's history therefore
+decompresses only their members, and only in the files that can hold the
+requested page. customer_orders merges these orders into its keyset pages,
+so clients page from hot orders into archived ones without noticing, and the
+order export streams them ahead of the hot orders. The
+time of the newest archived order is cached for BOUNDARY_TTL seconds in the
+Django cache BOUNDARY_CACHE, so pages that cannot reach the archive cost no
+extra query. Archiving drops the cached time when its transaction commits,
+so BOUNDARY_CACHE must be shared by every process serving the API and
+``manage.py archive_orders``.
+
+Archived orders still count as placed. Archiving does not reduce the order
+counters or the sales rollups, and OrderArchive keeps the per-day counts
+that counters.reconcile() needs. Archived orders are read-only. Their menu
+items can be expanded only while the menu entry still exists.
+"""
+
+import contextvars
+import datetime
+import gzip
+import hashlib
+import os
+from collections import Counter as Tally
+from collections import defaultdict
+from decimal import Decimal
+from pathlib import Path
+
+import orjson
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import DjangoCacheBackend
+from .exports import order_document
+from .models import (
+    ArchivedOrderSegment,
+    Menu,
+    Order,
+    OrderArchive,
+    OrderItem,
+    set_prefetched,
+)
+from .renderers import default
+
+DEFAULT_ORDER_ARCHIVE = {
+    # Orders placed longer ago than this are moved to the archive.
+    "AGE_DAYS": 365,
+    # Where archive files are written. Archiving is disabled while None.
+    "DIRECTORY": None,
+    # Orders moved per transaction, and so per file.
+    "BATCH_SIZE": 1000,
+    # How long the time of the newest archived order is cached, and in which
+    # of the CACHES. Archiving invalidates it, so the cache must be shared.
+    "BOUNDARY_TTL": 60,
+    "BOUNDARY_CACHE": "default",
+}
+
+BOUNDARY_KEY = "ore:archived-until"
+
+_archiving = contextvars.ContextVar("ore_archiving_orders", default=False)
+
+
+def archive_settings():
+    return {**DEFAULT_ORDER_ARCHIVE, **getattr(settings, "ORE_ORDER_ARCHIVE", {})}
+
+
+def archive_directory(config=None):
+    config = config or archive_settings()
+    if config["DIRECTORY"] is None:
+        raise ImproperlyConfigured('ORE_ORDER_ARCHIVE["DIRECTORY"] is not set.')
+    return Path(config["DIRECTORY"])
+
+
+def is_archiving():
+    """
+    True while archive_batch() deletes the orders it has just archived.
+    """
+    return _archiving.get()
+
+
+def order_key(order):
+    # The keyset of OrderCursorPagination.
+    return order.created_at, order.pk
+
+
+def archive_cutoff(config=None):
+    config = config or archive_settings()
+    return timezone.now() - datetime.timedelta(days=config["AGE_DAYS"])
+
+
+def encode_segment(orders):
+    lines = b"".join(
+        orjson.dumps(
+            order_document(order), default=default, option=orjson.OPT_APPEND_NEWLINE
+        )
+        for order in orders
+    )
+    # A fixed mtime keeps the files reproducible.
+    return gzip.compress(lines, mtime=0)
+
+
+def write_archive(target, orders):
+    """
+    Write ``orders`` to ``target``, one gzip member per customer, and return
+    the file's SHA-256 and its unsaved ArchivedOrderSegments.
+    """
+    by_customer = defaultdict(list)
+    for order in orders:
+        by_customer[order.customer_id].append(order)
+
+    digest = hashlib.sha256()
+    segments = []
+    offset = 0
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(f"{target.name}.partial")
+    try:
+        with open(partial, "wb") as file:
+            for customer_id, customer_orders in sorted(by_customer.items()):
+                customer_orders.sort(key=order_key, reverse=True)
+                member = encode_segment(customer_orders)
+                file.write(member)
+                digest.update(member)
+                segments.append(
+                    ArchivedOrderSegment(
+                        customer_id=customer_id,
+                        offset=offset,
+                        length=len(member),
+                        order_count=len(customer_orders),
+                        first_created_at=customer_orders[-1].created_at,
+                        last_created_at=customer_orders[0].created_at,
+                    )
+                )
+                offset += len(member)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(partial, target)
+    finally:
+        partial.unlink(missing_ok=True)
+    return digest.hexdigest(), segments
+
+
+def archive_batch(cutoff, config=None):
+    """
+    Move up to BATCH_SIZE orders placed before ``cutoff``, oldest first, to a
+    new archive file. Return its OrderArchive, or None if no orders are left.
+    """
+    config = config or archive_settings()
+    directory = archive_directory(config)
+    target = None
+    try:
+        with transaction.atomic():
+            orders = list(
+                Order.objects.filter(created_at__lt=cutoff)
+                .order_by("created_at", "id")
+                .select_for_update()
+                .prefetch_related("items")[: config["BATCH_SIZE"]]
+            )
+            if not orders:
+                return None
+            first, last = orders[0], orders[-1]
+            path = (
+                Path(f"{first.created_at:%Y/%m}")
+                / f"orders-{first.pk}-{last.pk}.ndjson.gz"
+            )
+            target = directory / path
+            sha256, segments = write_archive(target, orders)
+
+            per_day = Tally(
+                timezone.localdate(order.created_at).isoformat() for order in orders
+            )
+            archive = OrderArchive.objects.create(
+                path=path.as_posix(),
+                sha256=sha256,
+                order_count=len(orders),
+                orders_per_day=dict(per_day),
+                first_created_at=first.created_at,
+                last_created_at=max(order.created_at for order in orders),
+            )
+            for segment in segments:
+                segment.archive = archive
+            ArchivedOrderSegment.objects.bulk_create(segments)
+
+            forget()
+            transaction.on_commit(forget)
+            token = _archiving.set(True)
+            try:
+                Order.objects.filter(pk__in=[order.pk for order in orders]).delete()
+            finally:
+                _archiving.reset(token)
+    except BaseException:
+        if target is not None:
+            target.unlink(missing_ok=True)
+        raise
+    return archive
+
+
+def archive_orders(cutoff=None, config=None):
+    """
+    Archive every order placed before ``cutoff`` (default: AGE_DAYS ago) and
+    return the new OrderArchives.
+    """
+    config = config or archive_settings()
+    cutoff = cutoff or archive_cutoff(config)
+    archives = []
+    while (archive := archive_batch(cutoff, config)) is not None:
+        archives.append(archive)
+    return archives
+
+
+def boundary_cache(config=None):
+    config = config or archive_settings()
+    return DjangoCacheBackend(config["BOUNDARY_CACHE"])
+
+
+def archived_until():
+    """
+    Return when the newest archived order was placed, or None if nothing has
+    been archived, caching the answer for BOUNDARY_TTL.
+    """
+    config = archive_settings()
+    cache = boundary_cache(config)
+    cached = cache.get(BOUNDARY_KEY)
+    if cached is None:
+        last = OrderArchive.objects.aggregate(last=Max("last_created_at"))["last"]
+        cached = (last,)
+        cache.set(BOUNDARY_KEY, cached, config["BOUNDARY_TTL"])
+    return cached[0]
+
+
+def forget():
+    """
+    Drop the cached archived_until() for every process.
+    """
+    boundary_cache().delete(BOUNDARY_KEY)
+
+
+def order_from_document(document):
+    """
+    Rebuild an unsaved Order, with its items prefetched, from an archived
+    document, so OrderSerializer renders it like a stored order.
+    """
+    order = Order(
+        id=document["id"],
+        customer_id=document["customer"],
+        created_at=parse_datetime(document["created_at"]),
+        total=Decimal(document["total"]),
+    )
+    order._state.adding = False
+    order._state.db = DEFAULT_DB_ALIAS
+    items = [
+        OrderItem(
+            order=order,
+            menu_id=item["menu_item"],
+            quantity=item["quantity"],
+            unit_price=Decimal(item["unit_price"]),
+        )
+        for item in document["items"]
+    ]
+    set_prefetched(order, "items", OrderItem.objects.all(), items)
+    return order
+
+
+def read_segment(segment, directory):
+    with open(directory / segment.archive.path, "rb") as file:
+        file.seek(segment.offset)
+        member = file.read(segment.length)
+    return [orjson.loads(line) for line in gzip.decompress(member).splitlines()]
+
+
+def archived_orders(limit, customer=None, before=None, after=None, menus=False):
+    """
+    Return up to ``limit`` archived orders, newest first, like a page of
+    OrderCursorPagination: keyed below ``before`` and above ``after`` when
+    given, and only ``customer``'s unless that is None. With ``menus``, each
+    order's menu_items are prefetched too.
+    """
+    segments = ArchivedOrderSegment.objects.select_related("archive").order_by(
+        "-last_created_at", "-pk"
+    )
+    if customer is not None:
+        segments = segments.filter(customer=customer)
+    if before is not None:
+        segments = segments.filter(first_created_at__lte=before[0])
+    if after is not None:
+        segments = segments.filter(last_created_at__gte=after[0])
+
+    found = []
+    directory = None
+    for segment in segments.iterator(chunk_size=100):
+        if len(found) >= limit and found[-1].created_at > segment.last_created_at:
+            # This and every later segment hold only older orders.
+            break
+        directory = directory or archive_directory()
+        for document in read_segment(segment, directory):
+            order = order_from_document(document)
+            key = order_key(order)
+            if (before is None or key < before) and (after is None or key > after):
+                found.append(order)
+        found.sort(key=order_key, reverse=True)
+        del found[limit:]
+
+    if menus and found:
+        by_id = Menu.objects.in_bulk(
+            {item.menu_id for order in found for item in order.items.all()}
+        )
+        for order in found:
+            set_prefetched(
+                order,
+                "menu_items",
+                Menu.objects.all(),
+                [by_id[i.menu_id] for i in order.items.all() if i.menu_id in by_id],
+            )
+    return found
+
+
+def iter_archived_orders(start=None, end=None):
+    """
+    Yield the archived orders placed in [start, end), oldest first, for the
+    order export. Archives are written oldest first, so each file is read
+    and sorted on its own, one at a time.
+    """
+    archives = OrderArchive.objects.order_by("first_created_at", "pk")
+    if start is not None:
+        archives = archives.filter(last_created_at__gte=start)
+    if end is not None:
+        archives = archives.filter(first_created_at__lt=end)
+    directory = None
+    for stored in list(archives):
+        directory = directory or archive_directory()
+        content = gzip.decompress((directory / stored.path).read_bytes())
+        documents = [orjson.loads(line) for line in content.splitlines()]
+        for order in sorted(map(order_from_document, documents), key=order_key):
+            if (start is None or order.created_at >= start) and (
+                end is None or order.created_at < end
+            ):
+                yield order
+
+
+def with_archived(rows, paginator, customer=None, menus=False):
+    """
+    Merge archived orders into ``rows``, the hot orders fetched by
+    paginator.get_page_queryset(), keeping its order and length.
+    """
+    until = archived_until()
+    if until is None:
+        return rows
+    limit = paginator.page_size + 1
+    after = None
+    if len(rows) == limit:
+        # A full page of hot orders can only be displaced by newer archived
+        # ones.
+        if rows[-1].created_at > until:
+            return rows
+        after = order_key(rows[-1])
+    archived = archived_orders(
+        limit, customer, before=paginator.cursor, after=after, menus=menus
+    )
+    if not archived:
+        return rows
+    return sorted(rows + archived, key=order_key, reverse=True)[:limit]
+
+
+def archived_order_count():
+    return OrderArchive.objects.aggregate(total=Sum("order_count"))["total"] or 0
+
+
+def archived_orders_per_day(start=None, end=None):
+    """
+    Return {"YYYY-MM-DD": count} of archived orders, optionally only from
+    archives overlapping [start, end).
+    """
+    archives = OrderArchive.objects.all()
+    if start is not None:
+        archives = archives.filter(last_created_at__gte=start)
+    if end is not None:
+        archives = archives.filter(first_created_at__lt=end)
+    per_day = Tally()
+    for counts in archives.values_list("orders_per_day", flat=True).iterator():
+        per_day.update(counts)
+    return per_day
+
+
+def hot_since():
+    """
+    Return the start of the first day with no archived orders, or None if
+    nothing has been archived.
+    """
+    last = OrderArchive.objects.aggregate(last=Max("last_created_at"))["last"]
+    if last is None:
+        return None
+    day = timezone.localdate(last) + datetime.timedelta(days=1)
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
@@ -0,0 +1,204 @@
+"""
+Native async versions of the hottest read endpoints, for ASGI deployments.
+
+These are plain Django async views rather than DRF viewsets, so under uvicorn
+a request stays on the event loop instead of hopping through the sync view
+stack in a worker thread. They return the same payloads as their sync
+counterparts in views.py, which remain the ones to use under WSGI.
+"""
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotFound, ValidationError
+from rest_framework.request import Request
+
+from . import archive
+from .authentication import SignedTokenAuthentication
+from .cache import menu_cache
+from .conditional import acollection_state, add_validators, make_etag, not_modified
+from .kitchen_feed import order_events
+from .models import Menu, Order
+from .pagination import OrderCursorPagination
+from .serializers import (
+    MenuSerializer,
+    OrderSerializer,
+    UserSerializer,
+    requested_fields,
+)
+
+User = get_user_model()
+
+JSON_DUMPS_PARAMS = {"ensure_ascii": False, "separators": (",", ":")}
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return JsonResponse(
+        data, status=status_code, safe=False, json_dumps_params=JSON_DUMPS_PARAMS
+    )
+
+
+def not_authenticated():
+    return forbidden("Authentication credentials were not provided.")
+
+
+def forbidden(detail):
+    return json_response({"detail": detail}, status_code=status.HTTP_403_FORBIDDEN)
+
+
+async def authenticate(request):
+    """
+    Return the request's user, or a response rejecting its bearer token.
+
+    As in DEFAULT_AUTHENTICATION_CLASSES, the session user comes first and
+    a bearer token is tried only without one.
+    """
+    user = await request.auser()
+    if user.is_authenticated or "Authorization" not in request.headers:
+        return user, None
+    try:
+        result = await sync_to_async(SignedTokenAuthentication().authenticate)(
+            Request(request)
+        )
+    except AuthenticationFailed as exc:
+        return None, forbidden(exc.detail)
+    return (result[0] if result else user), None
+
+
+async def cached_menus(request, action, queryset):
+    params = sorted(request.GET.lists())
+    fields = None
+    if request.GET.get("fields"):
+        try:
+            fields = requested_fields(request.GET["fields"], MenuSerializer().fields)
+        except ValidationError as exc:
+            return json_response(exc.detail, status_code=exc.status_code)
+    context = {} if fields is None else {"fields": fields}
+
+    async def serialize():
+        state = await acollection_state(queryset)
+        menus = [menu async for menu in queryset]
+        data = MenuSerializer(menus, many=True, context=context).data
+        return {"state": state, "data": list(data)}
+
+    # The key of MenuViewSet.cached_response's serializer-built entries.
+    key = (action, params, None if fields is None else sorted(fields))
+    entry = await menu_cache.aget_or_set(key, serialize)
+    count, last_modified = entry["state"]
+    # Same validators as MenuViewSet.cached_response, so ETags are shared.
+    etag = make_etag(action, params, "application/json", count, last_modified)
+    response = not_modified(request, etag, None) or json_response(entry["data"])
+    return add_validators(response, etag, None)
+
+
+@require_GET
+async def menu_list(request):
+    """
+    Async equivalent of MenuViewSet.list.
+    """
+    return await cached_menus(request, "list", Menu.objects.all())
+
+
+@require_GET
+async def menu_discounted(request):
+    """
+    Async equivalent of MenuViewSet.discounted.
+    """
+    return await cached_menus(
+        request, "discounted", Menu.objects.filter(is_discounted=True)
+    )
+
+
+@require_GET
+async def menu_drinks(request):
+    """
+    Async equivalent of MenuViewSet.drinks.
+    """
+    return await cached_menus(request, "drinks", Menu.objects.filter(is_drink=True))
+
+
+@require_GET
+async def user_profile(request):
+    """
+    Async equivalent of UserViewSet.profile.
+    """
+    user, rejected = await authenticate(request)
+    if rejected:
+        return rejected
+    if not user.is_authenticated:
+        return not_authenticated()
+    if user.get_deferred_fields():
+        # Token users carry only their claims; load the rest in one query.
+        user = await User.objects.aget(pk=user.pk)
+    return json_response(UserSerializer(user).data)
+
+
+@require_GET
+async def customer_orders(request):
+    """
+    Async equivalent of OrderViewSet.customer_orders.
+    """
+    user, rejected = await authenticate(request)
+    if rejected:
+        return rejected
+    if not user.is_authenticated:
+        return not_authenticated()
+    queryset = Order.objects.prefetch_related("items")
+    if not user.is_staff:
+        queryset = queryset.filter(customer=user)
+
+    paginator = OrderCursorPagination()
+    drf_request = Request(request)
+    try:
+        page_queryset = paginator.get_page_queryset(queryset, drf_request)
+    except NotFound as exc:
+        return json_response({"detail": exc.detail}, status_code=exc.status_code)
+    rows = [order async for order in page_queryset]
+    rows = await sync_to_async(archive.with_archived)(
+        rows, paginator, None if user.is_staff else user
+    )
+    page = paginator.set_page(rows)
+    serializer = OrderSerializer(
+        page, many=True, context={"request": drf_request, "expand": []}
+    )
+    return json_response(
+        {
+            "next": paginator.get_next_link(),
+            "first": paginator.get_first_link(),
+            "results": serializer.data,
+        }
+    )
+
+
+@require_GET
+async def order_feed(request):
+    """
+    Server-Sent Events stream of new orders for the kitchen display; see
+    kitchen_feed.py. Staff only.
+    """
+    user, rejected = await authenticate(request)
+    if rejected:
+        return rejected
+    if not user.is_authenticated:
+        return not_authenticated()
+    if not user.is_staff_member:
+        return forbidden("You do not have permission to perform this action.")
+    last_event_id = request.headers.get(
+        "Last-Event-ID", request.GET.get("last_event_id")
+    )
+    try:
+        last_id = int(last_event_id) if last_event_id is not None else None
+    except ValueError:
+        return json_response(
+            {"detail": "Last-Event-ID must be an order id."},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    response = StreamingHttpResponse(
+        order_events(last_id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Keep reverse proxies from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,147 @@
+"""
+Stateless bearer tokens for the API.
+
+A token is an HMAC-signed, timestamped copy of the claims permission checks
+need (user id, username, is_staff_member, is_staff) plus the user's
+token_version. Authenticating one builds the user from its claims, so
+``request.user.is_staff_member`` and friends cost no query; fields outside the
+claims are deferred and load on first access.
+
+Revocation is checked against a small per-process cache of each user's
+(is_active, is_staff_member, is_staff, token_version), so a user costs at most
+one query per REVOCATION_TTL seconds. Bumping token_version, deactivating the
+user or changing their role invalidates outstanding tokens within that window
+in every process, and immediately in the one that made the change.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .cache import LocMemLRUBackend
+
+DEFAULT_AUTH_TOKEN = {
+    "MAX_AGE": 60 * 60,
+    "REVOCATION_TTL": 30,
+}
+
+SALT = "oreapp.authentication.token"
+
+CLAIMS = ["id", "username", "is_staff_member", "is_staff"]
+
+_revocations = LocMemLRUBackend(max_entries=10000)
+
+
+def token_settings():
+    return {**DEFAULT_AUTH_TOKEN, **getattr(settings, "ORE_AUTH_TOKEN", {})}
+
+
+def issue_token(user):
+    """
+    Return a signed token for ``user``.
+    """
+    claims = [getattr(user, name) for name in CLAIMS]
+    return signing.TimestampSigner(salt=SALT).sign_object(
+        [*claims, user.token_version], compress=True
+    )
+
+
+def read_token(token):
+    """
+    Return the claims in ``token`` as a dict.
+
+    Raises ``signing.SignatureExpired`` or ``signing.BadSignature``.
+    """
+    *claims, version = signing.TimestampSigner(salt=SALT).unsign_object(
+        token, max_age=token_settings()["MAX_AGE"]
+    )
+    if len(claims) != len(CLAIMS):
+        raise signing.BadSignature("Unexpected token payload")
+    return {**dict(zip(CLAIMS, claims)), "token_version": version}
+
+
+def account_state(user_id):
+    """
+    Return (is_active, is_staff_member, is_staff, token_version) for the user,
+    or None if they no longer exist, caching the answer for REVOCATION_TTL.
+    """
+    state = _revocations.get(user_id)
+    if state is None:
+        state = (
+            get_user_model()
+            .objects.filter(pk=user_id)
+            .values_list("is_active", "is_staff_member", "is_staff", "token_version")
+            .first()
+        ) or ()
+        _revocations.set(user_id, state, token_settings()["REVOCATION_TTL"])
+    return state or None
+
+
+def forget(user_id):
+    """
+    Drop the cached account state for ``user_id`` in this process.
+    """
+    _revocations.delete(user_id)
+
+
+def is_revoked(claims):
+    state = account_state(claims["id"])
+    return state != (
+        True,
+        claims["is_staff_member"],
+        claims["is_staff"],
+        claims["token_version"],
+    )
+
+
+def revoke_tokens(user):
+    """
+    Invalidate every token issued to ``user`` so far.
+    """
+    get_user_model().objects.filter(pk=user.pk).update(
+        token_version=F("token_version") + 1
+    )
+    forget(user.pk)
+
+
+def token_user(claims):
+    """
+    Build the user from ``claims`` without a query; other fields are deferred.
+    """
+    User = get_user_model()
+    known = {**claims, "is_active": True}
+    # from_db() expects values in concrete field order.
+    names = [f.attname for f in User._meta.concrete_fields if f.attname in known]
+    return User.from_db(DEFAULT_DB_ALIAS, names, [known[name] for name in names])
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Authenticate ``Authorization: Bearer <token>`` headers issued by
+    ObtainTokenAPIView.
+    """
+
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed("Invalid token header.")
+        try:
+            claims = read_token(auth[1].decode())
+        except signing.SignatureExpired:
+            raise AuthenticationFailed("Token has expired.")
+        except (signing.BadSignature, UnicodeError, ValueError, TypeError):
+            raise AuthenticationFailed("Invalid token.")
+        if is_revoked(claims):
+            raise AuthenticationFailed("Token has been revoked.")
+        return token_user(claims), claims
+
+    def authenticate_header(self, request):
+        return self.keyword
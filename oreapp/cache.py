@@ -0,0 +1,252 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from .replicas import read_from_primary
+
+
+DEFAULT_RESPONSE_CACHE = {
+    "BACKEND": "oreapp.cache.LocMemLRUBackend",
+    "OPTIONS": {"max_entries": 512},
+    "TIMEOUT": 300,
+}
+
+
+def _initial_version():
+    # Start from a clock value rather than 0 so a version lost to eviction or a
+    # restart can never collide with one that still has entries cached.
+    return time.time_ns()
+
+
+class LocMemLRUBackend:
+    """
+    Process-local LRU store capped at ``max_entries``.
+
+    Versions are kept apart from the entries so that eviction never drops them.
+    With ``versions`` set to a Django CACHES alias, they are kept there
+    instead. A bump made by one process then stops every process from
+    reading entries stored under the old version, while the entries
+    themselves stay in memory. Without it, versions are process-local and a
+    write in one worker is not seen by the others until their entries
+    expire, which is only correct for a single-process deployment.
+    """
+
+    def __init__(self, max_entries=512, versions=None):
+        self.max_entries = max_entries
+        self._shared = DjangoCacheBackend(versions) if versions else None
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_version(self, name):
+        if self._shared is not None:
+            return self._shared.get_version(name)
+        with self._lock:
+            return self._versions.setdefault(name, _initial_version())
+
+    def bump_version(self, name):
+        if self._shared is not None:
+            return self._shared.bump_version(name)
+        with self._lock:
+            version = self._versions.get(name, _initial_version()) + 1
+            self._versions[name] = version
+            return version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    # Entries are in memory, so only shared versions need the async cache API.
+
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value, timeout=None):
+        self.set(key, value, timeout)
+
+    async def aget_version(self, name):
+        if self._shared is not None:
+            return await self._shared.aget_version(name)
+        return self.get_version(name)
+
+
+class DjangoCacheBackend:
+    """
+    Store entries in one of Django's configured CACHES, shared across workers.
+    """
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, timeout=None):
+        self.cache.set(key, value, timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def get_version(self, name):
+        key = f"version:{name}"
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, _initial_version(), None)
+            version = self.cache.get(key)
+        return version
+
+    def bump_version(self, name):
+        key = f"version:{name}"
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            version = _initial_version()
+            self.cache.set(key, version, None)
+            return version
+
+    def clear(self):
+        self.cache.clear()
+
+    async def aget(self, key):
+        return await self.cache.aget(key)
+
+    async def aset(self, key, value, timeout=None):
+        await self.cache.aset(key, value, timeout)
+
+    async def aget_version(self, name):
+        key = f"version:{name}"
+        version = await self.cache.aget(key)
+        if version is None:
+            await self.cache.aadd(key, _initial_version(), None)
+            version = await self.cache.aget(key)
+        return version
+
+
+class ResponseCache:
+    """
+    Cache of serialized response data, keyed by a namespace version.
+
+    Writers call ``invalidate()`` to bump the version; entries stored under an
+    older version are simply never read again and age out of the backend.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._backend = None
+        self._timeout = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            config = {
+                **DEFAULT_RESPONSE_CACHE,
+                **getattr(settings, "ORE_RESPONSE_CACHE", {}),
+            }
+            backend_class = import_string(config["BACKEND"])
+            self._backend = backend_class(**config.get("OPTIONS", {}))
+            self._timeout = config.get("TIMEOUT")
+        return self._backend
+
+    def make_key(self, *parts, version=None):
+        digest = hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()
+        if version is None:
+            version = self.backend.get_version(self.namespace)
+        return f"{self.namespace}:{version}:{digest}"
+
+    def get_or_set(self, parts, producer):
+        """
+        Return the cached value for ``parts``, calling ``producer`` on a miss.
+        """
+        key = self.make_key(*parts)
+        value = self.backend.get(key)
+        if value is not None:
+            self._record(hit=True)
+            return value
+        self._record(hit=False)
+        # A fill read from a lagging replica would be served as current for
+        # the whole version, so fills always read from the primary.
+        with read_from_primary():
+            value = producer()
+        self.backend.set(key, value, self._timeout)
+        return value
+
+    async def aget_or_set(self, parts, producer):
+        """
+        Async variant of get_or_set; ``producer`` is awaited on a miss.
+        """
+        version = await self.backend.aget_version(self.namespace)
+        key = self.make_key(*parts, version=version)
+        value = await self.backend.aget(key)
+        if value is not None:
+            self._record(hit=True)
+            return value
+        self._record(hit=False)
+        with read_from_primary():
+            value = await producer()
+        await self.backend.aset(key, value, self._timeout)
+        return value
+
+    def invalidate(self):
+        self.backend.bump_version(self.namespace)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def reset(self):
+        """
+        Drop all entries and counters, and re-read the configured backend.
+        """
+        if self._backend is not None:
+            self._backend.clear()
+        self._backend = None
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def _record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+menu_cache = ResponseCache("menu")
@@ -0,0 +1,77 @@
+"""
+HTTP validators for the menu endpoints.
+
+A menu collection's ETag is derived from the request (action, query string,
+media type) and the collection's row count and newest ``updated_at``, both of
+which one indexed aggregate query returns. Any insert or update moves the
+newest timestamp and any delete changes the count, so a client's copy can be
+confirmed current, and answered with a 304, without serializing anything.
+The list views cache that state in the same menu cache entry as the payload
+it describes, so revalidating a cached list costs no query at all.
+
+Collections are sent without Last-Modified: deleting the newest menu moves
+their newest ``updated_at`` backwards, so If-Modified-Since would confirm a
+copy that still shows it. A single menu's ``updated_at`` only moves forward,
+so retrieve sends both validators.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+DEFAULT_MENU_CACHE_CONTROL = {
+    "public": True,
+    "max_age": 60,
+    "s_maxage": 300,
+    "stale_while_revalidate": 60,
+}
+
+STATE_AGGREGATES = {"count": Count("id"), "last_modified": Max("updated_at")}
+
+
+def collection_state(queryset):
+    """
+    Return (row count, newest updated_at) for ``queryset`` in one query.
+    """
+    state = queryset.aggregate(**STATE_AGGREGATES)
+    return state["count"], state["last_modified"]
+
+
+async def acollection_state(queryset):
+    state = await queryset.aaggregate(**STATE_AGGREGATES)
+    return state["count"], state["last_modified"]
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(":".join(map(str, parts)).encode()).hexdigest())
+
+
+def not_modified(request, etag, last_modified):
+    """
+    Return a 304 response if the client's copy matches, else None. Pass
+    ``last_modified=None`` to revalidate by ETag only.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def add_validators(response, etag, last_modified):
+    """
+    Set ETag, Last-Modified and the shared Cache-Control on ``response``.
+    """
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    patch_cache_control(
+        response,
+        **getattr(settings, "ORE_MENU_CACHE_CONTROL", DEFAULT_MENU_CACHE_CONTROL)
+    )
+    patch_vary_headers(response, ["Accept"])
+    return response
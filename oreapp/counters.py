@@ -0,0 +1,120 @@
+import datetime
+from collections import Counter as Tally
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import archive
+from .models import Counter, Order
+
+
+REGISTERED_CUSTOMERS = "registered_customers"
+TOTAL_ORDERS = "orders"
+DAILY_ORDERS_PREFIX = "orders:"
+
+
+def orders_on(day):
+    """
+    Name of the counter holding the number of orders placed on ``day``.
+    """
+    return f"{DAILY_ORDERS_PREFIX}{day.isoformat()}"
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def compute(name):
+    """
+    Count ``name`` from scratch. Used to seed missing counters and to reconcile.
+    """
+    if name == REGISTERED_CUSTOMERS:
+        return get_user_model().objects.filter(is_staff_member=False).count()
+    if name == TOTAL_ORDERS:
+        return Order.objects.count() + archive.archived_order_count()
+    if name.startswith(DAILY_ORDERS_PREFIX):
+        day = datetime.date.fromisoformat(name[len(DAILY_ORDERS_PREFIX) :])
+        start, end = _day_bounds(day)
+        hot = Order.objects.filter(created_at__gte=start, created_at__lt=end).count()
+        return hot + archive.archived_orders_per_day(start, end)[day.isoformat()]
+    raise KeyError(name)
+
+
+def read(name):
+    """
+    Return the current value of ``name``.
+
+    A counter that has not been seeded yet is counted from scratch. Seeding
+    is left to increment(), since a write here would pin the client to the
+    primary database (see replicas.py).
+    """
+    value = Counter.objects.filter(name=name).values_list("value", flat=True).first()
+    return compute(name) if value is None else value
+
+
+def increment(name, amount=1):
+    """
+    Add ``amount`` to ``name`` in the caller's transaction.
+
+    A counter that does not exist yet is seeded with a full count instead,
+    which already includes the change being recorded.
+    """
+    if not amount:
+        return
+    if Counter.objects.filter(name=name).update(value=F("value") + amount):
+        return
+    try:
+        with transaction.atomic():
+            Counter.objects.create(name=name, value=compute(name))
+    except IntegrityError:
+        # Another transaction seeded it first.
+        Counter.objects.filter(name=name).update(value=F("value") + amount)
+
+
+def record_orders(orders, amount=1):
+    """
+    Add (or with ``amount=-1`` remove) ``orders`` to the order counters.
+    """
+    increment(TOTAL_ORDERS, amount * len(orders))
+    per_day = Tally(timezone.localdate(order.created_at) for order in orders)
+    for day, count in per_day.items():
+        increment(orders_on(day), amount * count)
+
+
+@transaction.atomic
+def reconcile():
+    """
+    Recompute every counter and correct any drift.
+
+    Returns ``(name, stored, actual)`` for each counter that was wrong.
+    """
+    actual = {
+        REGISTERED_CUSTOMERS: compute(REGISTERED_CUSTOMERS),
+        TOTAL_ORDERS: compute(TOTAL_ORDERS),
+    }
+    daily = (
+        Order.objects.annotate(day=TruncDate("created_at"))
+        .values("day")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    actual.update({orders_on(row["day"]): row["count"] for row in daily})
+    for day, count in archive.archived_orders_per_day().items():
+        name = orders_on(datetime.date.fromisoformat(day))
+        actual[name] = actual.get(name, 0) + count
+
+    stored = dict(Counter.objects.select_for_update().values_list("name", "value"))
+    for name in stored:
+        if name.startswith(DAILY_ORDERS_PREFIX):
+            actual.setdefault(name, 0)
+
+    drift = []
+    for name, value in sorted(actual.items()):
+        if stored.get(name) != value:
+            drift.append((name, stored.get(name), value))
+            Counter.objects.update_or_create(name=name, defaults={"value": value})
+    return drift
@@ -0,0 +1,31 @@
+"""
+API documentation annotations that cost nothing when drf_yasg is not installed.
+
+The API-only settings (oreconfig/settings_api.py) leave drf_yasg out of
+INSTALLED_APPS, and importing it alone adds about 100ms to a worker's start,
+mostly through pkg_resources. Views therefore import swagger_auto_schema
+from here: it annotates them for drf_yasg when the docs are installed and
+returns them unchanged otherwise.
+"""
+
+from django.apps import apps
+
+if apps.is_installed("drf_yasg"):
+    from drf_yasg import openapi
+    from drf_yasg.utils import swagger_auto_schema
+else:
+    openapi = None
+
+    def swagger_auto_schema(**kwargs):
+        return lambda view: view
+
+
+def header_parameter(name, description):
+    """
+    Document a string request header, for ``manual_parameters``.
+    """
+    if openapi is None:
+        return None
+    return openapi.Parameter(
+        name, openapi.IN_HEADER, description=description, type=openapi.TYPE_STRING
+    )
@@ -0,0 +1,107 @@
+import csv
+import itertools
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+CSV_HEADER = [
+    "order_id",
+    "customer_id",
+    "created_at",
+    "order_total",
+    "menu_item",
+    "quantity",
+    "unit_price",
+]
+
+
+class Echo:
+    """
+    File-like object whose write() hands the line back to csv.writer's caller.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_orders(queryset, archived=()):
+    """
+    Yield the ``archived`` orders, then stream ``queryset``'s orders with
+    their items from a server-side cursor, one chunk of EXPORT_CHUNK_SIZE
+    orders (plus one prefetch query) at a time.
+    """
+    yield from archived
+    yield from (
+        queryset.prefetch_related("items")
+        .order_by("created_at", "id")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def orders_as_csv(queryset, archived=()):
+    """
+    Yield CSV lines, one per order item. Orders without items get one row.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order in iter_orders(queryset, archived):
+        prefix = [
+            order.pk,
+            order.customer_id,
+            order.created_at.isoformat(),
+            order.total,
+        ]
+        items = order.items.all()
+        if not items:
+            yield writer.writerow(prefix + ["", "", ""])
+        for item in items:
+            yield writer.writerow(
+                prefix + [item.menu_id, item.quantity, item.unit_price]
+            )
+
+
+def order_document(order):
+    """
+    The NDJSON export of one order, also the format of the order archive.
+    """
+    return {
+        "id": order.pk,
+        "customer": order.customer_id,
+        "created_at": order.created_at,
+        "total": order.total,
+        "items": [
+            {
+                "menu_item": item.menu_id,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+            }
+            for item in order.items.all()
+        ],
+    }
+
+
+def orders_as_ndjson(queryset, archived=()):
+    """
+    Yield one JSON document per order, each on its own line.
+    """
+    for order in iter_orders(queryset, archived):
+        yield json.dumps(order_document(order), cls=DjangoJSONEncoder) + "\n"
+
+
+async def aiter_chunks(lines, size=EXPORT_CHUNK_SIZE):
+    """
+    Yield ``lines`` joined into chunks of up to ``size`` lines, pulling each
+    chunk from the sync generator in the worker thread.
+
+    Under ASGI, StreamingHttpResponse buffers a sync iterator in full before
+    sending it, so exports are served from this instead. Every chunk runs
+    in the same thread, so the export's server-side cursor stays on one
+    database connection.
+    """
+    take = sync_to_async(lambda: "".join(itertools.islice(lines, size)))
+    while chunk := await take():
+        yield chunk
@@ -0,0 +1,132 @@
+"""
+Idempotency-Key support for order creation.
+
+A client that may retry a POST sends a unique Idempotency-Key header. The
+first request with a given key claims it by inserting an IdempotencyKey row
+in the same transaction that creates the order, and stores the response
+there before committing. A retry finds the committed row and gets the stored
+response back, with an Idempotent-Replayed header, without validation or
+writes running again.
+
+A duplicate that arrives while the first request is still running blocks
+on the key's unique index until that transaction ends. If it commits, the
+duplicate replays its response. If it rolls back, because validation
+failed or the server errored, the key is free again and the duplicate runs
+normally. Only successful responses are stored.
+
+Keys are scoped to the requesting user. They expire after TTL_SECONDS, at
+which point the key can be reused. Run ``manage.py purge_idempotency_keys``
+periodically to delete expired rows.
+"""
+
+import datetime
+import hashlib
+
+import orjson
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+from .renderers import default
+
+DEFAULT_IDEMPOTENCY = {
+    # How long a key's response is replayed for.
+    "TTL_SECONDS": 24 * 60 * 60,
+    "MAX_KEY_LENGTH": 255,
+}
+
+HEADER = "Idempotency-Key"
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class KeyReusedError(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used for a different request."
+    default_code = "idempotency_key_reused"
+
+
+def idempotency_settings():
+    return {**DEFAULT_IDEMPOTENCY, **getattr(settings, "ORE_IDEMPOTENCY", {})}
+
+
+def key_digest(user, key):
+    return hashlib.sha256(f"{user.pk}:{key}".encode()).hexdigest()
+
+
+def request_fingerprint(data):
+    if isinstance(data, QueryDict):
+        data = dict(data.lists())
+    body = orjson.dumps(data, default=default, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(body).hexdigest()
+
+
+def expiry_cutoff(config=None):
+    config = config or idempotency_settings()
+    return timezone.now() - datetime.timedelta(seconds=config["TTL_SECONDS"])
+
+
+def claim(digest, fingerprint, config):
+    """
+    Claim ``digest`` in the current transaction and return None, or return
+    the committed IdempotencyKey that already holds it.
+    """
+    IdempotencyKey.objects.filter(
+        digest=digest, created_at__lt=expiry_cutoff(config)
+    ).delete()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                digest=digest, fingerprint=fingerprint, created_at=timezone.now()
+            )
+    except IntegrityError:
+        return IdempotencyKey.objects.get(digest=digest)
+    return None
+
+
+def idempotent_response(request, handler):
+    """
+    Return ``handler()``'s response, or the stored one if the request's
+    Idempotency-Key was already used. Requests without the header are
+    passed straight through.
+    """
+    key = request.headers.get(HEADER)
+    if key is None:
+        return handler()
+    config = idempotency_settings()
+    if not key or len(key) > config["MAX_KEY_LENGTH"]:
+        raise ValidationError(
+            {HEADER: [f"Must be 1 to {config['MAX_KEY_LENGTH']} characters."]}
+        )
+    digest = key_digest(request.user, key)
+    fingerprint = request_fingerprint(request.data)
+
+    with transaction.atomic():
+        stored = claim(digest, fingerprint, config)
+        if stored is None:
+            response = handler()
+            IdempotencyKey.objects.filter(digest=digest).update(
+                status_code=response.status_code, body=response.data
+            )
+            return response
+
+    if stored.fingerprint != fingerprint:
+        raise KeyReusedError()
+    response = Response(stored.body, status=stored.status_code)
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def purge_expired():
+    """
+    Delete expired keys; return how many were deleted.
+    """
+    deleted, _ = IdempotencyKey.objects.filter(
+        created_at__lt=expiry_cutoff()
+    ).delete()
+    return deleted
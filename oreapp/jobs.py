@@ -0,0 +1,263 @@
+"""
+A small job queue kept in the database, for work that should not hold up
+the request that causes it.
+
+enqueue() inserts a Job row in the caller's transaction, so a job exists
+exactly when the change that needs it has committed. ``manage.py run_jobs``
+workers claim due jobs BATCH_SIZE at a time:
+
+- Databases with SELECT ... FOR UPDATE SKIP LOCKED (PostgreSQL, MySQL 8)
+  lock the batch that way, so concurrent workers skip each other's rows
+  instead of waiting behind them.
+- Elsewhere, SQLite included, a single UPDATE ... WHERE id IN (SELECT ...
+  LIMIT n) both picks and claims the batch. The database's write lock keeps
+  two workers from claiming the same job.
+
+A claim marks its jobs running under a fresh token, with a lease of
+LEASE_SECONDS. If a worker dies, its jobs are claimed again once the lease
+expires. A batch runs in one transaction. Each job runs in its own
+savepoint, which also deletes the job's row, so the job's writes commit
+exactly when it is recorded as done. A job that raises is retried after an
+exponential backoff with jitter. After MAX_ATTEMPTS runs it is kept as
+failed for inspection.
+
+Workers log their throughput every REPORT_SECONDS. ``manage.py job_stats``
+shows the depth and lag of the queue.
+"""
+
+import datetime
+import functools
+import logging
+import random
+import time
+import traceback
+import uuid
+from collections import Counter as Tally
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS = {
+    # Jobs claimed, and run in one transaction, per batch.
+    "BATCH_SIZE": 50,
+    # How long a claimed job may run before another worker may claim it.
+    "LEASE_SECONDS": 300,
+    "MAX_ATTEMPTS": 5,
+    # Delay before the first retry, doubled for each further attempt.
+    "BACKOFF_SECONDS": 2,
+    "MAX_BACKOFF_SECONDS": 60 * 60,
+    # Idle workers poll for due jobs this often.
+    "POLL_SECONDS": 1,
+    "REPORT_SECONDS": 60,
+}
+
+
+class LeaseExpired(Exception):
+    """
+    The job was claimed by another worker, or deleted, while it ran.
+    """
+
+
+def job_settings():
+    return {**DEFAULT_JOBS, **getattr(settings, "ORE_JOBS", {})}
+
+
+def job_name(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+# Resolved once per worker process.
+handler = functools.lru_cache(maxsize=None)(import_string)
+
+
+def enqueue(func, *, run_after=None, max_attempts=None, **payload):
+    """
+    Queue ``func(**payload)`` to run in a worker once the current transaction
+    commits. ``func`` must be a module-level function and ``payload``
+    JSON-serializable.
+    """
+    return Job.objects.create(
+        name=job_name(func),
+        payload=payload,
+        max_attempts=max_attempts or job_settings()["MAX_ATTEMPTS"],
+        run_after=run_after or timezone.now(),
+    )
+
+
+def claim(batch_size, lease_seconds):
+    """
+    Claim up to ``batch_size`` due jobs, oldest first, and return them.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    # Jobs abandoned by a worker on their last attempt are not run again.
+    Job.objects.filter(
+        state=Job.RUNNING, lease_expires__lt=now, attempts__gte=F("max_attempts")
+    ).update(state=Job.FAILED, last_error="The worker running the job stopped.")
+
+    due = Job.objects.filter(
+        Q(state=Job.QUEUED, run_after__lte=now)
+        | Q(state=Job.RUNNING, lease_expires__lt=now)
+    ).order_by("run_after", "pk")
+    claimed = {
+        "state": Job.RUNNING,
+        "claim_token": token,
+        "lease_expires": now + datetime.timedelta(seconds=lease_seconds),
+        "attempts": F("attempts") + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                due.select_for_update(skip_locked=True).values_list("pk", flat=True)[
+                    :batch_size
+                ]
+            )
+            Job.objects.filter(pk__in=ids).update(**claimed)
+    else:
+        # The outer filter re-checks each row as it is updated.
+        due.filter(pk__in=due.values("pk")[:batch_size]).update(**claimed)
+    return list(Job.objects.filter(claim_token=token).order_by("run_after", "pk"))
+
+
+def backoff(attempts, config):
+    delay = min(
+        config["BACKOFF_SECONDS"] * 2 ** (attempts - 1), config["MAX_BACKOFF_SECONDS"]
+    )
+    # Jitter spreads out the retries of jobs that failed together.
+    return datetime.timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def release(job, exc, config):
+    """
+    Schedule a retry of ``job``, which raised ``exc``, or fail it if it has
+    no attempts left. Return "retried" or "failed".
+    """
+    changes = {
+        "claim_token": "",
+        "lease_expires": None,
+        "last_error": "".join(traceback.format_exception(exc)),
+    }
+    if job.attempts >= job.max_attempts:
+        outcome = "failed"
+        changes["state"] = Job.FAILED
+    else:
+        outcome = "retried"
+        changes["state"] = Job.QUEUED
+        changes["run_after"] = timezone.now() + backoff(job.attempts, config)
+    Job.objects.filter(pk=job.pk, claim_token=job.claim_token).update(**changes)
+    return outcome
+
+
+def run_batch(jobs, config=None):
+    """
+    Run claimed ``jobs`` and return a tally of their outcomes.
+    """
+    config = config or job_settings()
+    outcomes = Tally()
+    with transaction.atomic():
+        for job in jobs:
+            try:
+                with transaction.atomic():
+                    handler(job.name)(**job.payload)
+                    done, _ = Job.objects.filter(
+                        pk=job.pk, claim_token=job.claim_token
+                    ).delete()
+                    if not done:
+                        raise LeaseExpired(job.pk)
+            except LeaseExpired:
+                logger.warning("Lost the lease on %s; its changes were discarded", job)
+                outcomes["expired"] += 1
+            except Exception as exc:
+                logger.exception("%s raised", job)
+                outcomes[release(job, exc, config)] += 1
+            else:
+                outcomes["succeeded"] += 1
+    return outcomes
+
+
+class Worker:
+    """
+    Claims and runs due jobs until stopped, logging its throughput.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or job_settings()
+        self.totals = Tally()
+        self.stopping = False
+
+    def run_once(self):
+        """
+        Claim and run one batch; return how many jobs it held.
+        """
+        jobs = claim(self.config["BATCH_SIZE"], self.config["LEASE_SECONDS"])
+        if jobs:
+            self.totals["claimed"] += len(jobs)
+            self.totals.update(run_batch(jobs, self.config))
+        return len(jobs)
+
+    def run(self, until_empty=False):
+        """
+        Run batches until stop() is called, or with ``until_empty`` until no
+        jobs are due. Return the totals.
+        """
+        reported, last_report = Tally(self.totals), time.monotonic()
+        while not self.stopping:
+            if not self.run_once():
+                if until_empty:
+                    break
+                time.sleep(self.config["POLL_SECONDS"])
+            now = time.monotonic()
+            if now - last_report >= self.config["REPORT_SECONDS"]:
+                self.report(self.totals - reported, now - last_report)
+                reported, last_report = Tally(self.totals), now
+        return self.totals
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def report(self, counts, seconds):
+        logger.info(
+            "Ran %d jobs in %.0fs (%.1f/s): %d succeeded, %d retried, %d failed, "
+            "%d expired",
+            counts["claimed"],
+            seconds,
+            counts["claimed"] / seconds,
+            counts["succeeded"],
+            counts["retried"],
+            counts["failed"],
+            counts["expired"],
+        )
+
+
+def run_pending():
+    """
+    Run every job that is due now, in this process; return the totals.
+    """
+    return Worker().run(until_empty=True)
+
+
+def queue_stats():
+    """
+    Return the number of jobs in each state, and how many queued jobs are due
+    along with how long the oldest has waited.
+    """
+    stats = {state: 0 for state, _ in Job.STATES}
+    stats.update(
+        Job.objects.values_list("state").annotate(count=Count("pk")).order_by()
+    )
+    now = timezone.now()
+    due = Job.objects.filter(state=Job.QUEUED, run_after__lte=now).aggregate(
+        count=Count("pk"), oldest=Min("run_after")
+    )
+    stats["due"] = due["count"]
+    stats["lag_seconds"] = (
+        (now - due["oldest"]).total_seconds() if due["oldest"] else 0.0
+    )
+    return stats
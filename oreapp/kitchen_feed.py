@@ -0,0 +1,144 @@
+"""
+Server-Sent Events feed of newly placed orders, for the kitchen display.
+
+Each event carries one order, with its line items and menu entries, and uses
+the order id as its event id. A client that reconnects with the standard
+Last-Event-ID header, or ?last_event_id= where headers cannot be set,
+resumes after that order. Orders placed while it was away are replayed
+from the database first.
+
+Idle streams run no queries between wake-ups. Orders placed in this process
+wake every stream as soon as their transaction commits. Orders placed by
+other processes are picked up by the check that runs with each heartbeat.
+
+Order ids are allocated before commit. Two transactions can therefore
+commit out of id order, and a stream that has already passed the higher id
+will not see the lower one. Order creation is short enough that the kitchen
+display accepts this.
+"""
+
+import asyncio
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import Order
+from .renderers import FastJSONRenderer
+from .serializers import OrderSerializer
+
+DEFAULT_KITCHEN_FEED = {
+    # Seconds between keep-alive comments, and between database checks for
+    # orders placed by other processes.
+    "HEARTBEAT_SECONDS": 15,
+    # Reconnection delay suggested to EventSource clients, in milliseconds.
+    "RETRY_MS": 3000,
+    # Orders loaded per query while catching up.
+    "BATCH_SIZE": 100,
+}
+
+renderer = FastJSONRenderer()
+
+
+def feed_settings():
+    return {**DEFAULT_KITCHEN_FEED, **getattr(settings, "ORE_KITCHEN_FEED", {})}
+
+
+class OrderNotifier:
+    """
+    Wakes the streams waiting in this process when orders are placed.
+
+    notify() may be called from any thread; each waiter is woken on its own
+    event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = set()
+
+    def subscribe(self):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        return waiter
+
+    def unsubscribe(self, waiter):
+        with self._lock:
+            self._waiters.discard(waiter)
+
+    def notify(self):
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The loop has closed; its stream is gone.
+                self.unsubscribe((loop, event))
+
+
+notifier = OrderNotifier()
+
+
+def format_event(event_id=None, event=None, data=None, retry=None):
+    lines = []
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    if data is not None:
+        lines.append(f"data: {data}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+HEARTBEAT = b": keep-alive\n\n"
+
+
+def latest_order_id():
+    return Order.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
+
+def orders_after(last_id, limit):
+    """
+    Return [(order id, JSON payload)] for up to ``limit`` orders after
+    ``last_id``, oldest first.
+    """
+    orders = (
+        Order.objects.filter(pk__gt=last_id)
+        .order_by("pk")
+        .prefetch_related("items", "menu_items")[:limit]
+    )
+    serializer = OrderSerializer(orders, many=True, context={"expand": ["menu_items"]})
+    return [(order["id"], renderer.render(order)) for order in serializer.data]
+
+
+async def order_events(last_id=None, config=None):
+    """
+    Yield the feed as encoded SSE messages, starting after order ``last_id``,
+    or with the next new order if it is None.
+    """
+    config = config or feed_settings()
+    waiter = notifier.subscribe()
+    _, wake = waiter
+    try:
+        if last_id is None:
+            last_id = await sync_to_async(latest_order_id)()
+        yield format_event(retry=config["RETRY_MS"])
+        while True:
+            # Clear before querying, so an order committed during the query
+            # wakes the next wait instead of being missed.
+            wake.clear()
+            batch = await sync_to_async(orders_after)(last_id, config["BATCH_SIZE"])
+            for order_id, data in batch:
+                yield format_event(order_id, "order", data.decode())
+                last_id = order_id
+            if len(batch) == config["BATCH_SIZE"]:
+                continue
+            try:
+                await asyncio.wait_for(wake.wait(), config["HEARTBEAT_SECONDS"])
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+    finally:
+        notifier.unsubscribe(waiter)
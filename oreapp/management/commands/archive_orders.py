@@ -0,0 +1,32 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from oreapp.archive import archive_orders, archive_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Move orders older than ORE_ORDER_ARCHIVE['AGE_DAYS'] out of the "
+        "database into compressed archive files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="archive orders older than this many days (default: AGE_DAYS)",
+        )
+
+    def handle(self, *args, **options):
+        config = archive_settings()
+        days = config["AGE_DAYS"] if options["days"] is None else options["days"]
+        cutoff = timezone.now() - datetime.timedelta(days=days)
+        archives = archive_orders(cutoff, config)
+        orders = sum(archive.order_count for archive in archives)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {orders} order(s) into {len(archives)} file(s)."
+            )
+        )
@@ -0,0 +1,57 @@
+import csv
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from oreapp.menu_import import READERS, MenuImportError, import_menus, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert or update menus by name from a CSV or JSON file "
+        "(an array or one object per line)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="file to import, or - for stdin")
+        parser.add_argument(
+            "--input",
+            choices=sorted(READERS),
+            help="input format; defaults to the file extension, else csv",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        input_format = options["input"]
+        if input_format is None:
+            suffix = Path(path).suffix.lower().lstrip(".")
+            input_format = {"ndjson": "json", "jsonl": "json"}.get(suffix, suffix)
+            if input_format not in READERS:
+                input_format = "csv"
+
+        if path == "-":
+            stream = sys.stdin
+        else:
+            try:
+                stream = open(path, newline="", encoding="utf-8")
+            except OSError as exc:
+                raise CommandError(exc)
+        try:
+            counts = import_menus(read_rows(stream, input_format))
+        except MenuImportError as exc:
+            for error in exc.errors:
+                self.stderr.write(f"row {error['row']}: {error['errors']}")
+            raise CommandError(f"{exc}; nothing was imported.")
+        except (ValueError, csv.Error) as exc:
+            raise CommandError(f"Could not parse {path}: {exc}")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Imported menus: {inserted} inserted, {updated} updated, "
+                "{unchanged} unchanged.".format(**counts)
+            )
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from oreapp.jobs import queue_stats
+
+
+class Command(BaseCommand):
+    help = "Show how many background jobs are queued, due, running and failed."
+
+    def handle(self, *args, **options):
+        stats = queue_stats()
+        for name in ("queued", "due", "running", "failed"):
+            self.stdout.write(f"{name:<12}{stats[name]:>10}")
+        self.stdout.write(f"{'lag':<12}{stats['lag_seconds']:>9.1f}s")
@@ -0,0 +1,41 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from oreapp.schema import api_fingerprint, generate, read, schema_settings, write
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema into ORE_OPENAPI_SCHEMA['DIRECTORY'] "
+        "if the API changed since it was last generated."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true", help="regenerate even if up to date"
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="only fail if the stored schema is out of date",
+        )
+
+    def handle(self, *args, **options):
+        directory = schema_settings()["DIRECTORY"]
+        if directory is None:
+            raise CommandError("ORE_OPENAPI_SCHEMA['DIRECTORY'] is not set.")
+        directory = Path(directory)
+        fingerprint = api_fingerprint()
+        if not options["force"] and read(directory, fingerprint) is not None:
+            self.stdout.write(self.style.SUCCESS("The OpenAPI schema is current."))
+            return
+        if options["check"]:
+            raise CommandError(f"The OpenAPI schema in {directory} is out of date.")
+        try:
+            write(directory, generate(), fingerprint)
+        except OSError as exc:
+            raise CommandError(exc)
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote the OpenAPI schema to {directory}.")
+        )
@@ -0,0 +1,152 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter under -X importtime: loads the WSGI application
+# the way a worker does, serves one request, and prints the timings.
+PROBE = """
+import io, json, os, sys, time
+started = time.perf_counter()
+module, _, name = os.environ["ORE_PROBE_APPLICATION"].rpartition(".")
+application = getattr(__import__(module, fromlist=[name]), name)
+loaded = time.perf_counter()
+statuses = []
+body = application(
+    {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": os.environ["ORE_PROBE_PATH"],
+        "QUERY_STRING": "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.url_scheme": "http",
+    },
+    lambda status, headers, exc_info=None: statuses.append(status),
+)
+b"".join(body)
+body.close()
+served = time.perf_counter()
+print(json.dumps({
+    "load_ms": (loaded - started) * 1000,
+    "first_request_ms": (served - loaded) * 1000,
+    "status": statuses[0],
+}))
+"""
+
+
+def package_of(module):
+    """
+    Group ``module`` by top-level package, or by the Django subpackage.
+    """
+    parts = module.split(".")
+    if parts[0] != "django":
+        return parts[0]
+    return ".".join(parts[:3] if parts[1:2] == ["contrib"] else parts[:2])
+
+
+def parse_importtime(stderr):
+    """
+    Return {module: self time in microseconds} from -X importtime output.
+    """
+    self_times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, module = line[len("import time:") :].split("|")
+        self_times[module.strip()] = int(self_us)
+    return self_times
+
+
+class Command(BaseCommand):
+    help = (
+        "Start fresh interpreters that load the WSGI application and serve one "
+        "request, and report time-to-first-request and import time per module."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "settings_modules",
+            nargs="*",
+            metavar="settings",
+            help="settings modules to profile (default: the current one)",
+        )
+        parser.add_argument("--path", default="/api/menus/", help="request to serve")
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--top", type=int, default=15)
+
+    def handle(self, *args, **options):
+        modules = options["settings_modules"] or [os.environ["DJANGO_SETTINGS_MODULE"]]
+        results = {}
+        for module in modules:
+            results[module] = result = self.profile(module, options)
+            self.report(module, result, options["top"])
+        if len(results) > 1:
+            self.stdout.write("\ntime to first request (median ms):")
+            for module, result in results.items():
+                self.stdout.write(f"  {module:<40}{result['total_ms']:>10.1f}")
+
+    def profile(self, settings_module, options):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": settings_module,
+            "ORE_PROBE_APPLICATION": settings.WSGI_APPLICATION,
+            "ORE_PROBE_PATH": options["path"],
+        }
+        runs, imports = [], defaultdict(int)
+        for _ in range(options["runs"]):
+            process = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", PROBE],
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            if process.returncode:
+                raise CommandError(
+                    f"{settings_module} failed to start:\n{process.stderr[-2000:]}"
+                )
+            runs.append(json.loads(process.stdout.splitlines()[-1]))
+            for module, self_us in parse_importtime(process.stderr).items():
+                imports[module] += self_us / options["runs"]
+        return {
+            "load_ms": statistics.median(run["load_ms"] for run in runs),
+            "first_request_ms": statistics.median(
+                run["first_request_ms"] for run in runs
+            ),
+            "total_ms": statistics.median(
+                run["load_ms"] + run["first_request_ms"] for run in runs
+            ),
+            "status": runs[-1]["status"],
+            "imports": imports,
+        }
+
+    def report(self, settings_module, result, top):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{settings_module}"))
+        self.stdout.write(
+            f"  load application  {result['load_ms']:>8.1f} ms\n"
+            f"  first request     {result['first_request_ms']:>8.1f} ms"
+            f"  ({result['status']})\n"
+            f"  total             {result['total_ms']:>8.1f} ms"
+        )
+        packages = defaultdict(float)
+        for module, self_us in result["imports"].items():
+            packages[package_of(module)] += self_us
+        self.stdout.write(
+            f"  import time by package (ms, {len(result['imports'])} modules):"
+        )
+        for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[
+            :top
+        ]:
+            self.stdout.write(f"    {package:<40}{self_us / 1000:>8.1f}")
+        self.stdout.write("  slowest modules (self ms):")
+        for module, self_us in sorted(
+            result["imports"].items(), key=lambda item: -item[1]
+        )[:top]:
+            self.stdout.write(f"    {module:<56}{self_us / 1000:>8.1f}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from oreapp.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses older than their TTL."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired key(s)."))
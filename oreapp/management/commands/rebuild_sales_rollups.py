@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from oreapp.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the hourly and per-menu-item sales rollups from all orders."
+
+    def handle(self, *args, **options):
+        hours, items = rebuild_rollups()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {hours} hourly and {items} menu item daily sales rows."
+            )
+        )
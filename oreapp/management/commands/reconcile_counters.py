@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from oreapp.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount every maintained counter and correct any drift."
+
+    def handle(self, *args, **options):
+        drift = reconcile()
+        for name, stored, actual in drift:
+            self.stdout.write(f"{name}: {stored} -> {actual}")
+        self.stdout.write(self.style.SUCCESS(f"Corrected {len(drift)} counter(s)."))
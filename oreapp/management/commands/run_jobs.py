@@ -0,0 +1,46 @@
+import logging
+import signal
+
+from django.core.management.base import BaseCommand
+
+from oreapp.jobs import Worker, job_settings, logger
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs until stopped (SIGINT or SIGTERM)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="run the jobs that are due now, then exit",
+        )
+        parser.add_argument("--batch-size", type=int, help="jobs claimed at a time")
+
+    def handle(self, *args, **options):
+        config = job_settings()
+        if options["batch_size"]:
+            config["BATCH_SIZE"] = options["batch_size"]
+        worker = Worker(config)
+        if not options["once"]:
+            # Finish the current batch before exiting.
+            signal.signal(signal.SIGINT, worker.stop)
+            signal.signal(signal.SIGTERM, worker.stop)
+        # Show throughput reports, unless LOGGING already routes them.
+        handler = None
+        if options["verbosity"] and not logger.hasHandlers():
+            handler = logging.StreamHandler(self.stdout)
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+        try:
+            totals = worker.run(until_empty=options["once"])
+        finally:
+            if handler is not None:
+                logger.removeHandler(handler)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Ran {totals['claimed']} job(s): {totals['succeeded']} succeeded, "
+                f"{totals['retried']} retried, {totals['failed']} failed, "
+                f"{totals['expired']} expired."
+            )
+        )
@@ -0,0 +1,156 @@
+import csv
+import json
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .cache import menu_cache
+from .models import Menu
+from .serializers import MenuImportRowSerializer
+
+IMPORT_CHUNK_SIZE = 2000
+
+# Stop collecting row errors after this many; the import is rejected anyway.
+MAX_REPORTED_ERRORS = 50
+
+FIELDS = ["name", "description", "price", "is_discounted", "is_drink"]
+
+UPDATE_FIELDS = FIELDS[1:]
+
+# bulk_update() skips auto_now, so updated_at is set explicitly.
+BULK_UPDATE_FIELDS = [*UPDATE_FIELDS, "updated_at"]
+
+
+class MenuImportError(Exception):
+    def __init__(self, errors, invalid):
+        super().__init__(f"{invalid} invalid row(s)")
+        self.errors = errors
+        self.invalid = invalid
+
+
+def read_csv(stream):
+    """
+    Yield one dict per CSV row. Empty cells are dropped so defaults apply.
+    """
+    for row in csv.DictReader(stream):
+        yield {key: value for key, value in row.items() if value not in ("", None)}
+
+
+def read_json(stream, read_size=64 * 1024):
+    """
+    Yield the objects of a JSON array or of newline-delimited JSON, decoding
+    one value at a time so the whole document is never held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, in_array, eof = "", 0, None, False
+    while True:
+        # Skip whitespace and, inside an array, the separators between values.
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if in_array is None and position < len(buffer):
+            in_array = buffer[position] == "["
+            position += in_array
+            continue
+        if in_array and buffer.startswith("]", position):
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                if buffer[position:].strip():
+                    raise
+                return
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        if end == len(buffer) and not eof:
+            # A number may continue in the next chunk; read more to be sure.
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        position = end
+        yield value
+
+
+READERS = {"csv": read_csv, "json": read_json}
+
+
+def read_rows(stream, input_format):
+    return READERS[input_format](stream)
+
+
+def clean_rows(rows):
+    """
+    Validate ``rows`` and yield Menu field dicts. Once the input is exhausted,
+    raise MenuImportError if any row was invalid.
+    """
+    serializer = MenuImportRowSerializer()
+    errors, invalid = [], 0
+    for number, row in enumerate(rows, start=1):
+        try:
+            if not isinstance(row, dict):
+                raise ValidationError({"non_field_errors": ["Expected an object."]})
+            values = serializer.run_validation(row)
+        except ValidationError as exc:
+            invalid += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": number, "errors": exc.detail})
+            continue
+        if not invalid:
+            yield values
+    if invalid:
+        raise MenuImportError(errors, invalid)
+
+
+def upsert_chunk(rows, counts):
+    """
+    Insert new menus and update changed ones, matching on name.
+    """
+    # Later rows for the same name win.
+    by_name = {row["name"]: row for row in rows}
+    existing = {
+        values["name"]: values
+        for values in Menu.objects.filter(name__in=by_name).values("id", *FIELDS)
+    }
+    to_create, to_update = [], []
+    now = timezone.now()
+    for name, row in by_name.items():
+        current = existing.get(name)
+        if current is None:
+            to_create.append(Menu(**row))
+        elif any(current[field] != row[field] for field in UPDATE_FIELDS):
+            to_update.append(Menu(id=current["id"], updated_at=now, **row))
+        else:
+            counts["unchanged"] += 1
+    Menu.objects.bulk_create(to_create)
+    Menu.objects.bulk_update(to_update, BULK_UPDATE_FIELDS)
+    counts["inserted"] += len(to_create)
+    counts["updated"] += len(to_update)
+
+
+def import_menus(rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Upsert Menu rows by name from an iterable of dicts, in chunks of
+    ``chunk_size``, all inside one transaction.
+
+    Returns ``{"inserted", "updated", "unchanged"}``. Raises MenuImportError,
+    with nothing written, if any row is invalid.
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    chunk = []
+    with transaction.atomic():
+        for row in clean_rows(rows):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                upsert_chunk(chunk, counts)
+                chunk = []
+        if chunk:
+            upsert_chunk(chunk, counts)
+        # Bulk writes send no signals, so invalidate the menu cache here.
+        if counts["inserted"] or counts["updated"]:
+            menu_cache.invalidate()
+            transaction.on_commit(menu_cache.invalidate)
+    return counts
@@ -0,0 +1,123 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("oreapp.sql")
+
+DEFAULT_SQL_INSTRUMENTATION = {
+    # Requests slower than this are logged with their query summary.
+    "SLOW_REQUEST_MS": 500,
+    "SERVER_TIMING": True,
+    # Raise RepeatedQueriesError when one query shape runs more often than
+    # this in a request. Meant for tests, to catch N+1 patterns.
+    "MAX_REPEATED_QUERIES": None,
+}
+
+FINGERPRINT_SUBSTITUTIONS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def fingerprint(sql):
+    """
+    Reduce ``sql`` to its shape: literals and IN lists of any length collapse.
+    """
+    for pattern, replacement in FINGERPRINT_SUBSTITUTIONS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class RepeatedQueriesError(Exception):
+    pass
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that counts, times and fingerprints queries.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def most_repeated(self):
+        """
+        Return (fingerprint, count) for the most frequent query shape.
+        """
+        most_common = self.fingerprints.most_common(1)
+        return most_common[0] if most_common else (None, 0)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record the queries each request runs on every database connection.
+
+    Adds a Server-Timing header with the SQL time and query count, logs
+    requests slower than SLOW_REQUEST_MS to the "oreapp.sql" logger and, when
+    MAX_REPEATED_QUERIES is set, raises RepeatedQueriesError for requests that
+    repeat one query shape too often. Configure it with the
+    ORE_SQL_INSTRUMENTATION setting.
+
+    Queries run while a streaming response is consumed are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = {
+            **DEFAULT_SQL_INSTRUMENTATION,
+            **getattr(settings, "ORE_SQL_INSTRUMENTATION", {}),
+        }
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        sql_ms = recorder.duration * 1000
+        shape, repeats = recorder.most_repeated()
+
+        if config["SERVER_TIMING"]:
+            response["Server-Timing"] = (
+                f'db;dur={sql_ms:.1f};desc="{recorder.count} queries", '
+                f"app;dur={elapsed_ms:.1f}"
+            )
+        if elapsed_ms > config["SLOW_REQUEST_MS"]:
+            logger.warning(
+                "Slow request %s %s: %.0fms, %d queries in %.0fms; "
+                "most repeated (%dx): %s",
+                request.method,
+                request.get_full_path(),
+                elapsed_ms,
+                recorder.count,
+                sql_ms,
+                repeats,
+                shape,
+            )
+        limit = config["MAX_REPEATED_QUERIES"]
+        if limit is not None and repeats > limit:
+            raise RepeatedQueriesError(
+                f"{request.method} {request.get_full_path()} ran the same query "
+                f"{repeats} times (limit {limit}): {shape}"
+            )
+        return response
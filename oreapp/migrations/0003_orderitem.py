@@ -0,0 +1,93 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_menu_items(apps, schema_editor):
+    """
+    Move the rows of the implicit Order.menu_items table into OrderItem.
+    """
+    Order = apps.get_model("oreapp", "Order")
+    OrderItem = apps.get_model("oreapp", "OrderItem")
+    through = Order.menu_items.through
+    batch = []
+    for row in through.objects.order_by("pk").iterator(chunk_size=2000):
+        batch.append(OrderItem(order_id=row.order_id, menu_id=row.menu_id, quantity=1))
+        if len(batch) >= 2000:
+            OrderItem.objects.bulk_create(batch)
+            batch = []
+    OrderItem.objects.bulk_create(batch)
+
+
+def restore_menu_items(apps, schema_editor):
+    Order = apps.get_model("oreapp", "Order")
+    OrderItem = apps.get_model("oreapp", "OrderItem")
+    through = Order.menu_items.through
+    through.objects.bulk_create(
+        [
+            through(order_id=item.order_id, menu_id=item.menu_id)
+            for item in OrderItem.objects.iterator(chunk_size=2000)
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Replace the auto-created Order.menu_items table with the explicit OrderItem
+    model so an order can carry a quantity per menu item. Django cannot add
+    ``through=`` to an existing M2M, so the rows are copied across before the
+    old field is dropped and re-added on top of OrderItem.
+    """
+
+    dependencies = [
+        ("oreapp", "0002_order_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.PositiveIntegerField(default=1)),
+                (
+                    "menu",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="oreapp.menu"
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="oreapp.order",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("order", "menu"), name="orderitem_unique_menu"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(copy_menu_items, restore_menu_items),
+        migrations.RemoveField(
+            model_name="order",
+            name="menu_items",
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="menu_items",
+            field=models.ManyToManyField(through="oreapp.OrderItem", to="oreapp.menu"),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations, models
+from django.db.models import (
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Coalesce
+
+
+def backfill_prices(apps, schema_editor):
+    """
+    Capture prices for existing lines and compute order totals in SQL.
+
+    The price an old order was actually charged is not recorded anywhere, so
+    existing lines take the menu's current price.
+    """
+    Menu = apps.get_model("oreapp", "Menu")
+    Order = apps.get_model("oreapp", "Order")
+    OrderItem = apps.get_model("oreapp", "OrderItem")
+    OrderItem.objects.update(
+        unit_price=Subquery(
+            Menu.objects.filter(pk=OuterRef("menu_id")).values("price")[:1]
+        )
+    )
+    line_totals = (
+        OrderItem.objects.filter(order_id=OuterRef("pk"))
+        .values("order_id")
+        .annotate(
+            total=Sum(
+                ExpressionWrapper(
+                    F("quantity") * F("unit_price"),
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                )
+            )
+        )
+        .values("total")
+    )
+    Order.objects.update(
+        total=Coalesce(Subquery(line_totals), 0, output_field=DecimalField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("oreapp", "0003_orderitem"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="unit_price",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=6),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.0.7 on 2026-10-17 01:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("oreapp", "0004_order_total_orderitem_unit_price"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HourlySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hour", models.DateTimeField(unique=True)),
+                ("order_count", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="MenuItemDailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("quantity", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "menu",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="oreapp.menu"
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="menuitemdailysales",
+            constraint=models.UniqueConstraint(
+                fields=("date", "menu"), name="menuitemdailysales_unique_day"
+            ),
+        ),
+    ]
@@ -0,0 +1,88 @@
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE oreapp_menu ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX menu_search_vector_idx ON oreapp_menu USING GIN (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS menu_search_vector_idx",
+    "ALTER TABLE oreapp_menu DROP COLUMN IF EXISTS search_vector",
+]
+
+# External-content FTS5 table kept in sync with oreapp_menu by triggers.
+# prefix='2 3' adds prefix indexes so autocomplete queries stay index lookups.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE oreapp_menu_fts USING fts5(
+        name, description,
+        content='oreapp_menu', content_rowid='id',
+        tokenize='porter unicode61', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER oreapp_menu_fts_insert AFTER INSERT ON oreapp_menu BEGIN
+        INSERT INTO oreapp_menu_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER oreapp_menu_fts_delete AFTER DELETE ON oreapp_menu BEGIN
+        INSERT INTO oreapp_menu_fts(oreapp_menu_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER oreapp_menu_fts_update AFTER UPDATE OF name, description
+    ON oreapp_menu BEGIN
+        INSERT INTO oreapp_menu_fts(oreapp_menu_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO oreapp_menu_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO oreapp_menu_fts(oreapp_menu_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS oreapp_menu_fts_insert",
+    "DROP TRIGGER IF EXISTS oreapp_menu_fts_delete",
+    "DROP TRIGGER IF EXISTS oreapp_menu_fts_update",
+    "DROP TABLE IF EXISTS oreapp_menu_fts",
+]
+
+
+def run_for_vendor(postgres, sqlite):
+    def run(apps, schema_editor):
+        statements = {"postgresql": postgres, "sqlite": sqlite}.get(
+            schema_editor.connection.vendor, []
+        )
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    """
+    Build the Menu search index outside of the ORM: a generated tsvector column
+    with a GIN index on PostgreSQL, an FTS5 table on SQLite. Other databases get
+    no index and oreapp.search falls back to substring matching.
+    """
+
+    dependencies = [
+        ("oreapp", "0006_counter"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
@@ -0,0 +1,37 @@
+import importlib
+
+import django.utils.timezone
+from django.db import migrations, models
+
+search_index = importlib.import_module("oreapp.migrations.0007_menu_search_index")
+
+
+def recreate_search_triggers(apps, schema_editor):
+    # SQLite applies AddField by rebuilding oreapp_menu, which drops the
+    # triggers that keep the FTS5 search index in sync.
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    drop_triggers = search_index.SQLITE_BACKWARD[:3]
+    create_triggers_and_rebuild = search_index.SQLITE_FORWARD[1:]
+    for statement in drop_triggers + create_triggers_and_rebuild:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("oreapp", "0008_user_token_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recreate_search_triggers),
+        migrations.AddField(
+            model_name="menu",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.0.7 on 2026-10-17 03:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("oreapp", "0010_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("path", models.CharField(max_length=255, unique=True)),
+                ("sha256", models.CharField(max_length=64)),
+                ("order_count", models.PositiveIntegerField()),
+                ("orders_per_day", models.JSONField(default=dict)),
+                ("first_created_at", models.DateTimeField()),
+                ("last_created_at", models.DateTimeField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedOrderSegment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("offset", models.PositiveBigIntegerField()),
+                ("length", models.PositiveIntegerField()),
+                ("order_count", models.PositiveIntegerField()),
+                ("first_created_at", models.DateTimeField()),
+                ("last_created_at", models.DateTimeField()),
+                (
+                    "customer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "archive",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="segments",
+                        to="oreapp.orderarchive",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["customer", "last_created_at"],
+                        name="segment_customer_last_idx",
+                    ),
+                    models.Index(fields=["last_created_at"], name="segment_last_idx"),
+                ],
+            },
+        ),
+    ]
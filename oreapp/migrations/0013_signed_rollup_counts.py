@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-17 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("oreapp", "0012_job"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="hourlysales",
+            name="order_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="menuitemdailysales",
+            name="quantity",
+            field=models.IntegerField(default=0),
+        ),
+    ]
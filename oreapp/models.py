@@ -3,9 +3,24 @@ from django.contrib.auth.models import AbstractUser, Group, Permission
 
 
 # Create your models here.
+
+
+def set_prefetched(instance, name, queryset, objects):
+    """
+    Make ``instance.<name>.all()`` return ``objects`` without a query, as
+    prefetch_related() would, through ``queryset``. This is the one place
+    that relies on the QuerySet internals prefetch_related() uses.
+    """
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    instance.__dict__.setdefault("_prefetched_objects_cache", {})[name] = queryset
+
+
 class User(AbstractUser):
     is_staff_member = models.BooleanField(default=False)
     is_customer = models.BooleanField(default=True)
+    # Bumped to revoke every API token issued so far; see authentication.py.
+    token_version = models.PositiveIntegerField(default=0)
 
     groups = models.ManyToManyField(
         Group, related_name="oreapp_user_set", related_query_name="oreapp_user"
@@ -20,6 +35,8 @@ class Menu(models.Model):
     price = models.DecimalField(max_digits=6, decimal_places=2)
     is_discounted = models.BooleanField(default=False)
     is_drink = models.BooleanField(default=False)
+    # Drives the ETag/Last-Modified validators in conditional.py.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -27,8 +44,21 @@ class Menu(models.Model):
 
 class Order(models.Model):
     customer = models.ForeignKey(User, on_delete=models.CASCADE)
-    menu_items = models.ManyToManyField(Menu)
+    menu_items = models.ManyToManyField(Menu, through="OrderItem")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Sum of quantity * unit_price over the order's items, maintained on write.
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination: customer_orders for a single customer, and the
+            # staff-wide order list, both page on (created_at, id).
+            models.Index(
+                fields=["customer", "created_at", "id"],
+                name="order_customer_created_idx",
+            ),
+            models.Index(fields=["created_at", "id"], name="order_created_idx"),
+        ]
 
     def __str__(self):
         return (
@@ -36,3 +66,182 @@ class Order(models.Model):
             if self.name
             else f"Order {self.id} - {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
         )
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
+    menu = models.ForeignKey(Menu, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    # Menu.price at the time the order was placed.
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["order", "menu"], name="orderitem_unique_menu"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.menu}"
+
+    @property
+    def line_total(self):
+        return self.quantity * self.unit_price
+
+
+class HourlySales(models.Model):
+    """
+    Orders and revenue per hour, maintained as orders are placed.
+
+    Daily figures are summed from at most 24 rows per day. Counts are signed,
+    since a queued removal may be applied before the placement it undoes.
+    """
+
+    hour = models.DateTimeField(unique=True)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H:00} - {self.order_count} orders"
+
+
+class MenuItemDailySales(models.Model):
+    """
+    Quantity sold and revenue per menu item per day. Quantities are signed,
+    like HourlySales.order_count.
+    """
+
+    date = models.DateField()
+    menu = models.ForeignKey(Menu, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "menu"], name="menuitemdailysales_unique_day"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.quantity} x {self.menu}"
+
+
+class Counter(models.Model):
+    """
+    A named running count kept up to date on write, so reads are a single
+    primary-key lookup instead of a COUNT(*) over a growing table.
+    """
+
+    name = models.CharField(max_length=64, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response to a request made with an Idempotency-Key header, replayed
+    when the request is retried; see idempotency.py.
+    """
+
+    # SHA-256 of the requesting user and the client's key, so keys are
+    # scoped per user and stored at a fixed size.
+    digest = models.CharField(max_length=64, unique=True)
+    # SHA-256 of the request body, to reject a key reused for another request.
+    fingerprint = models.CharField(max_length=64)
+    # Filled in before the transaction that claimed the key commits, so
+    # committed rows are always complete.
+    status_code = models.PositiveSmallIntegerField(null=True)
+    body = models.JSONField(null=True)
+    created_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.digest[:12]} - {self.status_code}"
+
+
+class OrderArchive(models.Model):
+    """
+    A compressed file of orders moved out of the Order table; see archive.py.
+    """
+
+    # Relative to ORE_ORDER_ARCHIVE["DIRECTORY"].
+    path = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64)
+    order_count = models.PositiveIntegerField()
+    # {"YYYY-MM-DD": orders placed that day}, so the order counters can still
+    # be recomputed once the orders are gone.
+    orders_per_day = models.JSONField(default=dict)
+    first_created_at = models.DateTimeField()
+    last_created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.path
+
+
+class ArchivedOrderSegment(models.Model):
+    """
+    The gzip member of an archive file that holds one customer's orders.
+    """
+
+    archive = models.ForeignKey(
+        OrderArchive, on_delete=models.CASCADE, related_name="segments"
+    )
+    customer = models.ForeignKey(User, on_delete=models.CASCADE)
+    offset = models.PositiveBigIntegerField()
+    length = models.PositiveIntegerField()
+    order_count = models.PositiveIntegerField()
+    first_created_at = models.DateTimeField()
+    last_created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Finding the segments that can hold the next page of a
+            # customer's history, and of the staff-wide history.
+            models.Index(
+                fields=["customer", "last_created_at"],
+                name="segment_customer_last_idx",
+            ),
+            models.Index(fields=["last_created_at"], name="segment_last_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.archive} - customer {self.customer_id}"
+
+
+class Job(models.Model):
+    """
+    Background work queued by a request and run by ``manage.py run_jobs``;
+    see jobs.py. Rows are deleted once their job succeeds.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATES = [(QUEUED, "Queued"), (RUNNING, "Running"), (FAILED, "Failed")]
+
+    # Dotted path of the function to call with ``payload`` as keyword arguments.
+    name = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict)
+    state = models.CharField(max_length=10, choices=STATES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField()
+    run_after = models.DateTimeField()
+    # Set when a worker claims the job. The worker may run it until
+    # lease_expires; after that another worker may claim it again.
+    claim_token = models.CharField(max_length=32, blank=True, db_index=True)
+    lease_expires = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Claiming: due queued jobs, oldest first.
+            models.Index(fields=["state", "run_after"], name="job_claim_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} - {self.state}"
@@ -0,0 +1,107 @@
+from django.db import transaction
+
+from . import counters, rollups
+from .kitchen_feed import notifier
+from .models import Menu, Order, OrderItem
+from .serializers import (
+    MAX_ORDER_TOTAL,
+    MenuItemQuantitiesField,
+    OrderSubmissionSerializer,
+)
+
+
+MAX_BULK_ORDERS = 500
+
+
+def orders_placed(orders, lines):
+    """
+    Update everything derived from new orders and their order lines. Call
+    inside the creating transaction.
+
+    The counters are updated straight away; the sales rollups by a queued job.
+    """
+    counters.record_orders(orders)
+    rollups.queue_changes([(orders, lines, 1)])
+    transaction.on_commit(notifier.notify)
+
+
+def order_changed(before, before_lines, order):
+    """
+    Update the sales rollups for ``order``, whose lines replaced
+    ``before_lines`` of ``before``, its unsaved copy from before the update.
+    Call inside the updating transaction. Deleted orders are handled by a
+    signal, see signals.py.
+    """
+    rollups.queue_changes(
+        [([before], before_lines, -1), ([order], order.items.all(), 1)]
+    )
+
+
+def create_order_batch(customer, submissions):
+    """
+    Validate and insert a batch of order submissions for ``customer``.
+
+    Every menu id in the batch is resolved with a single query, and all valid
+    orders and their menu items are written with two bulk inserts inside one
+    transaction. Invalid submissions are reported and skipped. Returns one
+    result per submission, in submission order.
+    """
+    results = [None] * len(submissions)
+    parsed = []
+    for index, submission in enumerate(submissions):
+        serializer = OrderSubmissionSerializer(data=submission)
+        if serializer.is_valid():
+            parsed.append((index, serializer.validated_data["menu_items"]))
+        else:
+            results[index] = _error(index, serializer.errors)
+
+    requested = {pk for _, quantities in parsed for pk in quantities}
+    prices = dict(Menu.objects.filter(pk__in=requested).values_list("pk", "price"))
+    messages = MenuItemQuantitiesField.default_error_messages
+    valid = []
+    for index, quantities in parsed:
+        unknown = [pk for pk in quantities if pk not in prices]
+        if unknown:
+            error = messages["does_not_exist"].format(
+                pk_values=", ".join(map(str, unknown))
+            )
+            results[index] = _error(index, {"menu_items": [error]})
+            continue
+        total = sum(prices[pk] * quantity for pk, quantity in quantities.items())
+        if total > MAX_ORDER_TOTAL:
+            error = messages["max_total"].format(max_total=MAX_ORDER_TOTAL)
+            results[index] = _error(index, {"menu_items": [error]})
+        else:
+            valid.append((index, quantities, total))
+
+    if valid:
+        with transaction.atomic():
+            orders = Order.objects.bulk_create(
+                [Order(customer=customer, total=total) for _, _, total in valid]
+            )
+            lines = OrderItem.objects.bulk_create(
+                [
+                    OrderItem(
+                        order_id=order.pk,
+                        menu_id=menu_id,
+                        quantity=quantity,
+                        unit_price=prices[menu_id],
+                    )
+                    for order, (_, quantities, _) in zip(orders, valid)
+                    for menu_id, quantity in quantities.items()
+                ]
+            )
+            orders_placed(orders, lines)
+        for order, (index, _, _) in zip(orders, valid):
+            results[index] = {
+                "index": index,
+                "status": "created",
+                "id": order.pk,
+                "total": f"{order.total:.2f}",
+                "created_at": order.created_at,
+            }
+    return results
+
+
+def _error(index, errors):
+    return {"index": index, "status": "error", "errors": errors}
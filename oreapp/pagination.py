@@ -0,0 +1,123 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class OrderCursorPagination(BasePagination):
+    """
+    Keyset pagination over (created_at, id), newest first.
+
+    The cursor holds the (created_at, id) of the last row on the previous page,
+    so every page is a bounded range scan on the Order indexes instead of an
+    OFFSET scan, and orders created while a client is paging never shift rows
+    between pages.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 50
+    max_page_size = 500
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Return the unevaluated slice of ``queryset`` for the requested page.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        queryset = queryset.order_by("-created_at", "-id")
+        if self.cursor is not None:
+            created_at, pk = self.cursor
+            # The redundant created_at__lte gives the planner a range bound on
+            # the indexes; the OR alone makes it scan from the newest row.
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk),
+                created_at__lte=created_at,
+            )
+        # Fetch one extra row to find out whether there is a next page.
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        """
+        Record the rows fetched by get_page_queryset() and return the page.
+        """
+        self.has_next = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def encode_cursor(self, created_at, pk):
+        payload = json.dumps([created_at.isoformat(), pk])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(last.created_at, last.pk)
+        )
+
+    def get_first_link(self):
+        if self.cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return remove_query_param(url, self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("first", self.get_first_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "first": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,151 @@
+"""
+Primary/replica database routing with read-your-writes pinning.
+
+Writes always go to the ``default`` (primary) database. Reads go to a
+randomly chosen replica alias, from ORE_DATABASE_REPLICAS["ALIASES"], only
+while ReplicaRoutingMiddleware is handling a GET, HEAD or OPTIONS request.
+Everything else reads from the primary: unsafe requests, management
+commands, streamed response bodies and reads inside a transaction.
+
+Once a request writes anything, its remaining reads go to the primary.
+The response then sets a short-lived cookie that pins the client to the
+primary for PIN_SECONDS, so it reads back its own order, profile change or
+menu edit even while the replicas lag.
+
+Clients that have not written may briefly see data older than the primary.
+Code that must not, such as a fill of the shared menu cache, wraps its reads
+in read_from_primary().
+"""
+
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DEFAULT_DATABASE_REPLICAS = {
+    "ALIASES": [],
+    # How long a client reads from the primary after a write.
+    "PIN_SECONDS": 5,
+    "COOKIE_NAME": "ore_primary_until",
+}
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def replica_settings():
+    return {
+        **DEFAULT_DATABASE_REPLICAS,
+        **getattr(settings, "ORE_DATABASE_REPLICAS", {}),
+    }
+
+
+class RoutingState:
+    """
+    Per-request routing decision, shared with threads the request hands off to.
+    """
+
+    __slots__ = ("use_replicas", "wrote")
+
+    def __init__(self, use_replicas):
+        self.use_replicas = use_replicas
+        self.wrote = False
+
+
+_state = contextvars.ContextVar("ore_database_routing", default=None)
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Send the reads made inside the block to the primary.
+    """
+    token = _state.set(None)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replicas:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads inside a transaction must see its writes.
+            return DEFAULT_DB_ALIAS
+        return random.choice(replica_settings()["ALIASES"])
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.use_replicas = False
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data.
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe requests read from the replicas unless the client is pinned to
+    the primary, and pin clients whose request wrote to the database.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        config = replica_settings()
+        state = self.routing_state(request, config)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(response, state, config)
+
+    async def __acall__(self, request):
+        config = replica_settings()
+        state = self.routing_state(request, config)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(response, state, config)
+
+    def routing_state(self, request, config):
+        try:
+            pinned_until = float(request.COOKIES.get(config["COOKIE_NAME"], 0))
+        except ValueError:
+            pinned_until = 0
+        return RoutingState(
+            use_replicas=bool(config["ALIASES"])
+            and request.method in SAFE_METHODS
+            and pinned_until <= time.time()
+        )
+
+    def pin(self, response, state, config):
+        if state.wrote and config["ALIASES"]:
+            response.set_cookie(
+                config["COOKIE_NAME"],
+                str(int(time.time() + config["PIN_SECONDS"])),
+                max_age=config["PIN_SECONDS"],
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
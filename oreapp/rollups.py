@@ -0,0 +1,159 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from . import archive, jobs
+from .models import HourlySales, Job, MenuItemDailySales, Order, OrderItem
+
+
+def _hour(created_at):
+    return timezone.localtime(created_at).replace(minute=0, second=0, microsecond=0)
+
+
+def queue_changes(changes):
+    """
+    Queue an apply_sales_deltas() job for ``changes``: ``(orders, lines,
+    sign)`` triples, with sign 1 for orders added and -1 for orders removed.
+
+    Changes are summed per bucket first, so the job costs one or two queries
+    per touched hour and menu item, not per order. Since the job carries the
+    deltas rather than order ids, jobs may run in any order. Call this inside
+    the transaction that made the changes.
+    """
+    hourly = defaultdict(lambda: [0, Decimal(0)])
+    daily = defaultdict(lambda: [0, Decimal(0)])
+    for orders, lines, sign in changes:
+        created_at = {order.pk: order.created_at for order in orders}
+        for order in orders:
+            bucket = hourly[_hour(order.created_at)]
+            bucket[0] += sign
+            bucket[1] += sign * order.total
+        for line in lines:
+            day = timezone.localdate(created_at[line.order_id])
+            bucket = daily[(day, line.menu_id)]
+            bucket[0] += sign * line.quantity
+            bucket[1] += sign * line.quantity * line.unit_price
+
+    hourly = [
+        [hour.isoformat(), order_count, str(revenue)]
+        for hour, (order_count, revenue) in hourly.items()
+        if order_count or revenue
+    ]
+    daily = [
+        [day.isoformat(), menu_id, quantity, str(revenue)]
+        for (day, menu_id), (quantity, revenue) in daily.items()
+        if quantity or revenue
+    ]
+    if hourly or daily:
+        jobs.enqueue(apply_sales_deltas, hourly=hourly, daily=daily)
+
+
+def apply_sales_deltas(hourly, daily):
+    """
+    Job queued by queue_changes(): add the deltas to the rollups, dropping
+    rows that the changes cancel out.
+
+    Jobs may run in any order, so a removal can reach a bucket before the
+    placement it undoes. Its row then holds negative amounts until the
+    placement arrives.
+    """
+    for hour, order_count, revenue in hourly:
+        lookup = {"hour": datetime.datetime.fromisoformat(hour)}
+        _increment(
+            HourlySales, lookup, order_count=order_count, revenue=Decimal(revenue)
+        )
+        HourlySales.objects.filter(**lookup, order_count=0, revenue=0).delete()
+    for day, menu_id, quantity, revenue in daily:
+        lookup = {"date": datetime.date.fromisoformat(day), "menu_id": menu_id}
+        _increment(
+            MenuItemDailySales, lookup, quantity=quantity, revenue=Decimal(revenue)
+        )
+        MenuItemDailySales.objects.filter(**lookup, quantity=0, revenue=0).delete()
+
+
+def _increment(model, lookup, **amounts):
+    """
+    Add ``amounts`` to the row matching ``lookup``, creating it if needed.
+    """
+    updates = {field: F(field) + amount for field, amount in amounts.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **amounts)
+    except IntegrityError:
+        # Another transaction created the row first. Any other integrity
+        # error leaves no row to update, and is raised so the job retries.
+        if not model.objects.filter(**lookup).update(**updates):
+            raise
+
+
+@transaction.atomic
+def rebuild_rollups():
+    """
+    Recompute every rollup row from the order history.
+
+    Days that have been archived are kept as they are, since their orders
+    are no longer in the Order table. Queued rollup jobs are dropped, since
+    the rebuild already counts their orders.
+    """
+    Job.objects.filter(name=jobs.job_name(apply_sales_deltas)).delete()
+    hours = HourlySales.objects.all()
+    days = MenuItemDailySales.objects.all()
+    orders = Order.objects.all()
+    items = OrderItem.objects.all()
+    since = archive.hot_since()
+    if since is not None:
+        hours = hours.filter(hour__gte=since)
+        days = days.filter(date__gte=timezone.localdate(since))
+        orders = orders.filter(created_at__gte=since)
+        items = items.filter(order__created_at__gte=since)
+    hours.delete()
+    days.delete()
+
+    hourly = (
+        orders.annotate(bucket=TruncHour("created_at"))
+        .values("bucket")
+        .annotate(order_count=Count("id"), revenue=Sum("total"))
+        .order_by("bucket")
+    )
+    HourlySales.objects.bulk_create(
+        [
+            HourlySales(
+                hour=row["bucket"],
+                order_count=row["order_count"],
+                revenue=row["revenue"],
+            )
+            for row in hourly.iterator(chunk_size=2000)
+        ],
+        batch_size=2000,
+    )
+
+    line_revenue = ExpressionWrapper(
+        F("quantity") * F("unit_price"),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    daily = (
+        items.annotate(day=TruncDate("order__created_at"))
+        .values("day", "menu_id")
+        .annotate(quantity_sold=Sum("quantity"), revenue=Sum(line_revenue))
+        .order_by("day", "menu_id")
+    )
+    MenuItemDailySales.objects.bulk_create(
+        [
+            MenuItemDailySales(
+                date=row["day"],
+                menu_id=row["menu_id"],
+                quantity=row["quantity_sold"],
+                revenue=row["revenue"],
+            )
+            for row in daily.iterator(chunk_size=2000)
+        ],
+        batch_size=2000,
+    )
+    return HourlySales.objects.count(), MenuItemDailySales.objects.count()
@@ -0,0 +1,187 @@
+"""
+The OpenAPI schema, generated once and served from disk.
+
+Building the schema makes drf_yasg introspect every viewset and serializer,
+which is too much work to repeat per request. ``manage.py openapi_schema``
+writes it to ORE_OPENAPI_SCHEMA["DIRECTORY"] as openapi.json and
+openapi.yaml, next to a fingerprint of the modules and settings that define
+the API. The first request for the schema in a process loads those files,
+and oreconfig's WSGI and ASGI entry points do the same at startup. If the
+files are missing or the fingerprint no longer matches, the schema is
+regenerated once and written back. Regeneration therefore happens only when
+the API changes.
+
+The documents are served with an ETag, so clients that already have the
+current schema get a 304.
+"""
+
+import hashlib
+import importlib.util
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import django
+import rest_framework
+from django.conf import settings
+from django.utils.http import quote_etag
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OPENAPI_SCHEMA = {
+    # Where the generated documents are stored. None keeps them in memory.
+    "DIRECTORY": None,
+}
+
+# Modules whose source determines the schema.
+API_MODULES = [
+    "oreconfig.urls",
+    "oreapp.urls",
+    "oreapp.views",
+    "oreapp.async_views",
+    "oreapp.serializers",
+    "oreapp.models",
+    "oreapp.pagination",
+    "oreapp.docs",
+    "oreapp.renderers",
+    "oreapp.authentication",
+]
+
+# Settings that change how drf_yasg describes the API.
+API_SETTINGS = ["REST_FRAMEWORK", "SWAGGER_SETTINGS"]
+
+EXTENSIONS = ["json", "yaml"]
+
+FINGERPRINT_FILE = "fingerprint.txt"
+
+
+class Document:
+    def __init__(self, content):
+        self.content = content
+        self.etag = quote_etag(hashlib.sha256(content).hexdigest())
+
+
+_lock = threading.Lock()
+_documents = None
+
+
+def schema_settings():
+    return {**DEFAULT_OPENAPI_SCHEMA, **getattr(settings, "ORE_OPENAPI_SCHEMA", {})}
+
+
+def api_fingerprint():
+    """
+    Hash the source of API_MODULES, the API_SETTINGS and the versions of the
+    libraries that turn them into a schema.
+    """
+    import drf_yasg
+
+    digest = hashlib.sha256()
+    for library in (django, rest_framework, drf_yasg):
+        digest.update(f"{library.__name__}={library.__version__}\n".encode())
+    for module in API_MODULES:
+        digest.update(Path(importlib.util.find_spec(module).origin).read_bytes())
+    for name in API_SETTINGS:
+        digest.update(f"{name}={getattr(settings, name, None)!r}\n".encode())
+    return digest.hexdigest()
+
+
+def generate():
+    """
+    Build the schema and return its encoded documents by extension.
+    """
+    # drf_yasg is imported only when the schema is actually built, since
+    # importing it is slow (see docs.py).
+    from drf_yasg.app_settings import swagger_settings
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    codecs = {"json": OpenAPICodecJson, "yaml": OpenAPICodecYaml}
+    generator = OpenAPISchemaGenerator(swagger_settings.DEFAULT_INFO)
+    schema = generator.get_schema(request=None, public=True)
+    return {
+        extension: codec(validators=[]).encode(schema)
+        for extension, codec in codecs.items()
+    }
+
+
+def read(directory, fingerprint):
+    """
+    Return the stored documents if they match ``fingerprint``, else None.
+    """
+    try:
+        if (directory / FINGERPRINT_FILE).read_text().strip() != fingerprint:
+            return None
+        return {
+            extension: (directory / f"openapi.{extension}").read_bytes()
+            for extension in EXTENSIONS
+        }
+    except OSError:
+        return None
+
+
+def replace(path, content):
+    """
+    Write ``content`` to a temporary file next to ``path`` and move it into
+    place, so readers never see a partly written file.
+    """
+    fd, partial = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+        os.replace(partial, path)
+    finally:
+        Path(partial).unlink(missing_ok=True)
+
+
+def write(directory, contents, fingerprint):
+    directory.mkdir(parents=True, exist_ok=True)
+    for extension, content in contents.items():
+        replace(directory / f"openapi.{extension}", content)
+    # Written last, so an interrupted write is regenerated next time.
+    replace(directory / FINGERPRINT_FILE, f"{fingerprint}\n".encode())
+
+
+def build():
+    """
+    Return the stored documents, regenerating and storing them first if they
+    are missing or stale.
+    """
+    directory = schema_settings()["DIRECTORY"]
+    fingerprint = api_fingerprint()
+    if directory is not None:
+        contents = read(Path(directory), fingerprint)
+        if contents is not None:
+            return contents
+    contents = generate()
+    if directory is not None:
+        try:
+            write(Path(directory), contents, fingerprint)
+        except OSError as exc:
+            logger.warning("Could not store the OpenAPI schema: %s", exc)
+    return contents
+
+
+def load():
+    """
+    Return this process's schema documents by extension, building them on
+    first use.
+    """
+    global _documents
+    if _documents is None:
+        with _lock:
+            if _documents is None:
+                contents = build()
+                _documents = {
+                    extension: Document(content)
+                    for extension, content in contents.items()
+                }
+    return _documents
+
+
+def reset():
+    global _documents
+    with _lock:
+        _documents = None
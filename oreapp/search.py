@@ -0,0 +1,97 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Menu
+
+MAX_TERMS = 8
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def terms(query):
+    return TERM_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def search_menus(query, limit=20):
+    """
+    Return menus matching every word of ``query``, best matches first.
+
+    Name matches rank above description matches.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    if connection.vendor == "postgresql":
+        return list(
+            Menu.objects.raw(
+                """
+                SELECT id, name, description, price, is_discounted, is_drink
+                FROM oreapp_menu, websearch_to_tsquery('english', %s) query
+                WHERE search_vector @@ query
+                ORDER BY ts_rank(search_vector, query) DESC, id
+                LIMIT %s
+                """,
+                [" ".join(words), limit],
+            )
+        )
+    if connection.vendor == "sqlite":
+        return list(
+            Menu.objects.raw(
+                """
+                SELECT m.id, m.name, m.description, m.price, m.is_discounted,
+                       m.is_drink
+                FROM oreapp_menu_fts f JOIN oreapp_menu m ON m.id = f.rowid
+                WHERE oreapp_menu_fts MATCH %s
+                ORDER BY bm25(oreapp_menu_fts, 10.0, 1.0), m.id
+                LIMIT %s
+                """,
+                [" ".join(f'"{word}"' for word in words), limit],
+            )
+        )
+    queryset = Menu.objects.all()
+    for word in words:
+        queryset = queryset.filter(
+            Q(name__icontains=word) | Q(description__icontains=word)
+        )
+    return list(queryset.order_by("name", "id")[:limit])
+
+
+def autocomplete_menus(prefix, limit=10):
+    """
+    Return ``{"id", "name"}`` for menus whose name contains words starting
+    with each word of ``prefix``; the last word may be incomplete.
+    """
+    words = terms(prefix)
+    if not words:
+        return []
+    if connection.vendor == "postgresql":
+        sql = """
+            SELECT id, name FROM oreapp_menu, to_tsquery('english', %s) query
+            WHERE search_vector @@ query
+            ORDER BY ts_rank(search_vector, query) DESC, name
+            LIMIT %s
+        """
+        # :*A restricts each prefix to lexemes from the name.
+        params = [" & ".join(f"{word}:*A" for word in words), limit]
+    elif connection.vendor == "sqlite":
+        sql = """
+            SELECT rowid, name FROM oreapp_menu_fts
+            WHERE oreapp_menu_fts MATCH %s
+            ORDER BY bm25(oreapp_menu_fts), name
+            LIMIT %s
+        """
+        params = [
+            "name : (" + " ".join(f'"{word}"*' for word in words) + ")",
+            limit,
+        ]
+    else:
+        queryset = Menu.objects.all()
+        for word in words:
+            queryset = queryset.filter(name__icontains=word)
+        return list(queryset.order_by("name").values("id", "name")[:limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [{"id": pk, "name": name} for pk, name in cursor.fetchall()]
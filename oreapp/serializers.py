@@ -1,31 +1,270 @@
+import datetime
+from decimal import Decimal
+
+from django.utils import timezone
 from rest_framework import serializers
-from .models import User, Menu, Order
-from django.contrib.auth import get_user_model
+from rest_framework.utils import html
+from .models import User, Menu, Order, OrderItem, set_prefetched
+from django.contrib.auth import authenticate, get_user_model
 
 
 User = get_user_model()
 
+# The largest Order.total (max_digits=10, decimal_places=2) can hold.
+MAX_ORDER_TOTAL = Decimal("99999999.99")
+
+# The largest primary key the database accepts (a signed 64-bit integer).
+MAX_MENU_ID = 2**63 - 1
+
+
+def requested_fields(raw, available, param="fields"):
+    """
+    Return the names in ``raw``, a comma-separated ?fields= value, in order
+    and without repeats. Raises ValidationError for names not in ``available``.
+    """
+    requested = list(dict.fromkeys(name.strip() for name in raw.split(",")))
+    requested = [name for name in requested if name]
+    unknown = ", ".join(name for name in requested if name not in available)
+    if unknown:
+        raise serializers.ValidationError({param: [f"Unknown field(s): {unknown}."]})
+    return requested
+
+
+class SparseFieldsMixin:
+    """
+    Render only the fields listed in ``context["fields"]``, when the view
+    passes one (see SparseFieldsetMixin in views.py). Serializers nested
+    inside this one are left whole.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        wanted = self.context.get("fields")
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if wanted is not None and parent is None:
+            for name in set(fields) - set(wanted):
+                fields.pop(name)
+        return fields
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "username", "email", "is_staff_member", "is_customer"]
 
 
-class MenuSerializer(serializers.ModelSerializer):
+class MenuSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Menu
         fields = ["id", "name", "description", "price", "is_discounted", "is_drink"]
 
 
-class OrderSerializer(serializers.ModelSerializer):
-    menu_items = serializers.PrimaryKeyRelatedField(
-        queryset=Menu.objects.all(), many=True
-    )
+class MenuImportRowSerializer(serializers.Serializer):
+    """
+    One row of a menu import; see menu_import.py.
+    """
+
+    name = serializers.CharField(max_length=100)
+    description = serializers.CharField(allow_blank=True, default="")
+    price = serializers.DecimalField(max_digits=6, decimal_places=2)
+    is_discounted = serializers.BooleanField(default=False)
+    is_drink = serializers.BooleanField(default=False)
+
+
+class MenuImportQuerySerializer(serializers.Serializer):
+    input = serializers.ChoiceField(choices=["csv", "json"], default="csv")
+
+
+def integral(value):
+    """
+    int(value), refusing numbers with a fractional part such as 1.9.
+    """
+    number = int(value)
+    if not isinstance(value, str) and number != value:
+        raise ValueError(f"{value!r} is not a whole number")
+    return number
+
+
+class MenuItemQuantitiesField(serializers.Field):
+    """
+    Accepts either a list of menu ids or a list of
+    ``{"menu_item": id, "quantity": n}`` objects and returns ``{id: quantity}``.
+    Repeated ids add up, so ``[1, 1]`` means two of menu item 1, up to
+    ``max_quantity`` of each. Renders the order's menu ids.
+    """
+
+    max_quantity = 1000
+
+    default_error_messages = {
+        "not_a_list": 'Expected a list of items but got type "{input_type}".',
+        "invalid_item": (
+            'Expected a menu id or {{"menu_item": id, "quantity": n}} '
+            "but got {value!r}."
+        ),
+        "max_quantity": (
+            "Ensure no menu item is ordered more than {max_quantity} times."
+        ),
+        "max_total": "Ensure the order total is no more than {max_total}.",
+        "does_not_exist": 'Invalid pk(s) "{pk_values}" - object(s) do not exist.',
+    }
+
+    def get_value(self, dictionary):
+        if html.is_html_input(dictionary):
+            if self.field_name not in dictionary:
+                return serializers.empty
+            return dictionary.getlist(self.field_name)
+        return super().get_value(dictionary)
+
+    def to_internal_value(self, data):
+        if isinstance(data, (str, dict)) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        quantities = {}
+        for value in data:
+            menu_id, quantity = self.parse_item(value)
+            quantities[menu_id] = quantities.get(menu_id, 0) + quantity
+            if quantities[menu_id] > self.max_quantity:
+                self.fail("max_quantity", max_quantity=self.max_quantity)
+        return quantities
+
+    def parse_item(self, value):
+        if isinstance(value, dict):
+            menu_id, quantity = value.get("menu_item"), value.get("quantity", 1)
+        else:
+            menu_id, quantity = value, 1
+        if isinstance(menu_id, bool) or isinstance(quantity, bool):
+            self.fail("invalid_item", value=value)
+        try:
+            menu_id, quantity = integral(menu_id), integral(quantity)
+        except (TypeError, ValueError, OverflowError):
+            self.fail("invalid_item", value=value)
+        if not 1 <= menu_id <= MAX_MENU_ID or quantity < 1:
+            self.fail("invalid_item", value=value)
+        return menu_id, quantity
+
+    def check_total(self, total):
+        if total > MAX_ORDER_TOTAL:
+            self.fail("max_total", max_total=MAX_ORDER_TOTAL)
+
+    def to_representation(self, items):
+        return [item.menu_id for item in items.all()]
+
+
+class MenuItemsField(MenuItemQuantitiesField):
+    """
+    Resolves every submitted menu id with a single ``IN`` query and returns a
+    list of ``(menu, quantity)`` pairs. All unknown ids are reported together.
+    """
+
+    def to_internal_value(self, data):
+        quantities = super().to_internal_value(data)
+        menus = Menu.objects.in_bulk(list(quantities))
+        unknown = [pk for pk in quantities if pk not in menus]
+        if unknown:
+            self.fail("does_not_exist", pk_values=", ".join(map(str, unknown)))
+        self.check_total(sum(menus[pk].price * n for pk, n in quantities.items()))
+        return [(menus[pk], quantity) for pk, quantity in quantities.items()]
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    menu_item = serializers.IntegerField(source="menu_id", read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ["menu_item", "quantity", "unit_price"]
+
+
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    menu_items = MenuItemsField(source="items")
+    items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
-        fields = ["id", "customer", "menu_items", "created_at"]
+        fields = ["id", "customer", "menu_items", "items", "total", "created_at"]
+        read_only_fields = ["customer", "total"]
+
+    def get_fields(self):
+        """
+        Inline full menu payloads when the view asks for ?expand=menu_items.
+        """
+        fields = super().get_fields()
+        if "menu_items" in fields and "menu_items" in self.context.get("expand", ()):
+            fields["menu_items"] = MenuSerializer(many=True, read_only=True)
+        return fields
+
+    def create(self, validated_data):
+        lines = self.build_lines(validated_data.pop("items", []))
+        validated_data["total"] = sum(line.line_total for line in lines)
+        order = Order.objects.create(**validated_data)
+        self.save_lines(order, lines)
+        return order
+
+    def update(self, instance, validated_data):
+        items = validated_data.pop("items", None)
+        if items is not None:
+            lines = self.build_lines(items)
+            validated_data["total"] = sum(line.line_total for line in lines)
+        instance = super().update(instance, validated_data)
+        if items is not None:
+            instance.items.all().delete()
+            self.save_lines(instance, lines)
+        return instance
+
+    def build_lines(self, items):
+        """
+        Build unsaved order lines, capturing each menu item's current price.
+        """
+        return [
+            OrderItem(menu=menu, quantity=quantity, unit_price=menu.price)
+            for menu, quantity in items
+        ]
+
+    def save_lines(self, order, lines):
+        for line in lines:
+            line.order = order
+        OrderItem.objects.bulk_create(lines)
+        # Neither the response nor orders_placed() need query the new lines.
+        set_prefetched(order, "items", OrderItem.objects.filter(order=order), lines)
+
+
+class OrderSubmissionSerializer(serializers.Serializer):
+    """
+    Shape-only validation for one order in a bulk submission.
+
+    Menu ids are checked against the database for the whole batch at once.
+    """
+
+    menu_items = MenuItemQuantitiesField()
+
+
+class MenuSearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+
+class SalesQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.localdate())
+        attrs.setdefault("start", attrs["end"] - datetime.timedelta(days=6))
+        if attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("start must not be after end.")
+        return attrs
+
+
+class OrderExportQuerySerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=["csv", "ndjson"], default="csv")
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if "start" in attrs and "end" in attrs and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("start must not be after end.")
+        return attrs
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -45,3 +284,21 @@ class RegisterSerializer(serializers.ModelSerializer):
         user.set_password(validated_data["password"])
         user.save()
         return user
+
+
+class TokenObtainSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        user = authenticate(
+            request=self.context.get("request"),
+            username=attrs["username"],
+            password=attrs["password"],
+        )
+        if user is None:
+            raise serializers.ValidationError(
+                "Unable to log in with the provided credentials."
+            )
+        attrs["user"] = user
+        return attrs
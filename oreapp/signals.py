@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import archive, authentication, counters, rollups
+from .cache import menu_cache
+from .models import Menu, Order
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+def invalidate_menu_cache(sender, **kwargs):
+    """
+    Bump the menu cache version on every write to Menu.
+
+    The version is bumped straight away and again once the transaction commits,
+    so a reader that repopulated the cache from pre-commit data is discarded.
+    """
+    menu_cache.invalidate()
+    transaction.on_commit(menu_cache.invalidate)
+
+
+@receiver(post_init, sender=User)
+def remember_customer_flag(sender, instance, **kwargs):
+    # Reading a deferred field here would cost a query per loaded user.
+    if "is_staff_member" in instance.get_deferred_fields():
+        instance._was_customer = None
+    else:
+        instance._was_customer = not instance.is_staff_member
+
+
+@receiver(post_save, sender=User)
+def count_customer_on_save(sender, instance, created, update_fields, **kwargs):
+    """
+    Keep the registered_customers counter in step with is_staff_member.
+    """
+    is_customer = not instance.is_staff_member
+    if created:
+        if is_customer:
+            counters.increment(counters.REGISTERED_CUSTOMERS)
+    elif update_fields is None or "is_staff_member" in update_fields:
+        if instance._was_customer is not None and is_customer != instance._was_customer:
+            counters.increment(counters.REGISTERED_CUSTOMERS, 1 if is_customer else -1)
+    instance._was_customer = is_customer
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_account_state(sender, instance, **kwargs):
+    # Other processes pick the change up once their cached state expires.
+    authentication.forget(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def count_customer_on_delete(sender, instance, **kwargs):
+    if not instance.is_staff_member:
+        counters.increment(counters.REGISTERED_CUSTOMERS, -1)
+
+
+@receiver(post_delete, sender=Order)
+def count_order_on_delete(sender, instance, **kwargs):
+    # Archived orders still count as placed.
+    if not archive.is_archiving():
+        counters.record_orders([instance], amount=-1)
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_from_rollups(sender, instance, **kwargs):
+    # Read the lines now: they are deleted before post_delete is sent.
+    if not archive.is_archiving():
+        rollups.queue_changes([([instance], instance.items.all(), -1)])
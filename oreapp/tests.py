@@ -1,12 +1,76 @@
-from rest_framework.test import APITestCase
+import asyncio
+import csv
+import datetime
+import gzip
+import hashlib
+import json
+import tempfile
+import time
+import warnings
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
 from django.contrib.auth import get_user_model
-from oreapp.models import Menu, Order
-from oreapp.serializers import OrderSerializer
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from oreapp.cache import LocMemLRUBackend, menu_cache
+from oreapp import archive, counters, jobs, schema
+from oreapp.kitchen_feed import HEARTBEAT, notifier, order_events
+from oreapp.menu_import import import_menus
+from oreapp.management.commands.profile_startup import (
+    package_of,
+    parse_importtime,
+)
+from oreapp.middleware import (
+    QueryInstrumentationMiddleware,
+    RepeatedQueriesError,
+    fingerprint,
+)
+from oreapp.models import (
+    ArchivedOrderSegment,
+    Counter,
+    HourlySales,
+    IdempotencyKey,
+    Job,
+    Menu,
+    MenuItemDailySales,
+    Order,
+    OrderArchive,
+    OrderItem,
+)
+from oreapp.orders import create_order_batch
+from oreapp.pagination import OrderCursorPagination
+from oreapp.renderers import FastJSONRenderer
+from oreapp.replicas import ReplicaRoutingMiddleware
+from oreapp.rollups import apply_sales_deltas, rebuild_rollups
+from oreapp.serializers import MenuSerializer, OrderSerializer
+from oreapp.views import values_columns
 
 User = get_user_model()
 
 
+def set_counter(name, value):
+    Counter.objects.create(name=name, value=value)
+
+
+def set_counter_and_fail(name, value):
+    Counter.objects.create(name=name, value=value)
+    raise RuntimeError(f"could not finish {name}")
+
+
 class UserViewSetTests(APITestCase):
 
     def setUp(self):
@@ -179,8 +243,13 @@ class OrderViewSetTests(APITestCase):
             is_discounted=False,
             is_drink=False,
         )
-        self.order = Order.objects.create(customer=self.customer_user)
-        self.order.menu_items.set([self.menu_item1, self.menu_item2])
+        self.order = Order.objects.create(customer=self.customer_user, total=22.00)
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(order=self.order, menu=menu, unit_price=menu.price)
+                for menu in [self.menu_item1, self.menu_item2]
+            ]
+        )
 
     # def test_customer_can_place_order(self):
     #     self.client.login(username="customer", password="password")
@@ -198,16 +267,16 @@ class OrderViewSetTests(APITestCase):
         self.client.login(username="staff", password="password")
         response = self.client.get("/api/orders/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        order_ids = [order["id"] for order in response.data]
+        self.assertEqual(len(response.data["results"]), 1)
+        order_ids = [order["id"] for order in response.data["results"]]
         self.assertIn(self.order.id, order_ids)
 
     def test_customer_can_only_view_own_orders(self):
         self.client.login(username="customer", password="password")
         response = self.client.get("/api/orders/customer_orders/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        order_ids = [order["id"] for order in response.data]
+        self.assertEqual(len(response.data["results"]), 1)
+        order_ids = [order["id"] for order in response.data["results"]]
         self.assertIn(self.order.id, order_ids)
 
     def test_staff_can_retrieve_order_details(self):
@@ -220,6 +289,2062 @@ class OrderViewSetTests(APITestCase):
         )
 
 
+class OrderPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.other_customer = User.objects.create_user(
+            username="other", password="password"
+        )
+        self.orders = [
+            Order.objects.create(customer=self.customer_user) for _ in range(5)
+        ]
+        Order.objects.create(customer=self.other_customer)
+
+    def test_customer_orders_are_paginated_newest_first(self):
+        self.client.login(username="customer", password="password")
+        response = self.client.get("/api/orders/customer_orders/?page_size=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order_ids = [order["id"] for order in response.data["results"]]
+        self.assertEqual(order_ids, [self.orders[4].id, self.orders[3].id])
+        self.assertIsNotNone(response.data["next"])
+
+    def test_cursor_walks_every_order_once(self):
+        self.client.login(username="customer", password="password")
+        url = "/api/orders/customer_orders/?page_size=2"
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(order["id"] for order in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(seen, [order.id for order in reversed(self.orders)])
+
+    def test_later_pages_are_index_range_scans(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Checks SQLite's query plan.")
+        cursor = OrderCursorPagination().encode_cursor(
+            self.orders[2].created_at, self.orders[2].pk
+        )
+        request = Request(RequestFactory().get("/", {"cursor": cursor}))
+        for queryset in (
+            Order.objects.all(),
+            Order.objects.filter(customer=self.customer_user),
+        ):
+            page = OrderCursorPagination().get_page_queryset(queryset, request)
+            # A bound on created_at, not just the customer, limits the search.
+            self.assertRegex(page.explain(), r"SEARCH .*created_at<")
+            self.assertEqual(
+                [order.pk for order in page],
+                [order.pk for order in reversed(self.orders[:2])],
+            )
+
+    def test_new_orders_do_not_shift_later_pages(self):
+        self.client.login(username="customer", password="password")
+        response = self.client.get("/api/orders/customer_orders/?page_size=2")
+        next_url = response.data["next"]
+        Order.objects.create(customer=self.customer_user)
+        response = self.client.get(next_url)
+        order_ids = [order["id"] for order in response.data["results"]]
+        self.assertEqual(order_ids, [self.orders[2].id, self.orders[1].id])
+
+    def test_invalid_cursor_returns_not_found(self):
+        self.client.login(username="customer", password="password")
+        response = self.client.get("/api/orders/customer_orders/?cursor=garbage")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class OrderQueryCountTests(APITestCase):
+
+    def setUp(self):
+        self.staff_user = User.objects.create_user(
+            username="staff", password="password", is_staff_member=True
+        )
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.menu_items = [
+            Menu.objects.create(name=f"Dish {i}", description="", price=5.00)
+            for i in range(3)
+        ]
+        for _ in range(10):
+            order = Order.objects.create(customer=self.customer_user, total=15.00)
+            OrderItem.objects.bulk_create(
+                [
+                    OrderItem(order=order, menu=menu, unit_price=menu.price)
+                    for menu in self.menu_items
+                ]
+            )
+
+    def test_order_list_query_count_is_constant(self):
+        self.client.login(username="staff", password="password")
+        # session, user, orders, prefetched order items
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/orders/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_customer_orders_query_count_is_constant(self):
+        self.client.login(username="customer", password="password")
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/orders/customer_orders/")
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_expand_menu_items_inlines_menus_without_extra_queries(self):
+        self.client.login(username="staff", password="password")
+        # session, user, orders, prefetched items, prefetched menus
+        with self.assertNumQueries(5):
+            response = self.client.get("/api/orders/?expand=menu_items")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        items = response.data["results"][0]["menu_items"]
+        self.assertEqual(
+            {item["name"] for item in items}, {"Dish 0", "Dish 1", "Dish 2"}
+        )
+
+    def test_retrieve_with_expand(self):
+        self.client.login(username="staff", password="password")
+        order = Order.objects.first()
+        response = self.client.get(f"/api/orders/{order.id}/?expand=menu_items")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["menu_items"][0]["price"], "5.00")
+
+
+class MenuCacheTests(APITestCase):
+
+    def setUp(self):
+        menu_cache.reset()
+        self.staff_user = User.objects.create_user(
+            username="staff", password="password", is_staff_member=True
+        )
+        self.menu = Menu.objects.create(
+            name="Pizza", description="Cheesy.", price=10.00, is_discounted=True
+        )
+
+    def tearDown(self):
+        menu_cache.reset()
+
+    def test_repeated_list_is_served_from_cache(self):
+        self.client.get("/api/menus/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/menus/")
+        self.assertEqual(response.data[0]["name"], "Pizza")
+        self.assertEqual(menu_cache.stats(), {"hits": 1, "misses": 1})
+
+    def test_actions_are_cached_separately(self):
+        list_response = self.client.get("/api/menus/")
+        drinks_response = self.client.get("/api/menus/drinks/")
+        self.assertEqual(len(list_response.data), 1)
+        self.assertEqual(drinks_response.data, [])
+
+    def test_update_invalidates_cache(self):
+        self.client.get("/api/menus/discounted/")
+        self.client.login(username="staff", password="password")
+        self.client.patch(f"/api/menus/{self.menu.id}/", {"is_discounted": False})
+        response = self.client.get("/api/menus/discounted/")
+        self.assertEqual(response.data, [])
+
+    def test_create_and_destroy_invalidate_cache(self):
+        self.client.get("/api/menus/")
+        self.client.login(username="staff", password="password")
+        self.client.post(
+            "/api/menus/", {"name": "Coke", "description": "Cola", "price": "2.00"}
+        )
+        self.assertEqual(len(self.client.get("/api/menus/").data), 2)
+        self.client.delete(f"/api/menus/{self.menu.id}/")
+        self.assertEqual(len(self.client.get("/api/menus/").data), 1)
+
+    @override_settings(
+        ORE_RESPONSE_CACHE={
+            "BACKEND": "oreapp.cache.DjangoCacheBackend",
+            "OPTIONS": {"alias": "default"},
+        }
+    )
+    def test_django_cache_backend(self):
+        menu_cache.reset()
+        self.client.get("/api/menus/")
+        self.client.get("/api/menus/")
+        self.assertEqual(menu_cache.stats(), {"hits": 1, "misses": 1})
+        Menu.objects.create(name="Coke", description="Cola", price=2.00)
+        self.assertEqual(len(self.client.get("/api/menus/").data), 2)
+
+
+class LocMemLRUBackendTests(APITestCase):
+
+    def test_evicts_least_recently_used_entry(self):
+        backend = LocMemLRUBackend(max_entries=2)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        backend.get("a")
+        backend.set("c", 3)
+        self.assertEqual(backend.get("a"), 1)
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.get("c"), 3)
+
+    def test_bump_version_changes_version(self):
+        backend = LocMemLRUBackend()
+        version = backend.get_version("menu")
+        self.assertEqual(backend.bump_version("menu"), version + 1)
+        self.assertEqual(backend.get_version("menu"), version + 1)
+
+    def test_shared_versions_reach_every_process(self):
+        # Two backends stand in for two worker processes.
+        first = LocMemLRUBackend(versions="shared")
+        second = LocMemLRUBackend(versions="shared")
+        version = second.get_version("menu-test")
+        first.bump_version("menu-test")
+        self.assertGreater(second.get_version("menu-test"), version)
+        self.assertGreater(asyncio.run(second.aget_version("menu-test")), version)
+
+
+class BulkOrderTests(APITestCase):
+
+    def setUp(self):
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+        self.coke = Menu.objects.create(name="Coke", description="", price=2.00)
+        self.client.login(username="customer", password="password")
+
+    def test_bulk_creates_all_orders(self):
+        data = [
+            {"menu_items": [self.pizza.id, self.coke.id]},
+            {"menu_items": [self.coke.id]},
+        ]
+        response = self.client.post("/api/orders/bulk/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        ids = [result["id"] for result in response.data["results"]]
+        self.assertEqual(Order.objects.filter(customer=self.customer_user).count(), 2)
+        self.assertEqual(
+            set(Order.objects.get(id=ids[0]).menu_items.values_list("id", flat=True)),
+            {self.pizza.id, self.coke.id},
+        )
+
+    def test_bulk_reports_invalid_items_and_keeps_valid_ones(self):
+        data = [
+            {"menu_items": [self.pizza.id]},
+            {"menu_items": [self.pizza.id, 9999]},
+            {"menu_items": "not a list"},
+        ]
+        response = self.client.post("/api/orders/bulk/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["created", "error", "error"])
+        self.assertIn("9999", response.data["results"][1]["errors"]["menu_items"][0])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_bulk_rejects_non_list_payload(self):
+        response = self.client.post(
+            "/api/orders/bulk/", {"menu_items": [self.pizza.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_query_count_does_not_grow_with_batch_size(self):
+        def count_queries(size):
+            data = [{"menu_items": [self.pizza.id, self.coke.id]}] * size
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post("/api/orders/bulk/", data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+
+        # The first batch of the day also creates the daily order counter.
+        count_queries(1)
+        self.assertEqual(count_queries(2), count_queries(40))
+
+
+class OrderItemValidationTests(APITestCase):
+
+    def setUp(self):
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+        self.coke = Menu.objects.create(name="Coke", description="", price=2.00)
+        self.client.login(username="customer", password="password")
+
+    def test_menu_items_are_resolved_with_one_query(self):
+        menus = [
+            Menu.objects.create(name=f"Dish {i}", description="", price=1.00)
+            for i in range(25)
+        ]
+        serializer = OrderSerializer(data={"menu_items": [menu.id for menu in menus]})
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+
+    def test_unknown_menu_items_are_reported_together(self):
+        serializer = OrderSerializer(data={"menu_items": [self.pizza.id, 9998, 9999]})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(len(serializer.errors["menu_items"]), 1)
+        self.assertIn("9998, 9999", serializer.errors["menu_items"][0])
+
+    def test_customer_can_order_quantities(self):
+        data = {
+            "menu_items": [
+                {"menu_item": self.coke.id, "quantity": 3},
+                {"menu_item": self.pizza.id},
+            ]
+        }
+        response = self.client.post("/api/orders/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.data["items"],
+            [
+                {"menu_item": self.coke.id, "quantity": 3, "unit_price": "2.00"},
+                {"menu_item": self.pizza.id, "quantity": 1, "unit_price": "10.00"},
+            ],
+        )
+
+    def test_repeated_ids_add_up(self):
+        data = {"menu_items": [self.coke.id, self.coke.id, self.pizza.id]}
+        response = self.client.post("/api/orders/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(id=response.data["id"])
+        self.assertEqual(order.items.get(menu=self.coke).quantity, 2)
+
+    def test_form_encoded_order(self):
+        data = {"menu_items": [self.pizza.id, self.coke.id]}
+        response = self.client.post("/api/orders/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            set(response.data["menu_items"]), {self.pizza.id, self.coke.id}
+        )
+
+    def test_invalid_quantity_is_rejected(self):
+        data = {"menu_items": [{"menu_item": self.coke.id, "quantity": 0}]}
+        response = self.client.post("/api/orders/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fractional_quantities_are_rejected(self):
+        for quantity in (1.9, "1.9"):
+            data = {"menu_items": [{"menu_item": self.coke.id, "quantity": quantity}]}
+            response = self.client.post("/api/orders/", data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        data = {"menu_items": [{"menu_item": self.coke.id, "quantity": 2.0}]}
+        response = self.client.post("/api/orders/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_huge_quantities_are_rejected(self):
+        data = {"menu_items": [{"menu_item": self.coke.id, "quantity": 10**12}]}
+        response = self.client.post("/api/orders/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("more than 1000 times", response.data["menu_items"][0])
+        # The cap applies to the sum of repeated items too.
+        data = {"menu_items": [{"menu_item": self.coke.id, "quantity": 600}] * 2}
+        response = self.client.post("/api/orders/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # Menu ids beyond a 64-bit primary key are invalid, not a server error.
+        for menu_id in (2**63, 2**70):
+            data = {"menu_items": [{"menu_item": menu_id, "quantity": 1}]}
+            response = self.client.post("/api/orders/", data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("Expected a menu id", response.data["menu_items"][0])
+
+    def test_totals_beyond_the_total_column_are_rejected(self):
+        menus = [
+            Menu.objects.create(name=f"Feast {i}", description="", price=9999.99)
+            for i in range(11)
+        ]
+        items = [{"menu_item": menu.id, "quantity": 1000} for menu in menus]
+        response = self.client.post(
+            "/api/orders/", {"menu_items": items}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("99999999.99", response.data["menu_items"][0])
+
+        response = self.client.post(
+            "/api/orders/bulk/",
+            [{"menu_items": items}, {"menu_items": [self.coke.id]}],
+            format="json",
+        )
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], ["error", "created"])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_bulk_accepts_quantities(self):
+        data = [{"menu_items": [{"menu_item": self.coke.id, "quantity": 4}]}]
+        response = self.client.post("/api/orders/bulk/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(id=response.data["results"][0]["id"])
+        self.assertEqual(order.items.get().quantity, 4)
+
+
+class OrderTotalTests(APITestCase):
+
+    def setUp(self):
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+        self.coke = Menu.objects.create(name="Coke", description="", price=2.50)
+        self.client.login(username="customer", password="password")
+
+    def test_total_is_stored_on_create(self):
+        data = {
+            "menu_items": [
+                {"menu_item": self.coke.id, "quantity": 3},
+                {"menu_item": self.pizza.id},
+            ]
+        }
+        response = self.client.post("/api/orders/", data, format="json")
+        self.assertEqual(response.data["total"], "17.50")
+        order = Order.objects.get(id=response.data["id"])
+        self.assertEqual(order.total, Decimal("17.50"))
+
+    def test_price_change_does_not_alter_existing_orders(self):
+        data = {"menu_items": [{"menu_item": self.pizza.id, "quantity": 2}]}
+        response = self.client.post("/api/orders/", data, format="json")
+        self.pizza.price = Decimal("99.00")
+        self.pizza.save()
+        order = Order.objects.get(id=response.data["id"])
+        self.assertEqual(order.total, Decimal("20.00"))
+        self.assertEqual(order.items.get().unit_price, Decimal("10.00"))
+
+    def test_bulk_orders_store_totals(self):
+        data = [
+            {"menu_items": [self.pizza.id, self.coke.id]},
+            {"menu_items": [{"menu_item": self.coke.id, "quantity": 2}]},
+        ]
+        response = self.client.post("/api/orders/bulk/", data, format="json")
+        totals = [
+            Order.objects.get(id=result["id"]).total
+            for result in response.data["results"]
+        ]
+        self.assertEqual(totals, [Decimal("12.50"), Decimal("5.00")])
+
+
+class SalesRollupTests(APITestCase):
+
+    def setUp(self):
+        self.staff_user = User.objects.create_user(
+            username="staff", password="password", is_staff_member=True
+        )
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+        self.coke = Menu.objects.create(name="Coke", description="", price=2.00)
+        self.client.login(username="customer", password="password")
+        self.client.post(
+            "/api/orders/",
+            {"menu_items": [{"menu_item": self.coke.id, "quantity": 3}]},
+            format="json",
+        )
+        self.client.post(
+            "/api/orders/bulk/",
+            [
+                {"menu_items": [self.pizza.id, self.coke.id]},
+                {"menu_items": [self.pizza.id]},
+            ],
+            format="json",
+        )
+        jobs.run_pending()
+
+    def test_rollups_are_updated_as_orders_are_created(self):
+        hour = HourlySales.objects.get()
+        self.assertEqual(hour.order_count, 3)
+        self.assertEqual(hour.revenue, Decimal("28.00"))
+        coke = MenuItemDailySales.objects.get(menu=self.coke)
+        self.assertEqual(coke.quantity, 4)
+        self.assertEqual(coke.revenue, Decimal("8.00"))
+
+    def test_rebuild_matches_incremental_rollups(self):
+        def snapshot():
+            return (
+                list(HourlySales.objects.values_list("hour", "order_count", "revenue")),
+                list(
+                    MenuItemDailySales.objects.order_by("menu_id").values_list(
+                        "date", "menu_id", "quantity", "revenue"
+                    )
+                ),
+            )
+
+        incremental = snapshot()
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
+
+    def test_rollups_follow_order_updates_and_deletes(self):
+        def rollups():
+            jobs.run_pending()
+            return (
+                list(HourlySales.objects.values_list("order_count", "revenue")),
+                dict(MenuItemDailySales.objects.values_list("menu__name", "quantity")),
+            )
+
+        order = Order.objects.filter(items__menu=self.coke).earliest("id")
+        response = self.client.patch(
+            f"/api/orders/{order.id}/",
+            {"menu_items": [{"menu_item": self.pizza.id, "quantity": 2}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(rollups(), ([(3, Decimal("42.00"))], {"Coke": 1, "Pizza": 4}))
+
+        self.client.delete(f"/api/orders/{order.id}/")
+        self.assertEqual(rollups(), ([(2, Decimal("22.00"))], {"Coke": 1, "Pizza": 2}))
+        for order in Order.objects.all():
+            order.delete()
+        self.assertEqual(rollups(), ([], {}))
+
+    def test_deltas_apply_in_any_order(self):
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        day = timezone.localdate(hour)
+        placed = {
+            "hourly": [[hour.isoformat(), 1, "2.50"]],
+            "daily": [[day.isoformat(), self.pizza.id, 1, "2.50"]],
+        }
+        removed = {
+            "hourly": [[hour.isoformat(), -1, "-2.50"]],
+            "daily": [[day.isoformat(), self.pizza.id, -1, "-2.50"]],
+        }
+        HourlySales.objects.all().delete()
+        MenuItemDailySales.objects.all().delete()
+        apply_sales_deltas(**removed)
+        self.assertEqual(HourlySales.objects.get().order_count, -1)
+        apply_sales_deltas(**placed)
+        self.assertFalse(HourlySales.objects.exists())
+        self.assertFalse(MenuItemDailySales.objects.exists())
+
+    def test_staff_can_read_sales_summary(self):
+        self.client.login(username="staff", password="password")
+        response = self.client.get("/api/sales/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["daily"][0]["order_count"], 3)
+        self.assertEqual(response.data["daily"][0]["revenue"], "28.00")
+        self.assertEqual(response.data["hourly"][0]["order_count"], 3)
+        self.assertEqual(
+            [item["name"] for item in response.data["top_items"]], ["Coke", "Pizza"]
+        )
+
+    def test_sales_summary_respects_date_range(self):
+        self.client.login(username="staff", password="password")
+        response = self.client.get("/api/sales/?start=2000-01-01&end=2000-01-31")
+        self.assertEqual(response.data["daily"], [])
+        self.assertEqual(response.data["top_items"], [])
+
+    def test_customer_cannot_read_sales_summary(self):
+        response = self.client.get("/api/sales/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class CounterTests(APITestCase):
+
+    def setUp(self):
+        self.staff_user = User.objects.create_user(
+            username="staff", password="password", is_staff_member=True
+        )
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+
+    def test_registered_customers_is_a_single_lookup(self):
+        self.client.login(username="staff", password="password")
+        # session, user, counter
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/users/registered_customers/")
+        self.assertEqual(response.data["registered_customers"], 1)
+
+    def test_customer_counter_follows_registration_and_deletion(self):
+        self.client.post(
+            "/api/register/customer/",
+            {"username": "new", "email": "new@example.com", "password": "pw"},
+        )
+        self.client.post(
+            "/api/register/staff/",
+            {"username": "cook", "email": "cook@example.com", "password": "pw"},
+        )
+        self.assertEqual(counters.read(counters.REGISTERED_CUSTOMERS), 2)
+        self.customer_user.delete()
+        self.assertEqual(counters.read(counters.REGISTERED_CUSTOMERS), 1)
+
+    def test_promoting_customer_to_staff_updates_counter(self):
+        self.customer_user.is_staff_member = True
+        self.customer_user.save()
+        self.assertEqual(counters.read(counters.REGISTERED_CUSTOMERS), 0)
+
+    def test_order_stats(self):
+        self.client.login(username="customer", password="password")
+        self.client.post("/api/orders/", {"menu_items": [self.pizza.id]}, format="json")
+        self.client.post(
+            "/api/orders/bulk/",
+            [{"menu_items": [self.pizza.id]}] * 3,
+            format="json",
+        )
+        self.client.login(username="staff", password="password")
+        response = self.client.get("/api/orders/stats/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"total_orders": 4, "orders_today": 4})
+        Order.objects.first().delete()
+        response = self.client.get("/api/orders/stats/")
+        self.assertEqual(response.data, {"total_orders": 3, "orders_today": 3})
+
+    def test_reconcile_corrects_drift(self):
+        counters.read(counters.REGISTERED_CUSTOMERS)
+        Counter.objects.filter(name=counters.REGISTERED_CUSTOMERS).update(value=42)
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertIn("registered_customers: 42 -> 1", out.getvalue())
+        self.assertEqual(counters.read(counters.REGISTERED_CUSTOMERS), 1)
+
+
+class OrderExportTests(APITestCase):
+
+    def setUp(self):
+        self.staff_user = User.objects.create_user(
+            username="staff", password="password", is_staff_member=True
+        )
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+        self.coke = Menu.objects.create(name="Coke", description="", price=2.00)
+        self.client.login(username="customer", password="password")
+        self.client.post(
+            "/api/orders/bulk/",
+            [
+                {
+                    "menu_items": [
+                        self.pizza.id,
+                        {"menu_item": self.coke.id, "quantity": 2},
+                    ]
+                },
+                {"menu_items": [self.coke.id]},
+            ],
+            format="json",
+        )
+
+    def export(self, query=""):
+        self.client.login(username="staff", password="password")
+        response = self.client.get(f"/api/orders/export/{query}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_export_has_one_row_per_item(self):
+        rows = list(csv.reader(self.export().splitlines()))
+        self.assertEqual(rows[0][0], "order_id")
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[2][4:], [str(self.coke.id), "2", "2.00"])
+
+    def test_ndjson_export_has_one_document_per_order(self):
+        documents = [
+            json.loads(line) for line in self.export("?output=ndjson").splitlines()
+        ]
+        self.assertEqual(len(documents), 2)
+        self.assertEqual(documents[0]["total"], "14.00")
+        self.assertEqual(len(documents[0]["items"]), 2)
+
+    def test_export_date_filter(self):
+        self.assertEqual(
+            self.export("?output=ndjson&start=2000-01-01&end=2000-12-31"), ""
+        )
+
+    def test_customer_cannot_export(self):
+        response = self.client.get("/api/orders/export/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_asgi_export_streams_without_buffering(self):
+        expected = await sync_to_async(self.export)("?output=ndjson")
+        await self.async_client.aforce_login(self.staff_user)
+        response = await self.async_client.get("/api/orders/export/?output=ndjson")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        with warnings.catch_warnings():
+            # Django warns when it has to buffer a sync iterator.
+            warnings.simplefilter("error")
+            content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(content.decode(), expected)
+
+
+class AsyncReadPathTests(APITestCase):
+
+    def setUp(self):
+        menu_cache.reset()
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+        self.coke = Menu.objects.create(
+            name="Coke", description="", price=2.00, is_drink=True
+        )
+        self.client.login(username="customer", password="password")
+        self.client.post(
+            "/api/orders/bulk/",
+            [{"menu_items": [self.pizza.id, self.coke.id]}] * 3,
+            format="json",
+        )
+
+    def tearDown(self):
+        menu_cache.reset()
+
+    def assertSamePayload(self, sync_path, async_path):
+        sync_response = self.client.get(sync_path)
+        async_response = self.client.get(async_path)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_menu_endpoints_match_sync_versions(self):
+        self.assertSamePayload("/api/menus/", "/api/async/menus/")
+        self.assertSamePayload("/api/menus/drinks/", "/api/async/menus/drinks/")
+        self.assertSamePayload(
+            "/api/menus/discounted/", "/api/async/menus/discounted/"
+        )
+
+    def test_profile_matches_sync_version(self):
+        self.assertSamePayload("/api/users/profile/", "/api/async/users/profile/")
+
+    def test_customer_orders_match_sync_version(self):
+        sync_data = self.client.get("/api/orders/customer_orders/?page_size=2").json()
+        async_data = self.client.get(
+            "/api/async/orders/customer_orders/?page_size=2"
+        ).json()
+        self.assertEqual(async_data["results"], sync_data["results"])
+        self.assertEqual(
+            async_data["next"].split("?")[1], sync_data["next"].split("?")[1]
+        )
+
+    def test_anonymous_profile_is_rejected(self):
+        self.client.logout()
+        response = self.client.get("/api/async/users/profile/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_async_client_reads_menus(self):
+        response = await self.async_client.get("/api/async/menus/drinks/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([menu["name"] for menu in response.json()], ["Coke"])
+
+
+class MenuSearchTests(APITestCase):
+
+    def setUp(self):
+        menu_cache.reset()
+        self.user = User.objects.create_user(username="customer", password="password")
+        self.margherita = Menu.objects.create(
+            name="Margherita Pizza", description="Tomato and mozzarella", price=10.00
+        )
+        self.lasagne = Menu.objects.create(
+            name="Lasagne", description="Baked like a pizza would be", price=12.00
+        )
+        self.mango = Menu.objects.create(
+            name="Mango Smoothie", description="Fresh mangoes", price=4.00
+        )
+        self.client.login(username="customer", password="password")
+
+    def tearDown(self):
+        menu_cache.reset()
+
+    def search(self, q, path="/api/menus/search/"):
+        response = self.client.get(path, {"q": q})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [menu["name"] for menu in response.data]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search("pizza"), ["Margherita Pizza", "Lasagne"])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.search("pizza tomato"), ["Margherita Pizza"])
+        self.assertEqual(self.search("pizza mango"), [])
+
+    def test_autocomplete_matches_name_prefixes(self):
+        path = "/api/menus/search/autocomplete/"
+        self.assertEqual(
+            self.search("ma", path), ["Mango Smoothie", "Margherita Pizza"]
+        )
+        self.assertEqual(self.search("marg piz", path), ["Margherita Pizza"])
+        self.assertEqual(self.search("bake", path), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.assertEqual(self.search("smoothie"), ["Mango Smoothie"])
+        self.mango.name = "Mango Lassi"
+        self.mango.save()
+        self.assertEqual(self.search("smoothie"), [])
+        self.assertEqual(self.search("lassi"), ["Mango Lassi"])
+        self.mango.delete()
+        self.assertEqual(self.search("lassi"), [])
+
+    def test_query_is_required(self):
+        response = self.client.get("/api/menus/search/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search("!!"), [])
+
+    def test_search_is_public(self):
+        self.client.logout()
+        self.assertEqual(self.search("lasagne"), ["Lasagne"])
+
+
+class TokenAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        self.staff_user = User.objects.create_user(
+            username="staff", password="password", is_staff_member=True
+        )
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+
+    def obtain(self, username):
+        response = self.client.post(
+            "/api/token/", {"username": username, "password": "password"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["token"]
+
+    def use(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_bad_credentials_are_rejected(self):
+        response = self.client.post(
+            "/api/token/", {"username": "staff", "password": "wrong"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_permissions_are_decided_without_user_or_session_queries(self):
+        self.use(self.obtain("staff"))
+        self.client.get("/api/orders/stats/")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/orders/stats/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for query in queries.captured_queries:
+            self.assertNotIn("oreapp_user", query["sql"])
+            self.assertNotIn("django_session", query["sql"])
+
+    def test_customer_token_is_not_staff(self):
+        self.use(self.obtain("customer"))
+        response = self.client.get("/api/orders/stats/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_orders_are_created_for_the_token_user(self):
+        self.use(self.obtain("customer"))
+        response = self.client.post(
+            "/api/orders/", {"menu_items": [self.pizza.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["customer"], self.customer_user.id)
+
+    def test_profile_loads_the_full_user(self):
+        self.use(self.obtain("customer"))
+        response = self.client.get("/api/users/profile/")
+        self.assertEqual(response.data["username"], "customer")
+        self.assertEqual(response.data["is_customer"], True)
+
+    def test_revoked_tokens_are_rejected(self):
+        token = self.obtain("customer")
+        self.use(token)
+        response = self.client.post("/api/token/revoke/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get("/api/users/profile/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data["detail"], "Token has been revoked.")
+        self.use(self.obtain("customer"))
+        response = self.client.get("/api/users/profile/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_role_change_invalidates_token(self):
+        self.use(self.obtain("staff"))
+        self.staff_user.is_staff_member = False
+        self.staff_user.save()
+        response = self.client.get("/api/orders/stats/")
+        self.assertEqual(response.data["detail"], "Token has been revoked.")
+
+    def test_tampered_and_expired_tokens_are_rejected(self):
+        token = self.obtain("customer")
+        self.use(token[:-1] + ("A" if token[-1] != "A" else "B"))
+        response = self.client.get("/api/users/profile/")
+        self.assertEqual(response.data["detail"], "Invalid token.")
+        self.use(token)
+        with override_settings(ORE_AUTH_TOKEN={"MAX_AGE": -1}):
+            response = self.client.get("/api/users/profile/")
+        self.assertEqual(response.data["detail"], "Token has expired.")
+
+    async def test_async_views_accept_tokens(self):
+        token = await sync_to_async(self.obtain)("customer")
+        headers = {"Authorization": f"Bearer {token}"}
+        response = await self.async_client.get(
+            "/api/async/users/profile/", headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["username"], "customer")
+        response = await self.async_client.get(
+            "/api/async/orders/customer_orders/", headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = await self.async_client.get(
+            "/api/async/orders/feed/", headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        headers = {"Authorization": f"Bearer {token[:-1]}"}
+        response = await self.async_client.get(
+            "/api/async/users/profile/", headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json()["detail"], "Invalid token.")
+
+
+class MenuImportTests(APITestCase):
+
+    def setUp(self):
+        menu_cache.reset()
+        self.staff_user = User.objects.create_user(
+            username="staff", password="password", is_staff_member=True
+        )
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+        self.coke = Menu.objects.create(
+            name="Coke", description="", price=2.00, is_drink=True
+        )
+        self.client.login(username="staff", password="password")
+
+    def tearDown(self):
+        menu_cache.reset()
+
+    def post(self, body, input_format="csv"):
+        content_type = "text/csv" if input_format == "csv" else "application/json"
+        return self.client.post(
+            f"/api/menus/import/?input={input_format}",
+            body,
+            content_type=content_type,
+        )
+
+    def test_csv_upsert_reports_counts(self):
+        response = self.post(
+            "name,description,price,is_drink\n"
+            "Pizza,Now with basil,11.50,\n"
+            "Coke,,2.00,true\n"
+            "Fanta,Orange,2.50,true\n"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"inserted": 1, "updated": 1, "unchanged": 1})
+        self.pizza.refresh_from_db()
+        self.assertEqual(self.pizza.price, Decimal("11.50"))
+        self.assertEqual(self.pizza.description, "Now with basil")
+        self.assertTrue(Menu.objects.get(name="Fanta").is_drink)
+
+    def test_json_array_and_lines(self):
+        rows = [{"name": f"Dish {i}", "price": "5.00"} for i in range(5)]
+        response = self.post(json.dumps(rows), "json")
+        self.assertEqual(response.data["inserted"], 5)
+        response = self.post("\n".join(json.dumps(row) for row in rows), "json")
+        self.assertEqual(response.data["unchanged"], 5)
+
+    def test_invalid_rows_reject_the_whole_import(self):
+        response = self.post("name,price\nSoup,4.00\n,3.00\nStew,abc\n")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["invalid_rows"], 2)
+        self.assertEqual([e["row"] for e in response.data["errors"]], [2, 3])
+        self.assertFalse(Menu.objects.filter(name="Soup").exists())
+
+    def test_malformed_json_is_rejected(self):
+        response = self.post('[{"name": "Soup", "price": "4.00"}, {"name"', "json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Menu.objects.filter(name="Soup").exists())
+
+    def test_import_refreshes_cached_menus(self):
+        self.client.get("/api/menus/")
+        self.post("name,price\nSoup,4.00\n")
+        names = [menu["name"] for menu in self.client.get("/api/menus/").data]
+        self.assertIn("Soup", names)
+
+    def test_import_is_staff_only(self):
+        self.client.login(username="customer", password="password")
+        response = self.post("name,price\nSoup,4.00\n")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_queries_scale_with_chunks_not_rows(self):
+        rows = [{"name": f"Dish {i}", "price": "5.00"} for i in range(300)]
+        with CaptureQueriesContext(connection) as queries:
+            counts = import_menus(rows, chunk_size=100)
+        self.assertEqual(counts["inserted"], 300)
+        self.assertLess(len(queries), 20)
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as handle:
+            handle.write("name,price\nPizza,10.00\nSoup,4.00\n")
+            handle.flush()
+            out = StringIO()
+            call_command("import_menus", handle.name, stdout=out)
+        self.assertIn("1 inserted, 0 updated, 1 unchanged", out.getvalue())
+
+
+@modify_settings(
+    MIDDLEWARE={"prepend": "oreapp.middleware.QueryInstrumentationMiddleware"}
+)
+@override_settings(
+    ORE_SQL_INSTRUMENTATION={"SLOW_REQUEST_MS": 10000, "MAX_REPEATED_QUERIES": 2}
+)
+class SQLInstrumentationTests(APITestCase):
+
+    def setUp(self):
+        menu_cache.reset()
+        self.staff_user = User.objects.create_user(
+            username="staff", password="password", is_staff_member=True
+        )
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        menus = [
+            Menu.objects.create(name=f"Dish {i}", description="", price=5.00)
+            for i in range(5)
+        ]
+        create_order_batch(
+            self.customer_user,
+            [
+                {"menu_items": [menu.id for menu in menus[: 1 + i % 5]]}
+                for i in range(20)
+            ],
+        )
+        self.client.login(username="customer", password="password")
+
+    def tearDown(self):
+        menu_cache.reset()
+
+    def test_server_timing_header(self):
+        response = self.client.get("/api/orders/")
+        self.assertRegex(
+            response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur='
+        )
+
+    def test_order_endpoints_have_no_n_plus_one(self):
+        # RepeatedQueriesError propagates through the test client.
+        self.client.get("/api/orders/")
+        self.client.get("/api/orders/?expand=menu_items")
+        self.client.get("/api/orders/customer_orders/?page_size=5")
+        self.client.login(username="staff", password="password")
+        self.client.get("/api/orders/")
+        self.client.get("/api/sales/")
+        self.client.get("/api/users/")
+
+    def test_repeated_query_shapes_fail(self):
+        def n_plus_one(request):
+            for order in Order.objects.all():
+                list(order.items.all())
+            return HttpResponse()
+
+        middleware = QueryInstrumentationMiddleware(n_plus_one)
+        with self.assertRaisesMessage(RepeatedQueriesError, "ran the same query 20"):
+            middleware(RequestFactory().get("/api/orders/"))
+
+    def test_slow_requests_are_logged(self):
+        with override_settings(ORE_SQL_INSTRUMENTATION={"SLOW_REQUEST_MS": -1}):
+            with self.assertLogs("oreapp.sql", "WARNING") as logs:
+                self.client.get("/api/orders/")
+        self.assertIn("Slow request GET /api/orders/", logs.output[0])
+
+    def test_fingerprints_ignore_literals_and_in_list_length(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s)  AND name = 'y'"),
+        )
+
+
+class MenuConditionalRequestTests(APITestCase):
+
+    def setUp(self):
+        menu_cache.reset()
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+        self.coke = Menu.objects.create(
+            name="Coke", description="", price=2.00, is_drink=True
+        )
+
+    def tearDown(self):
+        menu_cache.reset()
+
+    def test_list_revalidates_with_etag(self):
+        response = self.client.get("/api/menus/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("s-maxage=300", response["Cache-Control"])
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/menus/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+    def test_etag_changes_on_update_insert_and_delete(self):
+        etags = [self.client.get("/api/menus/")["ETag"]]
+        self.pizza.price = 11.00
+        self.pizza.save()
+        etags.append(self.client.get("/api/menus/")["ETag"])
+        Menu.objects.create(name="Soup", description="", price=4.00)
+        etags.append(self.client.get("/api/menus/")["ETag"])
+        self.coke.delete()
+        etags.append(self.client.get("/api/menus/")["ETag"])
+        self.assertEqual(len(set(etags)), 4)
+        response = self.client.get("/api/menus/", HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since(self):
+        response = self.client.get(f"/api/menus/{self.coke.id}/")
+        last_modified = response["Last-Modified"]
+        response = self.client.get(
+            f"/api/menus/{self.coke.id}/", HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_deleting_the_newest_menu_is_not_hidden_by_if_modified_since(self):
+        response = self.client.get("/api/menus/")
+        self.assertNotIn("Last-Modified", response)
+        since = http_date(time.time())
+        soup = Menu.objects.create(name="Soup", description="", price=4.00)
+        self.assertEqual(len(self.client.get("/api/menus/").data), 3)
+        soup.delete()
+        for path in ("/api/menus/", "/api/async/menus/"):
+            response = self.client.get(path, HTTP_IF_MODIFIED_SINCE=since)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.json()), 2)
+
+    def test_retrieve_revalidates(self):
+        response = self.client.get(f"/api/menus/{self.pizza.id}/")
+        etag = response["ETag"]
+        # The menu row is read once, for the validators and the body alike.
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                f"/api/menus/{self.pizza.id}/", HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/menus/{self.pizza.id}/?fields=name")
+        self.assertEqual(response.data, {"name": "Pizza"})
+        self.pizza.description = "Thin crust"
+        self.pizza.save()
+        response = self.client.get(
+            f"/api/menus/{self.pizza.id}/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["description"], "Thin crust")
+        response = self.client.get("/api/menus/abc/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_async_views_share_etags(self):
+        etag = self.client.get("/api/menus/discounted/")["ETag"]
+        response = self.client.get(
+            "/api/async/menus/discounted/", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_import_moves_etag(self):
+        staff = User.objects.create_user(
+            username="staff", password="password", is_staff_member=True
+        )
+        etag = self.client.get("/api/menus/")["ETag"]
+        self.client.force_login(staff)
+        self.client.post(
+            "/api/menus/import/",
+            "name,price\nPizza,12.00\n",
+            content_type="text/csv",
+        )
+        response = self.client.get("/api/menus/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class SparseFieldsetTests(APITestCase):
+
+    def setUp(self):
+        menu_cache.reset()
+        self.staff_user = User.objects.create_user(
+            username="staff", password="password", is_staff_member=True
+        )
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.pizza = Menu.objects.create(
+            name="Pizza", description="A long description", price=10.00
+        )
+        self.coke = Menu.objects.create(
+            name="Coke", description="", price=2.00, is_drink=True
+        )
+        create_order_batch(
+            self.customer_user,
+            [{"menu_items": [self.pizza.id, self.coke.id]} for _ in range(3)],
+        )
+        self.client.login(username="staff", password="password")
+
+    def tearDown(self):
+        menu_cache.reset()
+
+    def test_menu_fields_are_trimmed_and_pushed_down(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/menus/?fields=id,name,price")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0]), {"id", "name", "price"})
+        menu_queries = [
+            query["sql"] for query in queries if '"oreapp_menu"' in query["sql"]
+        ]
+        self.assertTrue(menu_queries)
+        for sql in menu_queries:
+            self.assertNotIn('"description"', sql)
+
+    def test_menu_actions_and_retrieve_accept_fields(self):
+        response = self.client.get("/api/menus/drinks/?fields=name")
+        self.assertEqual(response.data, [{"name": "Coke"}])
+        response = self.client.get(f"/api/menus/{self.pizza.id}/?fields=id,price")
+        self.assertEqual(response.data, {"id": self.pizza.id, "price": "10.00"})
+
+    def test_sparse_then_full_requests_are_cached_apart(self):
+        sparse = self.client.get("/api/menus/search/?q=pizza&fields=name")
+        self.assertEqual(sparse.data, [{"name": "Pizza"}])
+        full = self.client.get("/api/menus/search/?q=pizza")
+        self.assertEqual(full.data[0]["price"], "10.00")
+
+        for path in ("/api/menus/drinks/?fields=name", "/api/menus/drinks/"):
+            sync = self.client.get(path).json()
+            async_path = path.replace("/api/", "/api/async/")
+            self.assertEqual(self.client.get(async_path).json(), sync)
+        self.assertEqual(sync[0]["price"], "2.00")
+        response = self.client.get("/api/async/menus/?fields=bogus")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sparse_retrieve_has_its_own_etag(self):
+        url = f"/api/menus/{self.pizza.id}/"
+        full = self.client.get(url)
+        sparse = self.client.get(f"{url}?fields=name")
+        self.assertNotEqual(full["ETag"], sparse["ETag"])
+        response = self.client.get(
+            f"{url}?fields=name", HTTP_IF_NONE_MATCH=full["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"name": "Pizza"})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=sparse["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(
+            f"{url}?fields=name", HTTP_IF_NONE_MATCH=sparse["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_order_fields_skip_the_items_prefetch(self):
+        with self.assertNumQueries(4):
+            full = self.client.get("/api/orders/")
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/orders/?fields=id,created_at")
+        self.assertEqual(
+            response.data["results"],
+            [
+                {"id": order["id"], "created_at": order["created_at"]}
+                for order in full.data["results"]
+            ],
+        )
+
+    def test_expanded_menu_items_stay_whole(self):
+        response = self.client.get(
+            "/api/orders/?fields=id,menu_items&expand=menu_items"
+        )
+        order = response.data["results"][0]
+        self.assertEqual(set(order), {"id", "menu_items"})
+        self.assertEqual(set(order["menu_items"][0]), set(MenuSerializer.Meta.fields))
+
+    def test_pagination_still_works_with_fields(self):
+        self.client.login(username="customer", password="password")
+        response = self.client.get(
+            "/api/orders/customer_orders/?fields=total&page_size=2"
+        )
+        self.assertEqual(len(response.data["results"]), 2)
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response.data["results"], [{"total": "12.00"}])
+
+    def test_users_accept_fields(self):
+        response = self.client.get(
+            f"/api/users/{self.customer_user.id}/?fields=username"
+        )
+        self.assertEqual(response.data, {"username": "customer"})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get("/api/menus/?fields=id,secret")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["fields"], ["Unknown field(s): secret."])
+
+    def test_writes_ignore_fields(self):
+        self.client.login(username="customer", password="password")
+        response = self.client.post(
+            "/api/orders/?fields=id", {"menu_items": [self.pizza.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("menu_items", response.data)
+
+
+class FastJSONTests(APITestCase):
+
+    def setUp(self):
+        menu_cache.reset()
+        self.staff_user = User.objects.create_user(
+            username="staff", password="password", is_staff_member=True
+        )
+        self.pizza = Menu.objects.create(
+            name="Pizza", description="Cheese", price=Decimal("10.50")
+        )
+        self.coke = Menu.objects.create(name="Coke", price=2, is_drink=True)
+        self.client.login(username="staff", password="password")
+
+    def tearDown(self):
+        menu_cache.reset()
+
+    def test_renderer_matches_drf_output(self):
+        data = {
+            "price": Decimal("10.50"),
+            "created_at": "2024-01-01T00:00:00Z",
+            "items": (1, 2),
+            "nested": {1: "one"},
+        }
+        self.assertEqual(
+            json.loads(FastJSONRenderer().render(data)),
+            {
+                "price": "10.50",
+                "created_at": "2024-01-01T00:00:00Z",
+                "items": [1, 2],
+                "nested": {"1": "one"},
+            },
+        )
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def test_menu_list_values_path_matches_serializer(self):
+        expected = json.loads(
+            JSONRenderer().render(
+                MenuSerializer(Menu.objects.order_by("id"), many=True).data
+            )
+        )
+        response = self.client.get("/api/menus/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(json.loads(response.content), key=lambda menu: menu["id"]),
+            expected,
+        )
+        response = self.client.get("/api/menus/drinks/?fields=name,price")
+        self.assertEqual(
+            json.loads(response.content), [{"name": "Coke", "price": "2.00"}]
+        )
+
+    def test_values_columns_rejects_computed_fields(self):
+        self.assertEqual(
+            values_columns(MenuSerializer()),
+            ["id", "name", "description", "price", "is_discounted", "is_drink"],
+        )
+        self.assertIsNone(values_columns(OrderSerializer()))
+
+    def test_responses_are_plain_json(self):
+        response = self.client.get("/api/menus/", HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_parser_accepts_json_and_rejects_malformed_bodies(self):
+        response = self.client.post(
+            "/api/menus/",
+            data=json.dumps({"name": "Soup", "description": "Hot", "price": "4.25"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["price"], "4.25")
+        response = self.client.post(
+            "/api/menus/", data="{not json", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("JSON parse error", response.data["detail"])
+
+
+class KitchenFeedTests(APITestCase):
+
+    def setUp(self):
+        self.staff_user = User.objects.create_user(
+            username="staff", password="password", is_staff_member=True
+        )
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+        self.first, self.second = [
+            result["id"]
+            for result in create_order_batch(
+                self.customer_user, [{"menu_items": [self.pizza.id]}] * 2
+            )
+        ]
+
+    def events(self, chunks):
+        return [
+            dict(line.split(": ", 1) for line in chunk.decode().strip().split("\n"))
+            for chunk in chunks
+        ]
+
+    def test_feed_is_staff_only(self):
+        response = self.client.get("/api/async/orders/feed/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.login(username="customer", password="password")
+        response = self.client.get("/api/async/orders/feed/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_last_event_id_is_rejected(self):
+        self.client.login(username="staff", password="password")
+        response = self.client.get(
+            "/api/async/orders/feed/", headers={"Last-Event-ID": "abc"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_placing_an_order_wakes_the_feed_on_commit(self):
+        self.client.login(username="customer", password="password")
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(
+                "/api/orders/", {"menu_items": [self.pizza.id]}, format="json"
+            )
+        self.assertIn(notifier.notify, callbacks)
+
+    async def test_feed_resumes_after_last_event_id(self):
+        await self.async_client.aforce_login(self.staff_user)
+        response = await self.async_client.get(
+            "/api/async/orders/feed/", headers={"Last-Event-ID": str(self.first)}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        chunks = aiter(response.streaming_content)
+        retry, order = self.events([await anext(chunks), await anext(chunks)])
+        self.assertEqual(retry, {"retry": "3000"})
+        self.assertEqual(order["id"], str(self.second))
+        self.assertEqual(order["event"], "order")
+        data = json.loads(order["data"])
+        self.assertEqual(data["id"], self.second)
+        self.assertEqual(data["items"][0]["menu_item"], self.pizza.id)
+        self.assertEqual(data["menu_items"][0]["name"], "Pizza")
+        await chunks.aclose()
+
+    async def test_feed_pushes_new_orders_when_notified(self):
+        config = {"HEARTBEAT_SECONDS": 60, "RETRY_MS": 1000, "BATCH_SIZE": 1}
+        events = order_events(config=config)
+        self.assertEqual(await anext(events), b"retry: 1000\n\n")
+        waiting = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0.05)
+        self.assertFalse(waiting.done())
+        results = await sync_to_async(create_order_batch)(
+            self.customer_user, [{"menu_items": [self.pizza.id]}] * 2
+        )
+        notifier.notify()
+        chunks = [await asyncio.wait_for(waiting, 5), await anext(events)]
+        self.assertEqual(
+            [event["id"] for event in self.events(chunks)],
+            [str(result["id"]) for result in results],
+        )
+        await events.aclose()
+
+    async def test_idle_feed_sends_heartbeats(self):
+        config = {"HEARTBEAT_SECONDS": 0.01, "RETRY_MS": 1000, "BATCH_SIZE": 10}
+        events = order_events(last_id=self.second, config=config)
+        await anext(events)
+        self.assertEqual(await anext(events), HEARTBEAT)
+        await events.aclose()
+        self.assertFalse(notifier._waiters)
+
+
+class IdempotencyKeyTests(APITestCase):
+
+    def setUp(self):
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.other_user = User.objects.create_user(
+            username="other", password="password"
+        )
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+        self.coke = Menu.objects.create(name="Coke", description="", price=2.00)
+        self.client.login(username="customer", password="password")
+
+    def place(self, menu_items, key="key-1"):
+        return self.client.post(
+            "/api/orders/",
+            {"menu_items": menu_items},
+            format="json",
+            headers={"Idempotency-Key": key},
+        )
+
+    def test_retry_replays_stored_response_without_writing(self):
+        first = self.place([self.pizza.id])
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.place([self.pizza.id])
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertFalse(first.has_header("Idempotent-Replayed"))
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertFalse(
+            any('"oreapp_menu"' in query["sql"] for query in queries),
+            "a replay must not re-run validation",
+        )
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.place([self.pizza.id])
+        response = self.place([self.coke.id])
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        self.place([self.pizza.id])
+        self.client.login(username="other", password="password")
+        response = self.place([self.pizza.id])
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_requests_do_not_consume_the_key(self):
+        response = self.place([9999])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        response = self.place([self.pizza.id])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+
+    def test_expired_keys_can_be_reused_and_purged(self):
+        self.place([self.pizza.id])
+        IdempotencyKey.objects.update(
+            created_at=timezone.now() - datetime.timedelta(days=2)
+        )
+        response = self.place([self.coke.id])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(Order.objects.count(), 2)
+
+        IdempotencyKey.objects.update(
+            created_at=timezone.now() - datetime.timedelta(days=2)
+        )
+        out = StringIO()
+        call_command("purge_idempotency_keys", stdout=out)
+        self.assertIn("Deleted 1 expired key(s).", out.getvalue())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        self.client.post("/api/orders/", {"menu_items": [self.pizza.id]}, format="json")
+        self.client.post("/api/orders/", {"menu_items": [self.pizza.id]}, format="json")
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_overlong_key_is_rejected(self):
+        response = self.place([self.pizza.id], key="k" * 256)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Idempotency-Key", response.data)
+
+
+@override_settings(
+    ORE_DATABASE_REPLICAS={
+        "ALIASES": ["replica_1"],
+        "PIN_SECONDS": 5,
+        "COOKIE_NAME": "ore_primary_until",
+    }
+)
+class ReplicaRoutingTests(APITransactionTestCase):
+    # Reads inside a transaction go to the primary, so these tests must not
+    # run inside TestCase's.
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.routed = []
+
+    def read_view(self, request):
+        self.routed.append(router.db_for_read(Menu))
+        return HttpResponse()
+
+    def write_view(self, request):
+        Menu.objects.create(name="Soup", description="", price=4)
+        return self.read_view(request)
+
+    def handle(self, view, method="get", cookie=None):
+        request = getattr(self.factory, method)("/")
+        if cookie is not None:
+            request.COOKIES["ore_primary_until"] = cookie
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_safe_requests_read_from_replicas(self):
+        response = self.handle(self.read_view)
+        self.assertEqual(self.routed, ["replica_1"])
+        self.assertNotIn("ore_primary_until", response.cookies)
+
+    def test_unsafe_requests_and_other_code_use_the_primary(self):
+        self.handle(self.read_view, method="post")
+        self.assertEqual(self.routed, ["default"])
+        self.assertEqual(router.db_for_read(Menu), "default")
+
+    def test_reads_in_a_transaction_use_the_primary(self):
+        def view(request):
+            with transaction.atomic():
+                return self.read_view(request)
+
+        self.handle(view)
+        self.assertEqual(self.routed, ["default"])
+
+    def test_writing_pins_the_request_and_the_client(self):
+        response = self.handle(self.write_view)
+        self.assertEqual(self.routed, ["default"])
+        cookie = response.cookies["ore_primary_until"]
+        self.assertEqual(cookie["max-age"], 5)
+        self.handle(self.read_view, cookie=cookie.value)
+        self.assertEqual(self.routed[-1], "default")
+
+    def test_expired_or_garbled_pins_are_ignored(self):
+        self.handle(self.read_view, cookie=str(int(time.time()) - 1))
+        self.handle(self.read_view, cookie="garbled")
+        self.assertEqual(self.routed, ["replica_1", "replica_1"])
+
+    def test_cache_fills_read_from_the_primary(self):
+        def view(request):
+            menu_cache.get_or_set(("routing",), lambda: self.read_view(request))
+            return self.read_view(request)
+
+        menu_cache.reset()
+        self.addCleanup(menu_cache.reset)
+        self.handle(view)
+        self.assertEqual(self.routed, ["default", "replica_1"])
+
+    def test_reading_a_missing_counter_does_not_write(self):
+        def view(request):
+            self.assertEqual(counters.read(counters.TOTAL_ORDERS), 0)
+            return HttpResponse()
+
+        # A pinned client reads from the primary; a write would renew its pin.
+        response = self.handle(view, cookie=str(int(time.time()) + 60))
+        self.assertNotIn("ore_primary_until", response.cookies)
+        self.assertFalse(Counter.objects.exists())
+
+    async def test_async_requests_are_routed(self):
+        async def view(request):
+            return await sync_to_async(self.read_view)(request)
+
+        response = await ReplicaRoutingMiddleware(view)(self.factory.get("/"))
+        self.assertEqual(self.routed, ["replica_1"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(ORE_DATABASE_REPLICAS={"ALIASES": ["default"]})
+    def test_placing_an_order_pins_the_client(self):
+        customer = User.objects.create_user(username="customer", password="password")
+        pizza = Menu.objects.create(name="Pizza", description="", price=10)
+        self.client.force_login(customer)
+        response = self.client.post(
+            "/api/orders/", {"menu_items": [pizza.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("ore_primary_until", response.cookies)
+
+
+class OpenAPISchemaTests(APITestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings = override_settings(ORE_OPENAPI_SCHEMA={"DIRECTORY": self.directory})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        schema.reset()
+        self.addCleanup(schema.reset)
+
+    def test_schema_is_served_with_an_etag(self):
+        response = self.client.get("/openapi.json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("/menus/", json.loads(response.content)["paths"])
+        self.assertIn("no-cache", response["Cache-Control"])
+        response = self.client.get(
+            "/openapi.json", headers={"If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get("/openapi.yaml")
+        self.assertEqual(response["Content-Type"], "application/yaml")
+        self.assertIn(b"/menus/:", response.content)
+
+    def test_schema_is_generated_once_and_reused_from_disk(self):
+        generated = []
+        original = schema.generate
+
+        def generate():
+            generated.append(True)
+            return original()
+
+        schema.generate = generate
+        self.addCleanup(setattr, schema, "generate", original)
+        self.client.get("/openapi.json")
+        self.client.get("/openapi.json")
+        self.assertEqual(len(generated), 1)
+        self.assertTrue((self.directory / "openapi.yaml").exists())
+
+        # A new process reads the stored documents...
+        schema.reset()
+        self.client.get("/openapi.json")
+        self.assertEqual(len(generated), 1)
+
+        # ...unless the API has changed since they were generated.
+        (self.directory / "fingerprint.txt").write_text("outdated\n")
+        schema.reset()
+        self.client.get("/openapi.json")
+        self.assertEqual(len(generated), 2)
+
+    def test_write_replaces_each_file_whole(self):
+        schema.write(self.directory, {"json": b"{}", "yaml": b"{}\n"}, "one")
+        schema.write(self.directory, {"json": b"[]", "yaml": b"[]\n"}, "two")
+        self.assertEqual(
+            sorted(path.name for path in self.directory.iterdir()),
+            ["fingerprint.txt", "openapi.json", "openapi.yaml"],
+        )
+        self.assertEqual(
+            schema.read(self.directory, "two"), {"json": b"[]", "yaml": b"[]\n"}
+        )
+
+    def test_fingerprint_covers_api_settings(self):
+        fingerprint = schema.api_fingerprint()
+        with override_settings(SWAGGER_SETTINGS={"DEFAULT_INFO": None}):
+            self.assertNotEqual(schema.api_fingerprint(), fingerprint)
+        with override_settings(REST_FRAMEWORK={}):
+            self.assertNotEqual(schema.api_fingerprint(), fingerprint)
+        self.assertEqual(schema.api_fingerprint(), fingerprint)
+
+    def test_command_generates_and_checks_the_schema(self):
+        with self.assertRaises(CommandError):
+            call_command("openapi_schema", "--check", stdout=StringIO())
+        out = StringIO()
+        call_command("openapi_schema", stdout=out)
+        self.assertIn("Wrote the OpenAPI schema", out.getvalue())
+        out = StringIO()
+        call_command("openapi_schema", "--check", stdout=out)
+        self.assertIn("is current", out.getvalue())
+
+    def test_ui_loads_the_precomputed_schema(self):
+        response = self.client.get("/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b"/openapi.json", response.content)
+
+
+class StartupProfileTests(APITestCase):
+
+    def test_parse_importtime_groups_by_package(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     django.contrib.admin.sites\n"
+            "import time:        80 |        200 |   django.contrib.admin\n"
+            "import time:        50 |         50 | yaml\n"
+        )
+        self.assertEqual(
+            parse_importtime(stderr),
+            {"django.contrib.admin.sites": 120, "django.contrib.admin": 80, "yaml": 50},
+        )
+        self.assertEqual(
+            package_of("django.contrib.admin.sites"), "django.contrib.admin"
+        )
+        self.assertEqual(package_of("django.db.models.base"), "django.db")
+        self.assertEqual(package_of("yaml.reader"), "yaml")
+
+    def test_profile_startup_serves_a_first_request(self):
+        # The probe runs outside the test database, so request a route that
+        # needs none.
+        out = StringIO()
+        call_command(
+            "profile_startup",
+            "oreconfig.settings_api",
+            "--runs",
+            "1",
+            "--path",
+            "/api/unknown/",
+            stdout=out,
+        )
+        self.assertIn("first request", out.getvalue())
+        self.assertIn("(404 Not Found)", out.getvalue())
+        self.assertIn("import time by package", out.getvalue())
+
+    @override_settings(ROOT_URLCONF="oreconfig.urls_api")
+    def test_api_urlconf_serves_only_the_api(self):
+        Menu.objects.create(name="Pizza", description="", price=10)
+        self.assertEqual(self.client.get("/api/menus/").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get("/").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.get("/admin/").status_code, status.HTTP_404_NOT_FOUND
+        )
+
+
+class OrderArchiveTests(APITestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings = override_settings(
+            ORE_ORDER_ARCHIVE={
+                "AGE_DAYS": 30,
+                "DIRECTORY": self.directory,
+                "BATCH_SIZE": 4,
+                "BOUNDARY_CACHE": "shared",
+            }
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        archive.forget()
+        self.addCleanup(archive.forget)
+
+        self.staff_user = User.objects.create_user(
+            username="staff",
+            password="password",
+            is_staff=True,
+            is_staff_member=True,
+        )
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.other_user = User.objects.create_user(
+            username="other", password="password"
+        )
+        self.menus = [
+            Menu.objects.create(name=f"Dish {i}", description="", price=5.25 + i)
+            for i in range(3)
+        ]
+        now = timezone.now()
+        for customer in (self.customer_user, self.other_user):
+            create_order_batch(
+                customer,
+                [
+                    {"menu_items": [menu.id for menu in self.menus[: 1 + i % 3]]}
+                    for i in range(5)
+                ],
+            )
+        # Three orders per customer are old enough to archive.
+        for age, order in enumerate(Order.objects.order_by("customer", "id")):
+            days = [100, 90, 80, 10, 0][age % 5]
+            Order.objects.filter(pk=order.pk).update(
+                created_at=now - datetime.timedelta(days=days, minutes=age)
+            )
+        counters.reconcile()
+        self.client.login(username="customer", password="password")
+
+    def history(self, url="/api/orders/customer_orders/?page_size=2"):
+        results = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            payload = response.json()
+            results.extend(payload["results"])
+            url = payload["next"]
+        return results
+
+    def test_old_orders_are_moved_to_compressed_files(self):
+        call_command("archive_orders", stdout=StringIO())
+
+        self.assertEqual(Order.objects.count(), 4)
+        self.assertFalse(
+            Order.objects.filter(
+                created_at__lt=timezone.now() - datetime.timedelta(days=30)
+            ).exists()
+        )
+        self.assertFalse(OrderItem.objects.filter(order__isnull=True).exists())
+        archives = list(OrderArchive.objects.order_by("first_created_at"))
+        self.assertEqual([stored.order_count for stored in archives], [4, 2])
+        for stored in archives:
+            content = (self.directory / stored.path).read_bytes()
+            self.assertEqual(hashlib.sha256(content).hexdigest(), stored.sha256)
+            documents = [
+                json.loads(line) for line in gzip.decompress(content).splitlines()
+            ]
+            self.assertEqual(len(documents), stored.order_count)
+            self.assertEqual(
+                set(stored.segments.values_list("customer", flat=True)),
+                {document["customer"] for document in documents},
+            )
+
+    def test_customer_history_reads_through_to_the_archive(self):
+        before = self.history()
+        expanded = self.history(
+            "/api/orders/customer_orders/?page_size=4&expand=menu_items"
+        )
+        archive.archive_orders()
+        self.assertEqual(Order.objects.filter(customer=self.customer_user).count(), 2)
+
+        self.assertEqual(len(before), 5)
+        self.assertEqual(self.history(), before)
+        self.assertEqual(
+            self.history("/api/orders/customer_orders/?page_size=4&expand=menu_items"),
+            expanded,
+        )
+        self.assertEqual(
+            self.history("/api/async/orders/customer_orders/?page_size=3"),
+            self.history("/api/orders/customer_orders/?page_size=3"),
+        )
+
+    def test_archiving_invalidates_the_shared_boundary(self):
+        self.assertEqual(len(self.history()), 5)
+        self.assertEqual(caches["shared"].get(archive.BOUNDARY_KEY), (None,))
+        # What manage.py archive_orders does in its own process.
+        with self.captureOnCommitCallbacks(execute=True):
+            archive.archive_orders()
+        self.assertIsNone(caches["shared"].get(archive.BOUNDARY_KEY))
+        self.assertEqual(len(self.history()), 5)
+
+    def test_export_includes_archived_orders(self):
+        self.client.login(username="staff", password="password")
+
+        def export(query):
+            response = self.client.get(f"/api/orders/export/{query}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return b"".join(response.streaming_content).decode()
+
+        start = timezone.localdate() - datetime.timedelta(days=95)
+        end = timezone.localdate() - datetime.timedelta(days=85)
+        queries = ["", "?output=ndjson", f"?output=ndjson&start={start}&end={end}"]
+        before = [export(query) for query in queries]
+        archive.archive_orders()
+        self.assertEqual(Order.objects.count(), 4)
+        self.assertEqual([export(query) for query in queries], before)
+        self.assertEqual(len(before[1].splitlines()), 10)
+        self.assertEqual(len(before[2].splitlines()), 2)
+
+    def test_staff_see_every_archived_order(self):
+        archive.archive_orders()
+        self.client.login(username="staff", password="password")
+        results = self.history("/api/orders/customer_orders/?page_size=3")
+        self.assertEqual(len(results), 10)
+        keys = [(order["created_at"], order["id"]) for order in results]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        self.assertEqual(
+            {order["customer"] for order in results},
+            {self.customer_user.pk, self.other_user.pk},
+        )
+
+    def test_archiving_keeps_counters_and_rollups(self):
+        rebuild_rollups()
+        total = counters.read(counters.TOTAL_ORDERS)
+        hourly = list(
+            HourlySales.objects.order_by("hour").values_list(
+                "hour", "order_count", "revenue"
+            )
+        )
+        daily = list(
+            MenuItemDailySales.objects.order_by("date", "menu").values_list(
+                "date", "menu", "quantity", "revenue"
+            )
+        )
+
+        archive.archive_orders()
+        self.assertEqual(counters.read(counters.TOTAL_ORDERS), total)
+        self.assertEqual(counters.reconcile(), [])
+
+        rebuild_rollups()
+        self.assertEqual(
+            list(
+                HourlySales.objects.order_by("hour").values_list(
+                    "hour", "order_count", "revenue"
+                )
+            ),
+            hourly,
+        )
+        self.assertEqual(
+            list(
+                MenuItemDailySales.objects.order_by("date", "menu").values_list(
+                    "date", "menu", "quantity", "revenue"
+                )
+            ),
+            daily,
+        )
+
+    def test_failed_batch_leaves_no_file_behind(self):
+        with mock.patch.object(
+            ArchivedOrderSegment.objects, "bulk_create", side_effect=IntegrityError
+        ):
+            with self.assertRaises(IntegrityError):
+                archive.archive_orders()
+        self.assertEqual(Order.objects.count(), 10)
+        self.assertFalse(OrderArchive.objects.exists())
+        self.assertEqual(list(self.directory.rglob("*.gz*")), [])
+
+
+class JobQueueTests(APITestCase):
+
+    def setUp(self):
+        self.customer_user = User.objects.create_user(
+            username="customer", password="password"
+        )
+        self.pizza = Menu.objects.create(name="Pizza", description="", price=10.00)
+        self.client.login(username="customer", password="password")
+
+    def test_placing_an_order_queues_the_rollup_update(self):
+        response = self.client.post(
+            "/api/orders/", {"menu_items": [self.pizza.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(HourlySales.objects.exists())
+        job = Job.objects.get()
+        self.assertEqual(job.name, "oreapp.rollups.apply_sales_deltas")
+        self.assertEqual(job.payload["hourly"][0][1:], [1, "10.00"])
+
+        totals = jobs.run_pending()
+        self.assertEqual(totals["succeeded"], 1)
+        self.assertEqual(HourlySales.objects.get().revenue, Decimal("10.00"))
+        self.assertFalse(Job.objects.exists())
+
+    def test_claims_are_batched_and_exclusive(self):
+        for i in range(5):
+            jobs.enqueue(set_counter, name=f"job-{i}", value=i)
+        first = jobs.claim(batch_size=2, lease_seconds=60)
+        second = jobs.claim(batch_size=10, lease_seconds=60)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 3)
+        self.assertFalse({job.pk for job in first} & {job.pk for job in second})
+        self.assertEqual(jobs.claim(batch_size=10, lease_seconds=60), [])
+
+        # A job whose lease has run out is claimed again.
+        Job.objects.filter(pk=first[0].pk).update(
+            lease_expires=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        [reclaimed] = jobs.claim(batch_size=10, lease_seconds=60)
+        self.assertEqual(reclaimed.pk, first[0].pk)
+        self.assertEqual(reclaimed.attempts, 2)
+
+        # The first claim no longer holds it, so its run is discarded.
+        with self.assertLogs("oreapp.jobs", "WARNING"):
+            self.assertEqual(jobs.run_batch(first[:1]), {"expired": 1})
+        self.assertFalse(Counter.objects.filter(name="job-0").exists())
+        self.assertEqual(jobs.run_batch(second), {"succeeded": 3})
+        self.assertEqual(Counter.objects.get(name="job-4").value, 4)
+
+    def test_failed_jobs_are_retried_with_backoff_then_kept(self):
+        job = jobs.enqueue(set_counter_and_fail, max_attempts=2, name="x", value=1)
+        started = timezone.now()
+        with self.assertLogs("oreapp.jobs", "ERROR"):
+            self.assertEqual(jobs.run_pending()["retried"], 1)
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreaterEqual(job.run_after, started + datetime.timedelta(seconds=1))
+        self.assertIn("could not finish x", job.last_error)
+        # The job's writes were rolled back with it.
+        self.assertFalse(Counter.objects.filter(name="x").exists())
+
+        # Not due yet.
+        self.assertEqual(jobs.run_pending()["claimed"], 0)
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs("oreapp.jobs", "ERROR"):
+            self.assertEqual(jobs.run_pending()["failed"], 1)
+        job.refresh_from_db()
+        self.assertEqual(job.state, Job.FAILED)
+        self.assertEqual(jobs.queue_stats()["failed"], 1)
+
+    def test_job_stats_reports_queue_depth_and_lag(self):
+        jobs.enqueue(
+            set_counter,
+            run_after=timezone.now() - datetime.timedelta(seconds=30),
+            name="late",
+            value=1,
+        )
+        jobs.enqueue(
+            set_counter,
+            run_after=timezone.now() + datetime.timedelta(hours=1),
+            name="later",
+            value=1,
+        )
+        stats = jobs.queue_stats()
+        self.assertEqual((stats["queued"], stats["due"]), (2, 1))
+        self.assertGreaterEqual(stats["lag_seconds"], 30)
+
+        out = StringIO()
+        call_command("run_jobs", "--once", stdout=out)
+        self.assertIn("Ran 1 job(s): 1 succeeded", out.getvalue())
+        out = StringIO()
+        call_command("job_stats", stdout=out)
+        self.assertRegex(out.getvalue(), r"queued\s+1\n")
+
+
 # class RegistrationTests(APITestCase):
 
 #     def test_register_customer(self):
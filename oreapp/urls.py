@@ -1,18 +1,22 @@
-from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     UserViewSet,
     MenuViewSet,
     OrderViewSet,
+    SalesViewSet,
     RegisterCustomerAPIView,
     RegisterStaffAPIView,
+    ObtainTokenAPIView,
+    RevokeTokensAPIView,
 )
 
 router = DefaultRouter()
 router.register(r"users", UserViewSet)
 router.register(r"menus", MenuViewSet)
 router.register(r"orders", OrderViewSet)
+router.register(r"sales", SalesViewSet, basename="sales")
 
 urlpatterns = [
     path("", include(router.urls)),
@@ -22,4 +26,21 @@ urlpatterns = [
         name="register_customer",
     ),
     path("register/staff/", RegisterStaffAPIView.as_view(), name="register_staff"),
+    path("token/", ObtainTokenAPIView.as_view(), name="token_obtain"),
+    path("token/revoke/", RevokeTokensAPIView.as_view(), name="token_revoke"),
+    # Native async read paths for ASGI deployments; see async_views.py.
+    path("async/menus/", async_views.menu_list, name="async_menu_list"),
+    path(
+        "async/menus/discounted/",
+        async_views.menu_discounted,
+        name="async_menu_discounted",
+    ),
+    path("async/menus/drinks/", async_views.menu_drinks, name="async_menu_drinks"),
+    path("async/users/profile/", async_views.user_profile, name="async_user_profile"),
+    path(
+        "async/orders/customer_orders/",
+        async_views.customer_orders,
+        name="async_customer_orders",
+    ),
+    path("async/orders/feed/", async_views.order_feed, name="async_order_feed"),
 ]
@@ -1,15 +1,48 @@
-from rest_framework import viewsets, permissions, status
+import codecs
+import copy
+import csv
+import datetime
+from functools import partial
+
+from rest_framework import viewsets, permissions, serializers, status
 from rest_framework.response import Response
 from rest_framework.decorators import action, api_view, permission_classes
 from django.contrib.auth import get_user_model
-from .models import Menu, Order
-from drf_yasg.utils import swagger_auto_schema
+from django.core.exceptions import FieldDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
+from .authentication import issue_token, revoke_tokens, token_settings
+from .cache import menu_cache
+from .conditional import add_validators, collection_state, make_etag, not_modified
+from .docs import header_parameter, swagger_auto_schema
+from .models import HourlySales, Menu, MenuItemDailySales, Order
+from . import archive, counters, schema
+from .exports import aiter_chunks, orders_as_csv, orders_as_ndjson
+from .idempotency import HEADER as IDEMPOTENCY_HEADER, idempotent_response
+from .menu_import import MenuImportError, import_menus, read_rows
+from .orders import MAX_BULK_ORDERS, create_order_batch, order_changed, orders_placed
+from .pagination import OrderCursorPagination
+from .renderers import FastJSONRenderer
+from .search import autocomplete_menus, search_menus
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from .serializers import (
     UserSerializer,
+    MenuImportQuerySerializer,
+    MenuSearchQuerySerializer,
     MenuSerializer,
     OrderSerializer,
+    OrderExportQuerySerializer,
     RegisterSerializer,
+    SalesQuerySerializer,
+    TokenObtainSerializer,
+    requested_fields,
 )
 
 User = get_user_model()
@@ -24,7 +57,110 @@ class IsStaffMember(permissions.BasePermission):
         return request.user and request.user.is_staff_member
 
 
-class MenuViewSet(viewsets.ModelViewSet):
+class SparseFieldsetMixin:
+    """
+    Support ?fields=a,b on reads: the serializer renders only those fields
+    and the queryset loads only the columns behind them.
+    """
+
+    fields_query_param = "fields"
+    # Columns the view needs whatever the client asks for, e.g. for ordering.
+    required_columns = []
+
+    def get_sparse_fields(self):
+        """
+        Return the validated ?fields= names, or None to render every field.
+        """
+        if hasattr(self, "_sparse_fields"):
+            return self._sparse_fields
+        self._sparse_fields = None
+        if self.request is None or self.request.method not in permissions.SAFE_METHODS:
+            return None
+        raw = self.request.query_params.get(self.fields_query_param)
+        if raw:
+            available = self.get_serializer_class()(
+                context=super().get_serializer_context()
+            ).fields
+            requested = requested_fields(raw, available, self.fields_query_param)
+            self._sparse_fields = {name: available[name] for name in requested}
+        return self._sparse_fields
+
+    def sparse_cache_key(self):
+        """
+        The requested field set, for cache keys of serialized payloads.
+        """
+        fields = self.get_sparse_fields()
+        return None if fields is None else sorted(fields)
+
+    def wants_field(self, name):
+        fields = self.get_sparse_fields()
+        return fields is None or name in fields
+
+    def restrict_columns(self, queryset):
+        """
+        Apply .only() for the requested fields, if each maps onto the model.
+        """
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        columns = {queryset.model._meta.pk.name, *self.required_columns}
+        for field in fields.values():
+            try:
+                model_field = queryset.model._meta.get_field(field.source.split(".")[0])
+            except FieldDoesNotExist:
+                # Rendered from a property or method; its columns are unknown.
+                return queryset
+            if model_field.concrete and not model_field.many_to_many:
+                columns.add(model_field.name)
+        return queryset.only(*columns)
+
+    def get_queryset(self):
+        return self.restrict_columns(super().get_queryset())
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            context["fields"] = list(fields)
+        return context
+
+
+# Serializer fields whose output is the column value itself, once the
+# renderer turns Decimals into strings.
+VALUES_FIELD_TYPES = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.DecimalField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def values_columns(serializer):
+    """
+    Return the columns whose .values() rows render the same as ``serializer``,
+    or None if any of its fields needs the serializer to produce it.
+    """
+    columns = []
+    for name, field in serializer.fields.items():
+        if not isinstance(field, VALUES_FIELD_TYPES) or field.source != name:
+            return None
+        if isinstance(field, serializers.DecimalField) and (
+            not getattr(
+                field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING
+            )
+            or field.localize
+        ):
+            return None
+        columns.append(name)
+    return columns
+
+
+def start_of_day(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+class MenuViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing the Menu. Allows staff to create, update, and delete menus.
     Customers can view the list of menus and retrieve individual menu items.
@@ -33,39 +169,167 @@ class MenuViewSet(viewsets.ModelViewSet):
     queryset = Menu.objects.all()
     serializer_class = MenuSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # retrieve() builds its validators from updated_at.
+    required_columns = ["updated_at"]
 
     def get_permissions(self):
         """
         Override get_permissions to set custom permissions for different actions.
         """
-        if self.action in ["create", "update", "partial_update", "destroy"]:
-            # Only staff members can create, update, or delete menu items
+        if self.action in [
+            "create",
+            "update",
+            "partial_update",
+            "destroy",
+            "bulk_import",
+        ]:
+            # Only staff members can create, update, delete or import menu items
             self.permission_classes = [permissions.IsAuthenticated, IsStaffMember]
-        elif self.action in ["list", "retrieve", "discounted", "drinks"]:
-            # Customers  can view the list of menus, retrieve specific items, view discounted and drink menus
+        elif self.action in [
+            "list",
+            "retrieve",
+            "discounted",
+            "drinks",
+            "search",
+            "autocomplete",
+        ]:
+            # Customers  can view the list of menus, retrieve specific items, view discounted and drink menus, and search
             self.permission_classes = [permissions.AllowAny]
         return super().get_permissions()
 
+    def cached_response(self, request, queryset):
+        """
+        Serve serialized menus from the versioned menu cache, or a 304 when the
+        client's ETag shows its copy is still current.
+        """
+        params = sorted(request.query_params.lists())
+        # The fast renderer encodes Decimals like the serializer does, so it
+        # can be fed .values() rows directly; other renderers get their own
+        # serializer-built cache entries.
+        fast = isinstance(request.accepted_renderer, FastJSONRenderer)
+
+        def serialize():
+            columns = values_columns(self.get_serializer()) if fast else None
+            if columns is not None:
+                data = list(queryset.values(*columns))
+            else:
+                data = list(self.get_serializer(queryset, many=True).data)
+            return {"state": collection_state(queryset), "data": data}
+
+        # The validators are cached with the payload they describe, so
+        # revalidating a cached list costs no query.
+        key = (self.action, params, self.sparse_cache_key())
+        if fast:
+            key += ("values",)
+        entry = menu_cache.get_or_set(key, serialize)
+        count, last_modified = entry["state"]
+        etag = make_etag(
+            self.action, params, request.accepted_media_type, count, last_modified
+        )
+        # No Last-Modified: see conditional.py.
+        response = not_modified(request, etag, None) or Response(entry["data"])
+        return add_validators(response, etag, None)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, self.filter_queryset(self.get_queryset()))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        last_modified = instance.updated_at
+        # ?fields= changes the body, so it is part of the ETag, as in the
+        # list cache keys.
+        params = sorted(request.query_params.lists())
+        etag = make_etag(
+            "retrieve",
+            kwargs["pk"],
+            params,
+            request.accepted_media_type,
+            last_modified,
+        )
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = Response(self.get_serializer(instance).data)
+        return add_validators(response, etag, last_modified)
+
     @action(detail=False, methods=["get"])
     def discounted(self, request):
         """
         Custom action for customers  to retrieve menus that are on discount.
         """
-        discounted_menus = Menu.objects.filter(is_discounted=True)
-        serializer = self.get_serializer(discounted_menus, many=True)
-        return Response(serializer.data)
+        discounted_menus = self.get_queryset().filter(is_discounted=True)
+        return self.cached_response(request, discounted_menus)
 
     @action(detail=False, methods=["get"])
     def drinks(self, request):
         """
         Custom action for customers  to retrieve menus that are drinks.
         """
-        drink_menus = Menu.objects.filter(is_drink=True)
-        serializer = self.get_serializer(drink_menus, many=True)
-        return Response(serializer.data)
+        drink_menus = self.get_queryset().filter(is_drink=True)
+        return self.cached_response(request, drink_menus)
 
+    @swagger_auto_schema(query_serializer=MenuImportQuerySerializer)
+    @action(detail=False, methods=["post"], url_path="import")
+    def bulk_import(self, request):
+        """
+        Custom action for staff to upsert menus by name from a CSV (default) or
+        ?input=json request body, streamed rather than loaded into memory.
+        """
+        query = MenuImportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        if request.stream is None:
+            return Response(
+                {"detail": "Expected a request body."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        stream = codecs.getreader("utf-8")(request.stream)
+        try:
+            counts = import_menus(read_rows(stream, query.validated_data["input"]))
+        except MenuImportError as exc:
+            return Response(
+                {"invalid_rows": exc.invalid, "errors": exc.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except (ValueError, csv.Error) as exc:
+            return Response(
+                {"detail": f"Could not parse the input: {exc}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(counts)
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+    @swagger_auto_schema(query_serializer=MenuSearchQuerySerializer)
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        Custom action for customers to search menus by name and description, best matches first.
+        """
+        query = MenuSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        q, limit = query.validated_data["q"], query.validated_data["limit"]
+
+        def serialize():
+            menus = search_menus(q, limit)
+            return list(self.get_serializer(menus, many=True).data)
+
+        key = ("search", q, limit, self.sparse_cache_key())
+        return Response(menu_cache.get_or_set(key, serialize))
+
+    @swagger_auto_schema(query_serializer=MenuSearchQuerySerializer)
+    @action(detail=False, methods=["get"], url_path="search/autocomplete")
+    def autocomplete(self, request):
+        """
+        Custom action returning the ids and names of menus matching a partly typed ?q=.
+        """
+        query = MenuSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        q, limit = query.validated_data["q"], query.validated_data["limit"]
+        return Response(
+            menu_cache.get_or_set(
+                ("autocomplete", q, limit), lambda: autocomplete_menus(q, limit)
+            )
+        )
+
+
+class UserViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for managing Users. Allows staff to view the list of registered users and retrieve individual users.
     Authenticated users can view their own profile.
@@ -97,7 +361,11 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         """
         Custom action to retrieve the profile information of the authenticated user.
         """
-        serializer = self.get_serializer(request.user)
+        user = request.user
+        if user.get_deferred_fields():
+            # Token users carry only their claims; load the rest in one query.
+            user = User.objects.get(pk=user.pk)
+        serializer = self.get_serializer(user)
         return Response(serializer.data)
 
     @action(
@@ -110,11 +378,11 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         Custom action to retrieve the number of registered customers.
         Only staff members can access this.
         """
-        customers_count = User.objects.filter(is_staff_member=False).count()
+        customers_count = counters.read(counters.REGISTERED_CUSTOMERS)
         return Response({"registered_customers": customers_count})
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing Orders. Customers can place orders and staff can view all orders.
     """
@@ -122,6 +390,38 @@ class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderCursorPagination
+    expandable_fields = ["menu_items"]
+    # The cursor pagination orders and keys pages on created_at.
+    required_columns = ["created_at"]
+
+    def get_queryset(self):
+        """
+        Load every order's items in one extra query instead of one per order,
+        unless ?fields= leaves out everything that needs them.
+        """
+        queryset = super().get_queryset()
+        if self.wants_field("menu_items") or self.wants_field("items"):
+            queryset = queryset.prefetch_related("items")
+        if "menu_items" in self.get_expand() and self.wants_field("menu_items"):
+            queryset = queryset.prefetch_related("menu_items")
+        return queryset
+
+    def get_expand(self):
+        """
+        Return the ?expand= fields requested by the client that may be expanded.
+        """
+        expand = self.request.query_params.get("expand", "") if self.request else ""
+        requested = [field.strip() for field in expand.split(",")]
+        return [field for field in requested if field in self.expandable_fields]
+
+    def get_serializer_context(self):
+        """
+        Pass the requested ?expand= fields through to the serializer.
+        """
+        context = super().get_serializer_context()
+        context["expand"] = self.get_expand()
+        return context
 
     def get_permissions(self):
         """
@@ -135,25 +435,207 @@ class OrderViewSet(viewsets.ModelViewSet):
             self.permission_classes = [permissions.IsAuthenticated]
         return super().get_permissions()
 
+    @swagger_auto_schema(
+        manual_parameters=[
+            header_parameter(
+                IDEMPOTENCY_HEADER,
+                "Unique key that makes retries of this request safe.",
+            )
+        ]
+    )
+    def create(self, request, *args, **kwargs):
+        """
+        Override create to replay the stored response for a repeated Idempotency-Key.
+        """
+        return idempotent_response(
+            request, partial(super().create, request, *args, **kwargs)
+        )
+
     def perform_create(self, serializer):
         """
         Override perform_create to associate the order with the authenticated customer.
         """
-        serializer.save(customer=self.request.user)
+        with transaction.atomic():
+            order = serializer.save(customer=self.request.user)
+            orders_placed([order], order.items.all())
+
+    def perform_update(self, serializer):
+        """
+        Override perform_update to move the order's sales in the rollups when
+        its menu items change.
+        """
+        if "items" not in serializer.validated_data:
+            serializer.save()
+            return
+        order = serializer.instance
+        before, before_lines = copy.copy(order), list(order.items.all())
+        with transaction.atomic():
+            order_changed(before, before_lines, serializer.save())
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        Custom action for POS terminals to submit a batch of queued orders at once.
+        Valid orders are created in one transaction; invalid ones are reported per item.
+        """
+        if not isinstance(request.data, list) or not request.data:
+            return Response(
+                {"detail": "Expected a non-empty list of orders."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(request.data) > MAX_BULK_ORDERS:
+            return Response(
+                {"detail": f"A batch may contain at most {MAX_BULK_ORDERS} orders."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        results = create_order_batch(request.user, request.data)
+        created = sum(1 for result in results if result["status"] == "created")
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({"results": results}, status=response_status)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[permissions.IsAuthenticated, IsStaffMember],
+    )
+    def stats(self, request):
+        """
+        Custom action for staff to retrieve the total number of orders and today's orders.
+        """
+        return Response(
+            {
+                "total_orders": counters.read(counters.TOTAL_ORDERS),
+                "orders_today": counters.read(counters.orders_on(timezone.localdate())),
+            }
+        )
+
+    @swagger_auto_schema(query_serializer=OrderExportQuerySerializer)
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[permissions.IsAuthenticated, IsStaffMember],
+    )
+    def export(self, request):
+        """
+        Custom action for staff to download the order history with line items,
+        archived orders first. Streams ?output=csv (default) or ndjson,
+        optionally limited to ?start=&end= dates.
+        """
+        query = OrderExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        queryset = Order.objects.all()
+        start = end = None
+        if "start" in query.validated_data:
+            start = start_of_day(query.validated_data["start"])
+            queryset = queryset.filter(created_at__gte=start)
+        if "end" in query.validated_data:
+            end = start_of_day(query.validated_data["end"] + datetime.timedelta(days=1))
+            queryset = queryset.filter(created_at__lt=end)
+        archived = archive.iter_archived_orders(start, end)
+
+        if query.validated_data["output"] == "ndjson":
+            lines = orders_as_ndjson(queryset, archived)
+            content_type, filename = "application/x-ndjson", "orders.ndjson"
+        else:
+            lines = orders_as_csv(queryset, archived)
+            content_type, filename = "text/csv", "orders.csv"
+        if isinstance(request._request, ASGIRequest):
+            lines = aiter_chunks(lines)
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
 
     @action(detail=False, methods=["get"])
     def customer_orders(self, request):
         """
-        Custom action to get orders for the authenticated customer.
+        Custom action to get orders for the authenticated customer, including
+        those moved to the order archive.
         """
         if not request.user.is_staff:
             # If not a staff member, only allow access to their own orders
-            queryset = Order.objects.filter(customer=request.user)
+            customer = request.user
+            queryset = self.get_queryset().filter(customer=customer)
         else:
             # Staff can see all orders
-            queryset = self.queryset
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+            customer = None
+            queryset = self.get_queryset()
+        rows = list(self.paginator.get_page_queryset(queryset, request))
+        rows = archive.with_archived(
+            rows,
+            self.paginator,
+            customer,
+            menus="menu_items" in self.get_expand() and self.wants_field("menu_items"),
+        )
+        page = self.paginator.set_page(rows)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class SalesViewSet(viewsets.ViewSet):
+    """
+    ViewSet for sales analytics. Staff can read revenue per day, orders per hour
+    and the best-selling menu items over a date range, served from the rollup tables.
+    """
+
+    permission_classes = [permissions.IsAuthenticated, IsStaffMember]
+
+    @swagger_auto_schema(query_serializer=SalesQuerySerializer)
+    def list(self, request):
+        """
+        Sales summary for ?start=YYYY-MM-DD&end=YYYY-MM-DD (inclusive, default last 7 days).
+        """
+        query = SalesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        start, end = query.validated_data["start"], query.validated_data["end"]
+        limit = query.validated_data["limit"]
+
+        hours = HourlySales.objects.filter(
+            hour__gte=start_of_day(start),
+            hour__lt=start_of_day(end + datetime.timedelta(days=1)),
+        ).order_by("hour")
+        daily = (
+            hours.annotate(date=TruncDate("hour"))
+            .values("date")
+            .annotate(order_count=Sum("order_count"), revenue=Sum("revenue"))
+            .order_by("date")
+        )
+        top_items = (
+            MenuItemDailySales.objects.filter(date__gte=start, date__lte=end)
+            .values("menu_id", "menu__name")
+            .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+            .order_by("-quantity", "menu_id")[:limit]
+        )
+        return Response(
+            {
+                "start": start,
+                "end": end,
+                "daily": [
+                    {
+                        "date": row["date"],
+                        "order_count": row["order_count"],
+                        "revenue": f"{row['revenue']:.2f}",
+                    }
+                    for row in daily
+                ],
+                "hourly": [
+                    {"hour": row.hour, "order_count": row.order_count} for row in hours
+                ],
+                "top_items": [
+                    {
+                        "menu_item": row["menu_id"],
+                        "name": row["menu__name"],
+                        "quantity": row["quantity"],
+                        "revenue": f"{row['revenue']:.2f}",
+                    }
+                    for row in top_items
+                ],
+            }
+        )
 
 
 class RegisterCustomerAPIView(APIView):
@@ -194,3 +676,61 @@ class RegisterStaffAPIView(APIView):
             user.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ObtainTokenAPIView(APIView):
+    # Credentials come from the body; a stale token in the header must not
+    # stop a client from getting a new one.
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    @swagger_auto_schema(
+        request_body=TokenObtainSerializer,
+        responses={200: "Token", 400: "Bad Request"},
+    )
+    def post(self, request, *args, **kwargs):
+        """
+        Exchange a username and password for a signed API token.
+        """
+        serializer = TokenObtainSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        return Response(
+            {
+                "token": issue_token(serializer.validated_data["user"]),
+                "expires_in": token_settings()["MAX_AGE"],
+            }
+        )
+
+
+class RevokeTokensAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        """
+        Revoke every API token issued to the authenticated user.
+        """
+        revoke_tokens(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+SCHEMA_CONTENT_TYPES = {
+    "json": "application/json",
+    "yaml": "application/yaml",
+}
+
+
+@require_GET
+def openapi_schema(request, extension):
+    """
+    Serve the precomputed OpenAPI schema; see schema.py.
+    """
+    document = schema.load()[extension]
+    response = not_modified(request, document.etag, None) or HttpResponse(
+        document.content, content_type=SCHEMA_CONTENT_TYPES[extension]
+    )
+    response["ETag"] = document.etag
+    # Clients may keep a copy but must revalidate it, since deploys change it.
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
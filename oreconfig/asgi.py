@@ -14,3 +14,12 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'oreconfig.settings')
 
 application = get_asgi_application()
+
+# Load, or generate if the API changed, the OpenAPI schema before serving,
+# unless these workers do not serve the docs (oreconfig/settings_api.py).
+from django.apps import apps  # noqa: E402
+
+if apps.is_installed("drf_yasg"):
+    from oreapp import schema
+
+    schema.load()
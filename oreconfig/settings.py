@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 import os 
+import tempfile
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "oreapp.replicas.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -94,6 +96,28 @@ DATABASES = {
     )
 }
 
+# Read replicas, as comma-separated URLs in DATABASE_REPLICA_URLS, become the
+# aliases replica_1, replica_2, ... Safe requests read from them and
+# everything else uses "default" (see oreapp/replicas.py). To try it locally
+# with SQLite, migrate a database and copy its file to serve as the replica.
+# Tests run the replicas as mirrors of the test database.
+DATABASE_REPLICA_URLS = [
+    url for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url
+]
+for number, url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    DATABASES[f"replica_{number}"] = {
+        **dj_database_url.parse(url, conn_max_age=600),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["oreapp.replicas.PrimaryReplicaRouter"]
+
+ORE_DATABASE_REPLICAS = {
+    "ALIASES": [alias for alias in DATABASES if alias != "default"],
+    "PIN_SECONDS": 5,
+    "COOKIE_NAME": "ore_primary_until",
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -143,3 +167,133 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # Enable the WhiteNoise storage backend, which compresses static files to reduce disk use
 # and renames the files with unique names for each version to support long-term caching
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# "shared" must be visible to every worker process: it holds the menu
+# cache's invalidation versions and the order archive's boundary. The file cache covers every process on one
+# host; point it at Redis or Memcached when running on several hosts.
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get(
+            "ORE_SHARED_CACHE_DIR",
+            os.path.join(tempfile.gettempdir(), "ore-shared-cache"),
+        ),
+    },
+}
+
+# Server-side cache for the public menu endpoints (see oreapp/cache.py).
+# Entries are kept in each process; their versions live in the "shared"
+# cache, so a menu write in any worker invalidates every worker's entries.
+# Without "versions" a write only invalidates the worker that made it, which
+# is correct only when a single process serves the API. Use
+# "oreapp.cache.DjangoCacheBackend" with OPTIONS {"alias": "shared"} to keep
+# the entries in the shared cache too.
+ORE_RESPONSE_CACHE = {
+    "BACKEND": "oreapp.cache.LocMemLRUBackend",
+    "OPTIONS": {"max_entries": 512, "versions": "shared"},
+    "TIMEOUT": 300,
+}
+
+# Session auth stays first so anonymous requests keep getting 403s; a request
+# that carries no session cookie never reads the session table, so bearer
+# token clients skip it entirely (see oreapp/authentication.py).
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework.authentication.SessionAuthentication",
+        "oreapp.authentication.SignedTokenAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+    ],
+    # orjson-backed drop-ins for DRF's JSON renderer and parser.
+    "DEFAULT_RENDERER_CLASSES": [
+        "oreapp.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "oreapp.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
+ORE_AUTH_TOKEN = {
+    "MAX_AGE": 60 * 60,
+    "REVOCATION_TTL": 30,
+}
+
+# Per-request SQL instrumentation (see oreapp/middleware.py). Opt in with
+# ORE_SQL_INSTRUMENTATION=1; tests enable it per class with modify_settings.
+ORE_SQL_INSTRUMENTATION = {
+    "SLOW_REQUEST_MS": 500,
+    "SERVER_TIMING": True,
+    "MAX_REPEATED_QUERIES": None,
+}
+
+if os.environ.get("ORE_SQL_INSTRUMENTATION"):
+    MIDDLEWARE.insert(0, "oreapp.middleware.QueryInstrumentationMiddleware")
+
+# Cache-Control for the public menu endpoints (see oreapp/conditional.py).
+# Shared caches may keep a copy for s_maxage and revalidate it with ETags.
+ORE_MENU_CACHE_CONTROL = {
+    "public": True,
+    "max_age": 60,
+    "s_maxage": 300,
+    "stale_while_revalidate": 60,
+}
+
+# Server-Sent Events order feed for the kitchen display (see
+# oreapp/kitchen_feed.py). Serve it through ASGI; under WSGI every open
+# stream occupies a worker thread.
+ORE_KITCHEN_FEED = {
+    "HEARTBEAT_SECONDS": 15,
+    "RETRY_MS": 3000,
+    "BATCH_SIZE": 100,
+}
+
+# Idempotency-Key handling for POST /api/orders/ (see oreapp/idempotency.py).
+# Expired keys are deleted by "manage.py purge_idempotency_keys".
+ORE_IDEMPOTENCY = {
+    "TTL_SECONDS": 24 * 60 * 60,
+    "MAX_KEY_LENGTH": 255,
+}
+
+# The OpenAPI schema is generated once into DIRECTORY and served from there
+# (see oreapp/schema.py); "manage.py openapi_schema" refreshes it.
+ORE_OPENAPI_SCHEMA = {
+    "DIRECTORY": BASE_DIR / "openapi",
+}
+
+# Orders older than AGE_DAYS are moved to compressed files in DIRECTORY by
+# "manage.py archive_orders" and still served by customer_orders (see
+# oreapp/archive.py). Keep DIRECTORY on durable storage shared by every
+# worker.
+ORE_ORDER_ARCHIVE = {
+    "AGE_DAYS": int(os.environ.get("ORE_ORDER_ARCHIVE_AGE_DAYS", 365)),
+    "DIRECTORY": os.environ.get("ORE_ORDER_ARCHIVE_DIRECTORY", BASE_DIR / "archive"),
+    "BATCH_SIZE": 1000,
+    "BOUNDARY_TTL": 60,
+    # archive_orders drops the cached boundary here, for every worker.
+    "BOUNDARY_CACHE": "shared",
+}
+
+# Background jobs, such as the sales rollup updates queued when orders are
+# placed, changed or deleted (see oreapp/jobs.py). Run "manage.py run_jobs" alongside the web
+# workers; "manage.py job_stats" shows the queue's depth and lag.
+ORE_JOBS = {
+    "BATCH_SIZE": 50,
+    "LEASE_SECONDS": 300,
+    "MAX_ATTEMPTS": 5,
+    "BACKOFF_SECONDS": 2,
+    "MAX_BACKOFF_SECONDS": 60 * 60,
+    "POLL_SECONDS": 1,
+    "REPORT_SECONDS": 60,
+}
+
+SWAGGER_SETTINGS = {
+    "DEFAULT_INFO": "oreconfig.urls.api_info",
+    "SPEC_URL": "schema-json",
+}
+
+REDOC_SETTINGS = {
+    "SPEC_URL": "schema-json",
+}
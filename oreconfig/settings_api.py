@@ -0,0 +1,49 @@
+"""
+Settings for API-only workers, which start faster.
+
+They serve oreconfig.urls_api, which is the API without the admin, the
+swagger and redoc docs, or the browsable API. The apps, middleware and
+template engine behind those pages are therefore not installed, and
+drf_yasg is never imported.
+
+    DJANGO_SETTINGS_MODULE=oreconfig.settings_api gunicorn oreconfig.wsgi
+
+Compare start-up times with
+``manage.py profile_startup oreconfig.settings oreconfig.settings_api``.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    app
+    for app in INSTALLED_APPS
+    if app
+    not in (
+        "django.contrib.admin",
+        "django.contrib.messages",
+        "django.contrib.staticfiles",
+        "drf_yasg",
+    )
+]
+
+MIDDLEWARE = [
+    middleware
+    for middleware in MIDDLEWARE
+    if middleware
+    not in (
+        "whitenoise.middleware.WhiteNoiseMiddleware",
+        "django.contrib.messages.middleware.MessageMiddleware",
+    )
+]
+
+ROOT_URLCONF = "oreconfig.urls_api"
+
+TEMPLATES = []
+
+# JSON only: the browsable API, the one renderer that uses pygments, is off,
+# and with drf_yasg uninstalled no yaml codec or schema generator is set up.
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": ["oreapp.renderers.FastJSONRenderer"],
+}
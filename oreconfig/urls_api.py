@@ -0,0 +1,10 @@
+"""
+URL configuration for API-only workers (oreconfig/settings_api.py): the API
+alone, without the admin or the docs.
+"""
+
+from django.urls import path, include
+
+urlpatterns = [
+    path("api/", include("oreapp.urls")),
+]